@@ -0,0 +1,228 @@
+"""
+Асинхронные эндпоинты каталога и корзины для запуска под ASGI.
+
+DRF 3.14 не поддерживает async-представления, поэтому здесь обычные
+async-функции Django с теми же сериализаторами и форматом ответов, что у
+/api/products/ и /api/cart/. Данные читаются через async ORM (aget,
+acount, async for), независимые запросы ждутся вместе через asyncio.gather.
+В Django 4.2 async ORM выполняет запросы в потоке запроса через
+sync_to_async: gather не распараллеливает их в БД, но event loop не
+простаивает на ожидании блокировок и медленных запросов.
+
+Аутентификация — токен (как в API) или сессия; для сессии изменяющие
+запросы проверяют CSRF. Idempotency-Key эти эндпоинты не поддерживают.
+"""
+
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.core.exceptions import ValidationError
+from django.http import HttpResponseNotAllowed, JsonResponse
+from rest_framework.authentication import CSRFCheck
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from orders.models import Cart, CartItem
+from products.models import Product, ProductImage, Specification
+from users.authentication import CachedTokenAuthentication
+from utils.transactions_utils import transactional
+from .serializers import (
+    CartSerializer, ProductBaseSerializer, ProductImageSerializer, ProductSerializer,
+    SpecificationSerializer,
+)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class _NotAuthenticated(Exception):
+
+    def __init__(self, message, status=401):
+        super().__init__(message)
+        self.status = status
+
+
+def _error(message, status):
+    return JsonResponse({'error': message}, status=status)
+
+
+async def _list(queryset):
+    return [obj async for obj in queryset]
+
+
+def _csrf_failure(request):
+    """Причина отказа CSRF для сессионного запроса или None (как в SessionAuthentication)."""
+    check = CSRFCheck(lambda request: None)
+    check.process_request(request)
+    return check.process_view(request, None, (), {})
+
+
+async def _authenticate(request):
+    """Пользователь запроса; _NotAuthenticated, если его нет."""
+    header = request.headers.get('Authorization', '').split()
+    if len(header) == 2 and header[0].lower() == 'token':
+        try:
+            user, token = await sync_to_async(
+                CachedTokenAuthentication().authenticate_credentials
+            )(header[1])
+        except AuthenticationFailed as e:
+            raise _NotAuthenticated(str(e.detail))
+        return user
+
+    user = await sync_to_async(auth.get_user)(request)
+    if not user.is_authenticated:
+        raise _NotAuthenticated('Требуется авторизация')
+    if request.method not in SAFE_METHODS:
+        reason = _csrf_failure(request)
+        if reason:
+            raise _NotAuthenticated(f'CSRF: {reason}', status=403)
+    return user
+
+
+async def _user_cart(user):
+    """Корзина пользователя с позициями (создаётся при первом обращении)."""
+    carts = Cart.objects.with_items()
+    try:
+        return await carts.aget(user=user)
+    except Cart.DoesNotExist:
+        await Cart.objects.aget_or_create(user=user)
+        return await carts.aget(user=user)
+
+
+@transactional
+def _add_to_cart(user, product_id, quantity):
+    cart, created = Cart.objects.get_or_create(user=user)
+    CartItem.objects.add(cart, product_id, quantity)
+
+
+async def product_list(request):
+    """Список товаров с фильтрами и постраничной разбивкой, как GET /api/products/."""
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+
+    params = request.GET
+    try:
+        page = int(params.get('page', 1))
+    except ValueError:
+        page = 0
+    if page < 1:
+        return _error('Неверная страница.', 404)
+
+    try:
+        queryset = Product.objects.filter_catalog(
+            category=params.get('category'),
+            manufacturer=params.get('manufacturer'),
+            min_price=params.get('min_price'),
+            max_price=params.get('max_price'),
+            search=params.get('search'),
+            spec=params.get('spec'),
+        )
+    except (ValueError, ValidationError) as e:
+        return _error(f'Некорректный фильтр: {e}', 400)
+
+    size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    offset = (page - 1) * size
+    count, products = await asyncio.gather(
+        queryset.acount(),
+        _list(queryset.with_details()[offset:offset + size]),
+    )
+    if not products and page > 1:
+        return _error('Неверная страница.', 404)
+
+    url = request.build_absolute_uri()
+    previous = None
+    if page > 1:
+        previous = remove_query_param(url, 'page') if page == 2 else replace_query_param(url, 'page', page - 1)
+    return JsonResponse({
+        'count': count,
+        'next': replace_query_param(url, 'page', page + 1) if offset + size < count else None,
+        'previous': previous,
+        'results': ProductSerializer(products, many=True, context={'request': request}).data,
+    })
+
+
+async def product_detail(request, product_id):
+    """Товар, его изображения и характеристики — три запроса одновременно."""
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+
+    try:
+        product, images, specifications = await asyncio.gather(
+            Product.objects.select_related('category', 'manufacturer').aget(pk=product_id),
+            _list(ProductImage.objects.filter(product_id=product_id)),
+            _list(Specification.objects.filter(product_id=product_id)),
+        )
+    except Product.DoesNotExist:
+        return _error('Товар не найден', 404)
+
+    context = {'request': request}
+    data = ProductBaseSerializer(product, context=context).data
+    data['images'] = ProductImageSerializer(images, many=True, context=context).data
+    data['specifications'] = SpecificationSerializer(specifications, many=True).data
+    return JsonResponse(data)
+
+
+async def cart_detail(request):
+    """Корзина текущего пользователя."""
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    try:
+        user = await _authenticate(request)
+    except _NotAuthenticated as e:
+        return _error(str(e), e.status)
+
+    cart = await _user_cart(user)
+    return JsonResponse(CartSerializer(cart, context={'request': request}).data)
+
+
+async def cart_items(request):
+    """POST {product_id, quantity}: добавить товар в корзину."""
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    try:
+        user = await _authenticate(request)
+    except _NotAuthenticated as e:
+        return _error(str(e), e.status)
+
+    try:
+        data = json.loads(request.body or '{}') if request.content_type == 'application/json' else request.POST
+        product_id = int(data.get('product_id'))
+        quantity = int(data.get('quantity', 1))
+    except (TypeError, ValueError):
+        return _error('Укажите product_id и quantity', 400)
+
+    try:
+        # Блокировки и повторы транзакции — в потоке запроса, event loop свободен
+        await sync_to_async(_add_to_cart)(user, product_id, quantity)
+    except Product.DoesNotExist:
+        return _error('Товар не найден', 404)
+    except ValueError as e:
+        return _error(str(e), 400)
+
+    cart = await _user_cart(user)
+    return JsonResponse(CartSerializer(cart, context={'request': request}).data)
+
+
+async def cart_item(request, item_id):
+    """DELETE: удалить позицию из корзины."""
+    if request.method != 'DELETE':
+        return HttpResponseNotAllowed(['DELETE'])
+    try:
+        user = await _authenticate(request)
+    except _NotAuthenticated as e:
+        return _error(str(e), e.status)
+
+    deleted, _ = await CartItem.objects.filter(id=item_id, cart__user=user).adelete()
+    if not deleted:
+        return _error('Позиция не найдена', 404)
+
+    cart = await _user_cart(user)
+    return JsonResponse(CartSerializer(cart, context={'request': request}).data)
+
+
+# csrf_exempt в Django 4.2 оборачивает представление синхронной функцией;
+# CSRF для сессий проверяет _authenticate
+for _view in (cart_items, cart_item):
+    _view.csrf_exempt = True
@@ -0,0 +1,150 @@
+"""
+Поддержка заголовка Idempotency-Key для изменяющих эндпоинтов API.
+
+Первый ответ сохраняется на IDEMPOTENCY_KEY_TTL секунд и отдаётся повторно
+на запросы с тем же ключом. Параллельный дубликат ждёт завершения исходного
+запроса не дольше IDEMPOTENCY_WAIT_TIMEOUT секунд.
+
+Пока запрос выполняется, ключ занят на IDEMPOTENCY_LEASE_TIMEOUT секунд:
+если процесс упал посреди запроса, по истечении аренды ключ займёт повтор.
+Аренда должна быть дольше самого долгого изменяющего запроса.
+"""
+
+import functools
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAY_HEADER = 'Idempotent-Replayed'
+
+
+def _ttl():
+    return getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60)
+
+
+def _lease_timeout():
+    return getattr(settings, 'IDEMPOTENCY_LEASE_TIMEOUT', 60)
+
+
+def _wait_timeout():
+    return getattr(settings, 'IDEMPOTENCY_WAIT_TIMEOUT', 10)
+
+
+def _request_hash(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    raw = f'{request.method}:{request.path}:{body}'
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _replay(record):
+    response = Response(record.response_body, status=record.response_status)
+    response[REPLAY_HEADER] = 'true'
+    return response
+
+
+def _claim(request, key, request_hash):
+    """Пытается занять ключ. Возвращает None, если ключ занят другим запросом."""
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(
+                user=request.user,
+                key=key,
+                method=request.method,
+                path=request.path,
+                request_hash=request_hash,
+                expires_at=timezone.now() + timedelta(seconds=_lease_timeout()),
+            )
+    except IntegrityError:
+        return None
+
+
+def _wait_for(request, key):
+    """Ждёт завершения запроса, занявшего ключ."""
+    deadline = time.monotonic() + _wait_timeout()
+    delay = 0.05
+    while True:
+        record = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+        if record is None or record.is_expired or record.status == IdempotencyKey.STATUS_COMPLETED:
+            return record
+        if time.monotonic() >= deadline:
+            return record
+        time.sleep(delay)
+        delay = min(delay * 2, 0.5)
+
+
+def idempotent(view_func):
+    """
+    Декоратор для методов ViewSet.
+
+    Должен стоять над transactional, чтобы ключ фиксировался
+    в отдельной транзакции до начала основной работы.
+    """
+
+    @functools.wraps(view_func)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key or not request.user.is_authenticated:
+            return view_func(self, request, *args, **kwargs)
+
+        if len(key) > 255:
+            return Response(
+                {'error': f'Слишком длинный {HEADER}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        request_hash = _request_hash(request)
+
+        record = _claim(request, key, request_hash)
+        while record is None:
+            existing = _wait_for(request, key)
+            if existing is not None and existing.is_expired:
+                # Истёкший ответ или брошенная аренда; удалит только один из повторов
+                IdempotencyKey.objects.filter(pk=existing.pk, expires_at=existing.expires_at).delete()
+                existing = None
+            if existing is None:
+                record = _claim(request, key, request_hash)
+                continue
+
+            if existing.request_hash != request_hash:
+                return Response(
+                    {'error': f'{HEADER} уже использован для другого запроса'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            if existing.status == IdempotencyKey.STATUS_COMPLETED:
+                return _replay(existing)
+            return Response(
+                {'error': 'Запрос с этим ключом ещё выполняется'},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        try:
+            response = view_func(self, request, *args, **kwargs)
+        except Exception:
+            record.delete()
+            raise
+
+        if response.status_code >= 500:
+            # Серверные ошибки не кешируем, клиент может повторить запрос
+            record.delete()
+            return response
+
+        record.status = IdempotencyKey.STATUS_COMPLETED
+        record.response_status = response.status_code
+        # Тот же кодировщик, что у рендерера: повтор совпадает с исходным ответом
+        record.response_body = json.loads(json.dumps(response.data, cls=JSONEncoder))
+        record.expires_at = timezone.now() + timedelta(seconds=_ttl())
+        record.save(update_fields=['status', 'response_status', 'response_body', 'expires_at'])
+        return response
+
+    return wrapper
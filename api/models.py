@@ -1,3 +1,67 @@
+"""
+Модели API.
+"""
+
 from django.db import models
+from django.utils import timezone
+
+
+class IdempotencyKeyQuerySet(models.QuerySet):
+    """QuerySet ключей идемпотентности."""
+
+    def expired(self):
+        return self.filter(expires_at__lte=timezone.now())
+
+    def purge_expired(self, batch_size=1000):
+        """Удаляет просроченные ключи пачками, возвращает число удалённых."""
+        deleted = 0
+        while True:
+            ids = list(self.expired().values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            deleted += self.model.objects.filter(id__in=ids).delete()[0]
+
+
+class IdempotencyKey(models.Model):
+    """Сохранённый ответ на запрос с заголовком Idempotency-Key."""
+    STATUS_IN_PROGRESS = 'in_progress'
+    STATUS_COMPLETED = 'completed'
+    STATUS_CHOICES = [
+        (STATUS_IN_PROGRESS, 'Выполняется'),
+        (STATUS_COMPLETED, 'Завершён'),
+    ]
+
+    user = models.ForeignKey(
+        'users.User',
+        on_delete=models.CASCADE,
+        related_name='idempotency_keys'
+    )
+    key = models.CharField('Ключ', max_length=255)
+    method = models.CharField('Метод', max_length=10)
+    path = models.CharField('Путь', max_length=255)
+    request_hash = models.CharField('Хеш запроса', max_length=64)
+    status = models.CharField('Статус', max_length=20, choices=STATUS_CHOICES,
+                              default=STATUS_IN_PROGRESS)
+    response_status = models.PositiveSmallIntegerField('HTTP статус', null=True, blank=True)
+    response_body = models.JSONField('Тело ответа', null=True, blank=True)
+    created_at = models.DateTimeField('Дата создания', auto_now_add=True)
+    expires_at = models.DateTimeField('Истекает')
+
+    objects = IdempotencyKeyQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Ключ идемпотентности'
+        verbose_name_plural = 'Ключи идемпотентности'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at']),
+        ]
+
+    def __str__(self):
+        return self.key
 
-# Create your models here.
+    @property
+    def is_expired(self):
+        return self.expires_at <= timezone.now()
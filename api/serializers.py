@@ -4,7 +4,8 @@
 
 from rest_framework import serializers
 from products.models import Category, Manufacturer, Product, ProductImage, Specification
-from orders.models import Order, OrderItem, Cart, CartItem
+from products.pricing import RULES
+from orders.models import Order, OrderEvent, OrderItem, Cart, CartItem
 from users.models import User
 
 
@@ -39,17 +40,24 @@ class SpecificationSerializer(serializers.ModelSerializer):
         fields = ('name', 'value')
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductBaseSerializer(serializers.ModelSerializer):
+    """Товар без изображений и характеристик."""
     category = CategorySerializer(read_only=True)
     manufacturer = ManufacturerSerializer(read_only=True)
-    images = ProductImageSerializer(many=True, read_only=True)
-    specifications = SpecificationSerializer(many=True, read_only=True)
 
     class Meta:
         model = Product
         fields = '__all__'
 
 
+class ProductSerializer(ProductBaseSerializer):
+    images = ProductImageSerializer(many=True, read_only=True)
+    specifications = SpecificationSerializer(many=True, read_only=True)
+
+    class Meta(ProductBaseSerializer.Meta):
+        pass
+
+
 class CartItemSerializer(serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
     total_price = serializers.SerializerMethodField()
@@ -74,13 +82,48 @@ class CartSerializer(serializers.ModelSerializer):
         return obj.total_price
 
 
+class RepricingRuleSerializer(serializers.Serializer):
+    rule = serializers.ChoiceField(choices=RULES)
+    value = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+
+class RepricingSerializer(serializers.Serializer):
+    category = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all(), required=False)
+    manufacturer = serializers.PrimaryKeyRelatedField(queryset=Manufacturer.objects.all(), required=False)
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    rules = RepricingRuleSerializer(many=True, allow_empty=False)
+    reason = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+
+    def validate(self, attrs):
+        if not any(attrs.get(key) for key in ('category', 'manufacturer', 'ids')):
+            raise serializers.ValidationError('Укажите category, manufacturer или ids')
+        for rule in attrs['rules']:
+            if rule['rule'] == 'round' and rule['value'] <= 0:
+                raise serializers.ValidationError('Шаг округления должен быть положительным')
+        return attrs
+
+
+class CartOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=['add', 'set', 'remove'])
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=0, default=1)
+
+
+class CartBatchSerializer(serializers.Serializer):
+    operations = CartOperationSerializer(many=True, allow_empty=False)
+
+
 class OrderItemSerializer(serializers.ModelSerializer):
-    product = ProductSerializer(read_only=True)
+    """Позиция заказа из снимка товара, без обращения к каталогу."""
+    product_image = serializers.CharField(source='product_image_url', read_only=True)
     total_price = serializers.SerializerMethodField()
 
     class Meta:
         model = OrderItem
-        fields = ('id', 'product', 'quantity', 'price', 'total_price')
+        fields = (
+            'id', 'product_id', 'product_name', 'product_slug', 'product_image',
+            'product_specs', 'quantity', 'price', 'total_price',
+        )
 
     def get_total_price(self, obj):
         return obj.total_price
@@ -93,4 +136,48 @@ class OrderSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
         fields = '__all__'
-        read_only_fields = ('order_number', 'user', 'total_price', 'created_at', 'updated_at')
\ No newline at end of file
+        read_only_fields = (
+            'order_number', 'user', 'status', 'total_price', 'created_at', 'updated_at',
+            'items_count', 'first_item_name', 'first_item_image',
+        )
+
+
+class OrderSummarySerializer(serializers.ModelSerializer):
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    first_item_image = serializers.CharField(source='first_item_image_url', read_only=True)
+
+    class Meta:
+        model = Order
+        fields = (
+            'id', 'order_number', 'status', 'status_display', 'total_price', 'created_at',
+            'items_count', 'first_item_name', 'first_item_image',
+        )
+        read_only_fields = fields
+
+
+class OrderEventSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OrderEvent
+        fields = ('id', 'order_id', 'from_status', 'to_status', 'source', 'created_at')
+
+
+class OrderBulkTransitionSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+    # Только статусы, в которые есть переход
+    status = serializers.ChoiceField(choices=[
+        (status, label) for status, label in Order.STATUS_CHOICES if Order.allowed_sources(status)
+    ])
+    source = serializers.CharField(max_length=50, required=False, allow_blank=True)
+
+
+class SalesReportQuerySerializer(serializers.Serializer):
+    start = serializers.DateField()
+    end = serializers.DateField()
+    group_by = serializers.ChoiceField(
+        choices=['day', 'product', 'category', 'manufacturer'], default='day'
+    )
+
+    def validate(self, attrs):
+        if attrs['start'] > attrs['end']:
+            raise serializers.ValidationError('start позже end')
+        return attrs
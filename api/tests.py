@@ -1,3 +1,423 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import re
+from collections import Counter
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from orders.exports import OrderExporter
+from orders.models import Cart, CartItem, DailyProductSales, DailySales, Order, OrderEvent, OrderItem
+from products.models import Category, Manufacturer, Product, ProductImage, Specification
+from users.models import User
+from utils.instrumentation import fingerprint
+
+from .models import IdempotencyKey
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+# Объём данных, на котором сравнивается число запросов. LARGE меньше пачки
+# bulk_create/bulk_update на SQLite (999 параметров): деление на пачки —
+# не N+1, но тоже меняет число запросов
+SMALL, LARGE = 10, 100
+
+# Бюджеты SQL-запросов страниц и эндпоинтов API:
+# (название, метод, путь, тело запроса, максимум запросов).
+# В пути и строковых значениях тела подставляются {product}, {order},
+# {order_number}. Перед каждым запросом в корзине ровно N позиций.
+# Экспорт (/api/export/) не входит: он читает данные пачками по построению.
+# История и отчёт читают в транзакции только для чтения: в TestCase она
+# становится точкой сохранения, это ещё два запроса (SAVEPOINT/RELEASE).
+QUERY_BUDGETS = [
+    ('home', 'get', '/', None, 6),
+    ('products', 'get', '/products/', None, 6),
+    ('products_filtered', 'get', '/products/?category={category}&min_price=1&search=Товар', None, 6),
+    ('product_detail', 'get', '/products/{product}/', None, 7),
+    ('add_to_cart', 'post', '/products/add-to-cart/{product}/', {'quantity': '1'}, 5),
+    ('cart', 'get', '/cart/', None, 8),
+    ('checkout_form', 'get', '/checkout/', None, 7),
+    ('checkout', 'post', '/checkout/', {'shipping_address': 'Москва'}, 18),
+    ('order_success', 'get', '/orders/success/{order_number}/', None, 4),
+    ('orders_list', 'get', '/orders/', None, 7),
+    ('order_detail', 'get', '/orders/{order}/', None, 5),
+    ('profile', 'get', '/profile/', None, 3),
+
+    ('api_categories', 'get', '/api/categories/', None, 4),
+    ('api_manufacturers', 'get', '/api/manufacturers/', None, 4),
+    ('api_products', 'get', '/api/products/', None, 6),
+    ('api_product', 'get', '/api/products/{product}/', None, 5),
+    ('api_products_suggest', 'get', '/api/products/suggest/?q=Тов', None, 0),
+    ('api_product_add_to_cart', 'post', '/api/products/{product}/add_to_cart/', {'quantity': 1}, 10),
+    ('api_cart', 'get', '/api/cart/', None, 7),
+    ('api_cart_add_item', 'post', '/api/cart/add_item/', {'product_id': '{product}'}, 10),
+    ('api_cart_batch', 'post', '/api/cart/batch/',
+     {'operations': [{'op': 'add', 'product_id': '{product}'}]}, 12),
+    ('api_cart_reorder', 'post', '/api/cart/reorder/', {'order_id': '{order}'}, 14),
+    ('api_cart_remove_item', 'post', '/api/cart/remove_item/', {'item_id': '{cart_item}'}, 9),
+    ('api_orders', 'get', '/api/orders/', None, 5),
+    ('api_order', 'get', '/api/orders/{order}/', None, 4),
+    ('api_order_create', 'post', '/api/orders/', {'shipping_address': 'Москва'}, 18),
+    ('api_orders_history', 'get', '/api/orders/history/', None, 6),
+    ('api_orders_events', 'get', '/api/orders/events/', None, 3),
+    ('api_sales_report', 'get',
+     '/api/reports/sales/?start=2024-01-01&end=2024-12-31&group_by=product', None, 7),
+    ('api_db_metrics', 'get', '/api/metrics/db/', None, 2),
+
+    ('api_async_products', 'get', '/api/async/products/', None, 4),
+    ('api_async_products_filtered', 'get',
+     '/api/async/products/?category={category}&min_price=1&search=Товар', None, 4),
+    ('api_async_product', 'get', '/api/async/products/{product}/', None, 3),
+    ('api_async_cart', 'get', '/api/async/cart/', None, 6),
+    ('api_async_cart_add', 'post', '/api/async/cart/items/', {'product_id': '{product}'}, 10),
+    ('api_async_cart_remove', 'delete', '/api/async/cart/items/{cart_item}/', None, 7),
+]
+
+
+def _shape(sql):
+    """SQL без литералов: CaptureQueriesContext отдаёт запросы с подставленными параметрами."""
+    return fingerprint(_LITERAL.sub('%s', sql))
+
+
+def _substitute(value, ids):
+    if isinstance(value, str):
+        return value.format(**ids)
+    if isinstance(value, dict):
+        return {key: _substitute(item, ids) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_substitute(item, ids) for item in value]
+    return value
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Число запросов страниц и API не зависит от объёма данных.
+
+    Каждый запрос из QUERY_BUDGETS выполняется при SMALL и при LARGE
+    товарах, заказах и позициях корзины; счётчики должны совпасть и
+    уложиться в бюджет. При провале в выводе — SQL, число которых выросло.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            'buyer', 'buyer@example.com', 'x', is_staff=True, address='Москва'
+        )
+        cls.manufacturer = Manufacturer.objects.create(name='Производитель', country='RU')
+        cls.cart = Cart.objects.create(user=cls.user)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def _grow(self, size):
+        """Догоняет объём данных до size товаров, категорий, заказов и событий."""
+        start = Product.objects.count()
+        categories = Category.objects.bulk_create([
+            Category(name=f'Категория {i}', slug=f'category-{i}') for i in range(start, size)
+        ])
+        products = Product.objects.bulk_create([
+            Product(
+                name=f'Товар {i}', slug=f'product-{i}', description='Описание', price=100,
+                quantity=100000, category=category, manufacturer=self.manufacturer,
+            )
+            for i, category in zip(range(start, size), categories)
+        ])
+        ProductImage.objects.bulk_create([
+            ProductImage(product=product, image=f'products/{product.slug}-{n}.jpg', is_main=n == 0)
+            for product in products for n in range(2)
+        ])
+        Specification.objects.bulk_create([
+            Specification(product=product, name=f'Параметр {n}', value=str(n))
+            for product in products for n in range(2)
+        ])
+        DailyProductSales.objects.bulk_create([
+            DailyProductSales(day=date(2024, 1, 1), product=product, units=1, revenue=100, order_count=1)
+            for product in products
+        ])
+        DailySales.objects.get_or_create(
+            day=date(2024, 1, 1), defaults={'units': 1, 'revenue': 100, 'order_count': 1}
+        )
+
+        orders = Order.objects.bulk_create([
+            Order(
+                user=self.user, order_number=f'TEST{i:08d}', payment_method='card',
+                total_price=100, shipping_address='Москва', phone='', email='buyer@example.com',
+            )
+            for i in range(Order.objects.filter(order_number__startswith='TEST').count(), size)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=1, price=100, product_name=product.name)
+            for order, product in zip(orders, products)
+        ])
+        OrderEvent.objects.bulk_create([
+            OrderEvent(order=order, to_status='pending') for order in orders
+        ])
+
+        # Первый заказ растёт вместе с каталогом: на нём проверяются позиции заказа
+        self.order = Order.objects.order_by('id').first()
+        OrderItem.objects.bulk_create([
+            OrderItem(order=self.order, product=product, quantity=1, price=100,
+                      product_name=product.name)
+            for product in products
+        ])
+
+    def _reset_cart(self, size):
+        """Корзина из size позиций; возвращает подстановки для путей и тел запросов."""
+        CartItem.objects.filter(cart=self.cart).delete()
+        products = list(Product.objects.order_by('id')[:size])
+        items = CartItem.objects.bulk_create([
+            CartItem(cart=self.cart, product=product, quantity=1) for product in products
+        ])
+        return {
+            'product': products[0].id,
+            'category': products[0].category_id,
+            'order': self.order.id,
+            'order_number': self.order.order_number,
+            'cart_item': items[-1].id,
+        }
+
+    def _queries(self, method, path, data, size):
+        # Первый запрос прогревает кэши процесса (токены, версии каталога)
+        for attempt in range(2):
+            ids = self._reset_cart(size)
+            request = getattr(self.client, method)
+            url = _substitute(path, ids)
+            with CaptureQueriesContext(connection) as queries:
+                if method == 'get':
+                    response = request(url)
+                elif url.startswith('/api/'):
+                    response = request(url, _substitute(data, ids), content_type='application/json')
+                else:
+                    response = request(url, _substitute(data, ids))
+        self.assertLess(response.status_code, 400, f'{method.upper()} {url}: {response.status_code}')
+        return [query['sql'] for query in queries.captured_queries]
+
+    def test_query_counts_do_not_grow_with_data(self):
+        measured = {}
+        for size in (SMALL, LARGE):
+            self._grow(size)
+            for name, method, path, data, budget in QUERY_BUDGETS:
+                measured.setdefault(name, []).append(self._queries(method, path, data, size))
+
+        for name, method, path, data, budget in QUERY_BUDGETS:
+            small, large = measured[name]
+            with self.subTest(name):
+                grown = Counter(map(_shape, large)) - Counter(map(_shape, small))
+                self.assertEqual(
+                    len(small), len(large),
+                    f'{name}: {len(small)} запросов при N={SMALL}, {len(large)} при N={LARGE}. '
+                    'Выросли:\n' + '\n'.join(f'  +{count} × {sql}' for sql, count in grown.items())
+                )
+                self.assertLessEqual(
+                    len(large), budget,
+                    f'{name}: {len(large)} запросов при бюджете {budget}:\n' + '\n'.join(
+                        f'  {sql}' for sql in large
+                    )
+                )
+
+
+class IdempotencyTests(TestCase):
+    """Повторы запросов с заголовком Idempotency-Key."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('buyer', 'buyer@example.com', 'x')
+        category = Category.objects.create(name='Категория', slug='cat')
+        manufacturer = Manufacturer.objects.create(name='Производитель', country='RU')
+        cls.product = Product.objects.create(
+            name='Товар', slug='product', description='', price=100, quantity=10,
+            category=category, manufacturer=manufacturer,
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def _add(self, key, quantity=1):
+        return self.client.post(
+            '/api/cart/add_item/', {'product_id': self.product.id, 'quantity': quantity},
+            content_type='application/json', HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def _quantity(self):
+        return CartItem.objects.get(cart__user=self.user, product=self.product).quantity
+
+    def test_repeat_is_replayed_without_side_effects(self):
+        first = self._add('key-1')
+        second = self._add('key-1')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(self._quantity(), 1)
+
+    def test_same_key_with_other_body_is_rejected(self):
+        self._add('key-1')
+        response = self._add('key-1', quantity=2)
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self._quantity(), 1)
+
+    @override_settings(IDEMPOTENCY_WAIT_TIMEOUT=0)
+    def test_in_flight_key_conflicts_until_lease_expires(self):
+        self._add('key-1')
+        record = IdempotencyKey.objects.get(key='key-1')
+        # Ключ занят запросом, который ещё выполняется
+        IdempotencyKey.objects.filter(pk=record.pk).update(
+            status=IdempotencyKey.STATUS_IN_PROGRESS,
+            expires_at=timezone.now() + timedelta(minutes=1),
+        )
+        self.assertEqual(self._add('key-1').status_code, 409)
+
+        # Процесс упал, аренда истекла: повтор выполняется заново
+        IdempotencyKey.objects.filter(pk=record.pk).update(expires_at=timezone.now())
+        response = self._add('key-1')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(self._quantity(), 2)
+
+        record = IdempotencyKey.objects.get(key='key-1')
+        self.assertEqual(record.status, IdempotencyKey.STATUS_COMPLETED)
+        self.assertGreater(record.expires_at, timezone.now() + timedelta(hours=1))
+
+    def test_model_viewset_mutations_are_idempotent(self):
+        order = Order.objects.create(
+            user=self.user, total_price=100, payment_method='card',
+            shipping_address='-', phone='-', email='buyer@example.com',
+        )
+        url = f'/api/orders/{order.id}/'
+        first = self.client.delete(url, HTTP_IDEMPOTENCY_KEY='delete-1')
+        second = self.client.delete(url, HTTP_IDEMPOTENCY_KEY='delete-1')
+
+        self.assertEqual(first.status_code, 204)
+        self.assertEqual(second.status_code, 204)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+
+
+class OrderApiTests(TestCase):
+    """Параметры и защищённые поля API заказов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('buyer', 'buyer@example.com', 'x', is_staff=True)
+        cls.orders = [
+            Order.objects.create(
+                user=cls.user, total_price=100, payment_method='card', items_count=1,
+                first_item_name='Товар', shipping_address='-', phone='-', email='buyer@example.com',
+            )
+            for _ in range(3)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_history_limit_is_validated_and_clamped(self):
+        self.assertEqual(self.client.get('/api/orders/history/?limit=abc').status_code, 400)
+
+        response = self.client.get('/api/orders/history/?limit=-5')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 1)
+        self.assertIsNotNone(response.json()['next_cursor'])
+
+    def test_summary_fields_are_read_only(self):
+        order = self.orders[0]
+        response = self.client.patch(
+            f'/api/orders/{order.id}/',
+            {'items_count': 99, 'first_item_name': 'Подмена', 'comment': 'Позвонить'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+
+        order.refresh_from_db()
+        self.assertEqual((order.items_count, order.first_item_name), (1, 'Товар'))
+        self.assertEqual(order.comment, 'Позвонить')
+
+    def test_bulk_transition_rejects_unreachable_status(self):
+        ids = [order.id for order in self.orders]
+        response = self.client.post(
+            '/api/orders/bulk_transition/', {'ids': ids, 'status': 'pending'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('status', response.json())
+
+        response = self.client.post(
+            '/api/orders/bulk_transition/', {'ids': ids[:2], 'status': 'processing'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.json(), {'changed': 2})
+        self.assertEqual(
+            sorted(OrderEvent.objects.values_list('order_id', 'from_status', 'to_status')),
+            [(ids[0], 'pending', 'processing'), (ids[1], 'pending', 'processing')],
+        )
+
+    def test_events_parameters_are_validated(self):
+        for query in ('after=x', 'limit=ten'):
+            with self.subTest(query):
+                self.assertEqual(self.client.get(f'/api/orders/events/?{query}').status_code, 400)
+
+        self.orders[0].transition_to('processing')
+        self.orders[1].transition_to('processing')
+        response = self.client.get('/api/orders/events/?after=-1&limit=0')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 1)
+
+
+class ExportApiTests(TestCase):
+    """Потоковая выгрузка заказов в CSV и NDJSON."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', 'admin@example.com', 'x', is_staff=True)
+        category = Category.objects.create(name='Категория', slug='cat')
+        manufacturer = Manufacturer.objects.create(name='Производитель', country='RU')
+        product = Product.objects.create(
+            name='Товар', slug='product', description='', price=100, quantity=10,
+            category=category, manufacturer=manufacturer,
+        )
+        for n in range(5):
+            order = Order.objects.create(
+                user=cls.admin, total_price=200, payment_method='card' if n % 2 else 'cash',
+                shipping_address='Москва', phone='-', email='admin@example.com',
+            )
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, quantity=q, price=100, product_name='Товар')
+                for q in (1, 2)
+            ])
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def _export(self, query):
+        response = self.client.get(f'/api/export/orders/?{query}')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    @mock.patch.object(OrderExporter, 'batch_size', 2)
+    def test_csv_has_row_per_item_across_batches(self):
+        response, body = self._export('output=csv')
+
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        self.assertIn('attachment; filename="orders-', response['Content-Disposition'])
+        rows = list(csv.reader(io.StringIO(body.decode('utf-8-sig'))))
+        self.assertEqual(rows[0], list(OrderExporter.csv_header))
+        self.assertEqual(len(rows), 1 + 5 * 2)
+        self.assertEqual(len({row[0] for row in rows[1:]}), 5)
+
+    def test_ndjson_gzip_and_filters(self):
+        response, body = self._export('output=ndjson&gzip=1&payment_method=card')
+
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        orders = [json.loads(line) for line in gzip.decompress(body).decode().splitlines()]
+        self.assertEqual(len(orders), 2)
+        self.assertEqual({order['payment_method'] for order in orders}, {'card'})
+        self.assertEqual([item['quantity'] for item in orders[0]['items']], [1, 2])
+
+    def test_unknown_format_is_rejected(self):
+        self.assertEqual(self.client.get('/api/export/orders/?output=xml').status_code, 400)
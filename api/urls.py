@@ -7,8 +7,10 @@ from rest_framework.routers import DefaultRouter
 from rest_framework.authtoken.views import obtain_auth_token
 from .views import (
     CategoryViewSet, ManufacturerViewSet, ProductViewSet,
-    CartViewSet, OrderViewSet, UserRegistrationView
+    CartViewSet, OrderViewSet, UserRegistrationView, LogoutView,
+    SalesReportView, ExportView, DatabaseMetricsView
 )
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'categories', CategoryViewSet)
@@ -21,4 +23,16 @@ urlpatterns = [
     path('', include(router.urls)),
     path('auth/register/', UserRegistrationView.as_view({'post': 'create'}), name='api-register'),
     path('auth/login/', obtain_auth_token, name='api-login'),
+    path('auth/logout/', LogoutView.as_view(), name='api-logout'),
+    path('reports/sales/', SalesReportView.as_view(), name='api-sales-report'),
+    path('export/<str:kind>/', ExportView.as_view(), name='api-export'),
+    path('metrics/db/', DatabaseMetricsView.as_view(), name='api-db-metrics'),
+
+    # Асинхронные версии каталога и корзины (для ASGI)
+    path('async/products/', async_views.product_list, name='api-async-products'),
+    path('async/products/<int:product_id>/', async_views.product_detail,
+         name='api-async-product'),
+    path('async/cart/', async_views.cart_detail, name='api-async-cart'),
+    path('async/cart/items/', async_views.cart_items, name='api-async-cart-items'),
+    path('async/cart/items/<int:item_id>/', async_views.cart_item, name='api-async-cart-item'),
 ]
\ No newline at end of file
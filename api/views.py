@@ -5,15 +5,49 @@ ViewSets для API с поддержкой транзакций.
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.authtoken.models import Token
+from django.core.exceptions import ValidationError
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db import transaction
+from django.conf import settings
+from django.db import connection, router
+from django.db.models import Sum
 
 from products.models import Category, Manufacturer, Product
-from orders.models import Order, Cart, CartItem
+from products.pricing import reprice
+from products.suggest import suggest
+from orders.models import (
+    ArchivedOrder, Order, OrderEvent, Cart, CartItem,
+    DailySales, DailyProductSales, DailyCategorySales, DailyManufacturerSales,
+)
 from users.models import User
+from orders.exports import OrderExporter
+from products.exports import ProductExporter
+from users.exports import UserExporter
+from utils.db import statement_timeout
+from utils.db_backends.postgresql_pool.base import pool_metrics
+from utils.exports import FORMATS, streaming_export
+from utils.transactions_utils import (
+    REPEATABLE_READ, transaction_block, transaction_metrics, transactional,
+)
 from .serializers import *
+from .idempotency import idempotent
+
+
+def _cart_with_items(cart):
+    """Корзина с предзагруженными позициями для сериализации."""
+    return Cart.objects.with_items().get(pk=cart.pk)
+
+
+def _int_param(request, name, default, minimum, maximum):
+    """Целый параметр строки запроса, приведённый к [minimum, maximum]."""
+    try:
+        value = int(request.query_params.get(name, default))
+    except ValueError:
+        raise ValueError(f'Параметр {name} должен быть целым числом')
+    return max(minimum, min(value, maximum))
 
 
 class CategoryViewSet(viewsets.ModelViewSet):
@@ -39,28 +73,29 @@ class ProductViewSet(viewsets.ModelViewSet):
     filterset_fields = ['category', 'manufacturer']
 
     def get_queryset(self):
-        queryset = Product.objects.all()
-
-        min_price = self.request.query_params.get('min_price')
-        max_price = self.request.query_params.get('max_price')
-
-        if min_price:
-            queryset = queryset.filter(price__gte=min_price)
-        if max_price:
-            queryset = queryset.filter(price__lte=max_price)
-
-        search = self.request.query_params.get('search')
-        if search:
-            from django.db.models import Q
-            queryset = queryset.filter(
-                Q(name__icontains=search) |
-                Q(description__icontains=search)
-            )
+        # category и manufacturer фильтрует DjangoFilterBackend
+        params = self.request.query_params
+        return Product.objects.with_details().filter_catalog(
+            min_price=params.get('min_price'),
+            max_price=params.get('max_price'),
+            search=params.get('search'),
+            spec=params.get('spec'),
+        )
 
-        return queryset
+    @action(detail=False, methods=['get'], authentication_classes=[],
+            permission_classes=[permissions.AllowAny])
+    def suggest(self, request):
+        """Подсказки для строки поиска из индекса в памяти, без запросов к БД."""
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            limit = 10
+        query = request.query_params.get('q', '')
+        return Response({'query': query, 'results': suggest(query, max(limit, 1))})
 
     @action(detail=True, methods=['post'])
-    @transaction.atomic
+    @idempotent
+    @transactional
     def add_to_cart(self, request, pk=None):
         """Добавить товар в корзину через API."""
         if not request.user.is_authenticated:
@@ -69,29 +104,43 @@ class ProductViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_401_UNAUTHORIZED
             )
 
-        product = self.get_object()
         quantity = int(request.data.get('quantity', 1))
+        cart, created = Cart.objects.get_or_create(user=request.user)
 
-        if quantity > product.quantity:
+        try:
+            CartItem.objects.add(cart, pk, quantity)
+        except Product.DoesNotExist:
+            raise Http404
+        except ValueError as e:
             return Response(
-                {'error': f'Недостаточно товара. Доступно: {product.quantity}'},
+                {'error': str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        cart, created = Cart.objects.get_or_create(user=request.user)
-
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            product=product,
-            defaults={'quantity': quantity}
-        )
+        serializer = CartSerializer(_cart_with_items(cart))
+        return Response(serializer.data)
 
-        if not created:
-            cart_item.quantity += quantity
-            cart_item.save()
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAdminUser])
+    def reprice(self, request):
+        """Массовая переоценка товаров категории, производителя или списка id."""
+        serializer = RepricingSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
 
-        serializer = CartSerializer(cart)
-        return Response(serializer.data)
+        queryset = Product.objects.all()
+        if data.get('category'):
+            queryset = queryset.filter(category=data['category'])
+        if data.get('manufacturer'):
+            queryset = queryset.filter(manufacturer=data['manufacturer'])
+        if data.get('ids'):
+            queryset = queryset.filter(id__in=data['ids'])
+
+        updated = reprice(
+            queryset,
+            [(rule['rule'], rule['value']) for rule in data['rules']],
+            reason=data['reason'] or 'api',
+        )
+        return Response({'updated': updated})
 
 
 class CartViewSet(viewsets.ModelViewSet):
@@ -100,43 +149,89 @@ class CartViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Cart.objects.filter(user=self.request.user)
+        return Cart.objects.filter(user=self.request.user).with_items().order_by('id')
 
     def get_object(self):
-        cart, created = Cart.objects.get_or_create(user=self.request.user)
+        cart, created = Cart.objects.with_items().get_or_create(user=self.request.user)
         return cart
 
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+    @idempotent
+    def update(self, request, *args, **kwargs):
+        return super().update(request, *args, **kwargs)
+
+    @idempotent
+    def partial_update(self, request, *args, **kwargs):
+        return super().partial_update(request, *args, **kwargs)
+
+    @idempotent
+    def destroy(self, request, *args, **kwargs):
+        return super().destroy(request, *args, **kwargs)
+
     @action(detail=False, methods=['post'])
-    @transaction.atomic
+    @idempotent
+    @transactional
     def add_item(self, request):
         """Добавить товар в корзину."""
         product_id = request.data.get('product_id')
         quantity = int(request.data.get('quantity', 1))
 
-        product = get_object_or_404(Product, id=product_id)
+        cart, created = Cart.objects.get_or_create(user=request.user)
 
-        if quantity > product.quantity:
+        try:
+            CartItem.objects.add(cart, product_id, quantity)
+        except Product.DoesNotExist:
+            raise Http404
+        except ValueError as e:
             return Response(
-                {'error': f'Недостаточно товара. Доступно: {product.quantity}'},
+                {'error': str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        serializer = CartSerializer(_cart_with_items(cart))
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['post'])
+    @idempotent
+    def batch(self, request):
+        """Применить пачку операций add/set/remove в одной транзакции."""
+        serializer = CartBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
         cart, created = Cart.objects.get_or_create(user=request.user)
 
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            product=product,
-            defaults={'quantity': quantity}
-        )
+        try:
+            cart.apply_operations(serializer.validated_data['operations'])
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        if not created:
-            cart_item.quantity += quantity
-            cart_item.save()
+        return Response(CartSerializer(_cart_with_items(cart)).data)
 
-        serializer = CartSerializer(cart)
-        return Response(serializer.data)
+    @action(detail=False, methods=['post'])
+    @idempotent
+    def reorder(self, request):
+        """Повторить прошлый заказ: добавить все его позиции в корзину."""
+        order = get_object_or_404(Order, id=request.data.get('order_id'), user=request.user)
+        cart, created = Cart.objects.get_or_create(user=request.user)
+
+        try:
+            cart.reorder(order)
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(CartSerializer(_cart_with_items(cart)).data)
 
     @action(detail=False, methods=['post'])
+    @idempotent
     def remove_item(self, request):
         """Удалить товар из корзины."""
         item_id = request.data.get('item_id')
@@ -145,7 +240,7 @@ class CartViewSet(viewsets.ModelViewSet):
         cart_item = get_object_or_404(CartItem, id=item_id, cart=cart)
         cart_item.delete()
 
-        serializer = CartSerializer(cart)
+        serializer = CartSerializer(_cart_with_items(cart))
         return Response(serializer.data)
 
 
@@ -155,58 +250,237 @@ class OrderViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user).order_by('-created_at')
+        return (
+            Order.objects.filter(user=self.request.user)
+            .select_related('user')
+            .prefetch_related('items')
+            .order_by('-created_at')
+        )
 
-    @transaction.atomic
+    def retrieve(self, request, *args, **kwargs):
+        """Заказ по id; архивные заказы читаются из архива."""
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            archived = get_object_or_404(ArchivedOrder, id=kwargs['pk'], user=request.user)
+            order, items = archived.unpack()
+            return Response(OrderSerializer(order).data)
+
+    @idempotent
+    @transactional(isolation=REPEATABLE_READ)
     def create(self, request):
-        """Создать заказ из корзины."""
+        """Создать заказ из корзины (внешняя транзакция: её уровень действует в checkout)."""
         cart = Cart.objects.filter(user=request.user).first()
 
-        if not cart or not cart.items.exists():
+        if not cart:
             return Response(
                 {'error': 'Корзина пуста'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
         try:
-            for item in cart.items.all():
-                if item.quantity > item.product.quantity:
-                    raise ValueError(
-                        f'Недостаточно товара: {item.product.name}'
-                    )
-
-            order = Order.objects.create(
-                user=request.user,
+            order = cart.checkout(
                 payment_method=request.data.get('payment_method', 'card'),
-                total_price=cart.total_price,
                 shipping_address=request.data.get('shipping_address', ''),
                 phone=request.data.get('phone', request.user.phone or ''),
                 email=request.data.get('email', request.user.email),
                 comment=request.data.get('comment', '')
             )
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-            for item in cart.items.all():
-                OrderItem.objects.create(
-                    order=order,
-                    product=item.product,
-                    quantity=item.quantity,
-                    price=item.product.price
-                )
+        serializer = OrderSerializer(order)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-                item.product.quantity -= item.quantity
-                item.product.save()
+    @idempotent
+    def update(self, request, *args, **kwargs):
+        return super().update(request, *args, **kwargs)
 
-            cart.items.all().delete()
+    @idempotent
+    def partial_update(self, request, *args, **kwargs):
+        return super().partial_update(request, *args, **kwargs)
 
-            serializer = OrderSerializer(order)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+    @idempotent
+    def destroy(self, request, *args, **kwargs):
+        return super().destroy(request, *args, **kwargs)
 
+    @action(detail=False, methods=['get'])
+    def history(self, request):
+        """История заказов: краткие сводки с keyset-пагинацией."""
+        try:
+            orders, next_cursor = Order.objects.history_page(
+                request.user,
+                cursor=request.query_params.get('cursor'),
+                limit=_int_param(request, 'limit', 20, 1, 100)
+            )
         except ValueError as e:
             return Response(
                 {'error': str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        return Response({
+            'results': OrderSummarySerializer(orders, many=True).data,
+            'next_cursor': next_cursor,
+        })
+
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAdminUser])
+    def bulk_transition(self, request):
+        """Массовая смена статуса заказов (для персонала и склада)."""
+        serializer = OrderBulkTransitionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            changed = Order.objects.filter(
+                id__in=serializer.validated_data['ids']
+            ).bulk_transition(
+                serializer.validated_data['status'],
+                source=serializer.validated_data.get('source') or 'api'
+            )
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({'changed': changed})
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def events(self, request):
+        """Журнал смены статусов: события с id больше after."""
+        try:
+            after = _int_param(request, 'after', 0, 0, 2 ** 63 - 1)
+            limit = _int_param(request, 'limit', 500, 1, 5000)
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        events = list(OrderEvent.objects.filter(id__gt=after).order_by('id')[:limit])
+        return Response({
+            'results': OrderEventSerializer(events, many=True).data,
+            'last_id': events[-1].id if events else after,
+        })
+
+
+class SalesReportView(APIView):
+    """Отчёт о продажах за период по агрегатам (без обращения к заказам)."""
+    permission_classes = [permissions.IsAdminUser]
+
+    GROUPS = {
+        'day': (DailySales, None, None),
+        'product': (DailyProductSales, 'product_id', Product),
+        'category': (DailyCategorySales, 'category_id', Category),
+        'manufacturer': (DailyManufacturerSales, 'manufacturer_id', Manufacturer),
+    }
+
+    def get(self, request):
+        serializer = SalesReportQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        model, key_field, key_model = self.GROUPS[params['group_by']]
+        # Период задаёт клиент: агрегаты ограничены по времени на той БД,
+        # куда роутер отправит чтение; строки и итоги — из одного снимка
+        using = router.db_for_read(model)
+        with transaction_block(REPEATABLE_READ, read_only=True, using=using), \
+                statement_timeout(settings.REPORT_STATEMENT_TIMEOUT, using=using):
+            rows = model.objects.using(using).filter(day__gte=params['start'], day__lte=params['end'])
+
+            group_field = key_field or 'day'
+            rows = list(
+                rows.values(group_field)
+                .annotate(
+                    units=Sum('units'),
+                    revenue=Sum('revenue'),
+                    order_count=Sum('order_count'),
+                )
+                .order_by('-revenue')
+            )
+
+            totals = DailySales.objects.using(using).filter(
+                day__gte=params['start'], day__lte=params['end']
+            ).aggregate(
+                units=Sum('units'),
+                revenue=Sum('revenue'),
+                order_count=Sum('order_count'),
+            )
+
+        if key_model is not None:
+            names = dict(
+                key_model.objects.filter(id__in=[row[key_field] for row in rows])
+                .values_list('id', 'name')
+            )
+            for row in rows:
+                row['name'] = names.get(row[key_field], '')
+
+        return Response({'results': rows, 'totals': totals})
+
+
+class ExportView(APIView):
+    """
+    Потоковая выгрузка: /api/export/<orders|products|users>/?output=csv|ndjson&gzip=1.
+
+    Остальные GET-параметры — фильтры в формате фильтров админки.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    EXPORTERS = {
+        'orders': OrderExporter,
+        'products': ProductExporter,
+        'users': UserExporter,
+    }
+
+    def get(self, request, kind):
+        exporter_class = self.EXPORTERS.get(kind)
+        if exporter_class is None:
+            raise Http404
+
+        output = request.query_params.get('output', 'csv')
+        if output not in FORMATS:
+            return Response(
+                {'error': f'Формат должен быть одним из: {", ".join(FORMATS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        exporter = exporter_class()
+        try:
+            queryset = exporter.filter_queryset(exporter.get_queryset(), request.query_params)
+            queryset.exists()
+        except (ValueError, ValidationError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return streaming_export(
+            exporter,
+            queryset,
+            output=output,
+            gzip=request.query_params.get('gzip') in ('1', 'true')
+        )
+
+
+class DatabaseMetricsView(APIView):
+    """Метрики БД текущего процесса: пул соединений, повторы транзакций."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            'vendor': connection.vendor,
+            'pools': pool_metrics(),
+            'transactions': transaction_metrics(),
+        })
+
+
+class LogoutView(APIView):
+    """Выход из API: токен удаляется и сразу перестаёт действовать."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        Token.objects.filter(user=request.user).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 
 class UserRegistrationView(viewsets.GenericViewSet):
     """Регистрация пользователя через API."""
@@ -2,6 +2,8 @@
 Контекстные процессоры для проекта.
 """
 
+from django.db.models import Count
+
 from orders.models import Cart
 
 
@@ -10,10 +12,12 @@ def cart_context(request):
     context = {}
 
     if request.user.is_authenticated:
-        cart = Cart.objects.filter(user=request.user).first()
+        cart = Cart.objects.filter(user=request.user).annotate(
+            items_count=Count('items')
+        ).first()
         if cart:
             context['cart'] = cart
-            context['cart_items_count'] = cart.items.count()
+            context['cart_items_count'] = cart.items_count
         else:
             context['cart_items_count'] = 0
     else:
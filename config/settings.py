@@ -57,6 +57,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'utils.instrumentation.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -64,6 +65,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'utils.db_router.ReplicaStickinessMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -92,16 +94,71 @@ WSGI_APPLICATION = 'config.wsgi.application'
 
 # НАСТРОЙКИ БАЗЫ ДАННЫХ POSTGRESQL
 DATABASE_URL = os.environ.get('DATABASE_URL')
+# Размер пула соединений на процесс (0 — без пула, постоянные соединения)
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '10'))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '10'))
+# Таймаут любого SQL-запроса, мс (0 — без ограничения)
+DB_STATEMENT_TIMEOUT = int(os.environ.get('DB_STATEMENT_TIMEOUT', '30000'))
+# Более жёсткий таймаут для отчётов за произвольный период (utils.db.statement_timeout)
+REPORT_STATEMENT_TIMEOUT = int(os.environ.get('REPORT_STATEMENT_TIMEOUT', '5000'))
+# Подготовка запросов на сервере после N выполнений (только psycopg 3)
+DB_PREPARE_THRESHOLD = os.environ.get('DB_PREPARE_THRESHOLD')
+
 if DATABASE_URL:
    DATABASES = {
        'default': dj_database_url.config(
-           engine='django.db.backends.postgresql',
+           engine='utils.db_backends.postgresql_pool' if DB_POOL_SIZE else 'django.db.backends.postgresql',
            default=DATABASE_URL,
-           conn_max_age=600,
+           conn_max_age=0 if DB_POOL_SIZE else 600,
            conn_health_checks=True,
            ssl_require=True,
        )
    }
+   _db_options = DATABASES['default'].setdefault('OPTIONS', {})
+   if DB_POOL_SIZE:
+       _db_options['pool'] = {'max_size': DB_POOL_SIZE, 'timeout': DB_POOL_TIMEOUT}
+   if DB_STATEMENT_TIMEOUT:
+       _db_options['options'] = f'-c statement_timeout={DB_STATEMENT_TIMEOUT}'
+   if DB_PREPARE_THRESHOLD:
+       _db_options['server_side_binding'] = True
+       _db_options['prepare_threshold'] = int(DB_PREPARE_THRESHOLD)
+
+   # Реплики только для чтения: REPLICA_DATABASE_URLS=url1,url2
+   for _index, _url in enumerate(filter(None, os.environ.get('REPLICA_DATABASE_URLS', '').split(',')), 1):
+       _replica = dj_database_url.parse(_url, conn_max_age=DATABASES['default']['CONN_MAX_AGE'])
+       if _replica['ENGINE'] == 'django.db.backends.postgresql':
+           _replica['ENGINE'] = DATABASES['default']['ENGINE']
+           _replica['OPTIONS'] = {**_db_options, **_replica.get('OPTIONS', {})}
+       _replica['TEST'] = {'MIRROR': 'default'}
+       DATABASES[f'replica_{_index}'] = _replica
+else:
+   # Локальный профиль для разработки и нагрузочных тестов: SQLite в режиме WAL
+   # (PRAGMA задаются при подключении, см. utils/db.py)
+   DATABASES = {
+       'default': {
+           'ENGINE': 'django.db.backends.sqlite3',
+           'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+           # Постоянные соединения: PRAGMA выполняются один раз, а не на каждый запрос
+           'CONN_MAX_AGE': 600,
+           'OPTIONS': {'timeout': 20},
+       }
+   }
+   # Локальная проверка маршрутизации: REPLICA_SQLITE_PATH — вторая база
+   # (копия основной), чтение каталога и заказов пойдёт в неё
+   if os.environ.get('REPLICA_SQLITE_PATH'):
+       DATABASES['replica_1'] = {
+           'ENGINE': 'django.db.backends.sqlite3',
+           'NAME': os.environ['REPLICA_SQLITE_PATH'],
+           'CONN_MAX_AGE': 600,
+           'OPTIONS': {'timeout': 20},
+           'TEST': {'MIRROR': 'default'},
+       }
+
+# Чтение моделей этих приложений уходит на реплики (см. utils/db_router.py)
+DATABASE_ROUTERS = ['utils.db_router.PrimaryReplicaRouter']
+REPLICA_READ_APPS = ['products', 'orders']
+# Сколько секунд после записи пользователь читает с основной БД
+REPLICA_LAG_WINDOW = int(os.environ.get('REPLICA_LAG_WINDOW', '5'))
 
 # DATABASES = {
 #     'default': {
@@ -175,7 +232,7 @@ LOGOUT_REDIRECT_URL = 'home'
 # НАСТРОЙКИ REST FRAMEWORK
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -188,3 +245,49 @@ REST_FRAMEWORK = {
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+
+# Idempotency-Key для изменяющих эндпоинтов API
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+IDEMPOTENCY_WAIT_TIMEOUT = 10
+# Сколько держится ключ выполняющегося запроса, если процесс упал
+IDEMPOTENCY_LEASE_TIMEOUT = 60
+
+# Генератор номеров заказов (см. orders/numbering.py)
+ORDER_NUMBER_GENERATOR = os.environ.get(
+    'ORDER_NUMBER_GENERATOR', 'orders.numbering.SnowflakeOrderNumberGenerator'
+)
+# База номеров воркеров хоста: к ней прибавляется слот процесса. Хостам с
+# общей БД задаются базы с шагом не меньше числа процессов на хосте
+ORDER_NUMBER_WORKER_ID = os.environ.get('ORDER_NUMBER_WORKER_ID')
+ORDER_NUMBER_LOCK_DIR = os.environ.get('ORDER_NUMBER_LOCK_DIR')
+
+# Общий кэш воркеров: REDIS_URL=redis://host:6379/0. Без него кэш Django
+# живёт в памяти каждого процесса
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Кэш аутентификации по токену (см. users/authentication.py). Общий уровень
+# включается только с общим кэшем: иначе отзыв токена, сделанный одним
+# воркером, другие воркеры не увидели бы до истечения TTL
+TOKEN_AUTH_CACHE_TTL = 300 if REDIS_URL else 0
+TOKEN_AUTH_LOCAL_TTL = 5
+
+# Учёт SQL-запросов (см. utils/instrumentation.py)
+SQL_INSTRUMENTATION_SAMPLE_RATE = float(
+    os.environ.get('SQL_INSTRUMENTATION_SAMPLE_RATE', '1.0' if DEBUG else '0.05')
+)
+SQL_SLOW_QUERY_MS = 100
+SQL_SLOW_REQUEST_MS = 500
+SQL_N_PLUS_ONE_THRESHOLD = 5
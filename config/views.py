@@ -6,24 +6,22 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q
+from django.db.models import Count
 
 from products.models import Product, Category
-from orders.models import Cart, CartItem, Order
+from orders.models import ArchivedOrder, Cart, CartItem, Order, ProductRecommendation
 from users.models import User
 
 
 def home(request):
     """Главная страница."""
     # Получаем категории с количеством товаров
-    from django.db.models import Count  # Добавьте этот импорт в начале файла
-
     categories = Category.objects.annotate(
         product_count=Count('products')
     ).order_by('-product_count')[:4]  # Берем 4 самые популярные
 
     # Получаем популярные товары (первые 8)
-    products = Product.objects.filter(quantity__gt=0)[:8]
+    products = Product.objects.filter(quantity__gt=0).for_listing()[:8]
 
     context = {
         'categories': categories,
@@ -34,26 +32,15 @@ def home(request):
 
 def products_list(request):
     """Каталог товаров."""
-    products = Product.objects.all()
-    categories = Category.objects.all()
-
-    category_id = request.GET.get('category')
-    if category_id:
-        products = products.filter(category_id=category_id)
-
-    search = request.GET.get('search')
-    if search:
-        products = products.filter(
-            Q(name__icontains=search) |
-            Q(description__icontains=search)
-        )
-
-    min_price = request.GET.get('min_price')
-    max_price = request.GET.get('max_price')
-    if min_price:
-        products = products.filter(price__gte=min_price)
-    if max_price:
-        products = products.filter(price__lte=max_price)
+    products = Product.objects.for_listing().filter_catalog(
+        category=request.GET.get('category'),
+        manufacturer=request.GET.get('manufacturer'),
+        min_price=request.GET.get('min_price'),
+        max_price=request.GET.get('max_price'),
+        search=request.GET.get('search'),
+        spec=request.GET.get('spec'),
+    )
+    categories = Category.objects.annotate(product_count=Count('products'))
 
     context = {
         'products': products,
@@ -64,10 +51,11 @@ def products_list(request):
 
 def product_detail(request, product_id):
     """Детальная страница товара."""
-    product = get_object_or_404(Product, id=product_id)
+    product = get_object_or_404(Product.objects.with_details(), id=product_id)
 
     context = {
         'product': product,
+        'recommendations': ProductRecommendation.objects.for_product(product),
     }
     return render(request, 'products/detail.html', context)
 
@@ -75,7 +63,12 @@ def product_detail(request, product_id):
 @login_required
 def order_detail_view(request, order_id):
     """Детальная страница заказа."""
-    order = get_object_or_404(Order, id=order_id, user=request.user)
+    order = Order.objects.prefetch_related('items').filter(
+        id=order_id, user=request.user
+    ).first()
+    if order is None:
+        archived = get_object_or_404(ArchivedOrder, id=order_id, user=request.user)
+        order, items = archived.unpack()
 
     context = {
         'order': order,
@@ -90,22 +83,13 @@ def add_to_cart(request, product_id):
         product = get_object_or_404(Product, id=product_id)
         quantity = int(request.POST.get('quantity', 1))
 
-        if quantity > product.quantity:
-            messages.error(request,
-                f'Недостаточно товара. Доступно: {product.quantity}')
-            return redirect('product_detail', product_id=product_id)
-
         cart, created = Cart.objects.get_or_create(user=request.user)
 
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            product=product,
-            defaults={'quantity': quantity}
-        )
-
-        if not created:
-            cart_item.quantity += quantity
-            cart_item.save()
+        try:
+            CartItem.objects.add(cart, product.id, quantity)
+        except ValueError as e:
+            messages.error(request, str(e))
+            return redirect('product_detail', product_id=product_id)
 
         messages.success(request, f'Товар "{product.name}" добавлен в корзину')
 
@@ -117,7 +101,7 @@ def cart_view(request):
     """
     Страница корзины.
     """
-    cart = Cart.objects.filter(user=request.user).first()
+    cart = Cart.objects.filter(user=request.user).with_items().first()
 
     if not cart:
         cart = Cart.objects.create(user=request.user)
@@ -156,6 +140,9 @@ def cart_view(request):
 
     context = {
         'cart': cart,
+        'recommendations': ProductRecommendation.objects.for_products(
+            item.product_id for item in cart.items.all()
+        ),
     }
     return render(request, 'orders/cart.html', context)
 
@@ -163,36 +150,22 @@ def cart_view(request):
 @login_required
 def checkout_view(request):
     """Оформление заказа."""
-    cart = Cart.objects.filter(user=request.user).first()
+    cart = Cart.objects.filter(user=request.user).with_items().first()
 
-    if not cart or not cart.items.exists():
+    if not cart or not cart.items.all():
         messages.warning(request, 'Ваша корзина пуста')
         return redirect('cart')
 
     if request.method == 'POST':
         try:
-            order = Order.objects.create(
-                user=request.user,
+            order = cart.checkout(
                 payment_method=request.POST.get('payment_method', 'card'),
-                total_price=cart.total_price,
                 shipping_address=request.POST.get('shipping_address', ''),
                 phone=request.POST.get('phone', request.user.phone or ''),
                 email=request.POST.get('email', request.user.email),
                 comment=request.POST.get('comment', '')
             )
 
-            for cart_item in cart.items.all():
-                order.items.create(
-                    product=cart_item.product,
-                    quantity=cart_item.quantity,
-                    price=cart_item.product.price
-                )
-
-                cart_item.product.quantity -= cart_item.quantity
-                cart_item.product.save()
-
-            cart.items.all().delete()
-
             messages.success(request, f'Заказ #{order.order_number} успешно оформлен!')
             return redirect('order_success', order_number=order.order_number)
 
@@ -235,10 +208,16 @@ def profile_view(request):
 @login_required
 def orders_list(request):
     """Список заказов."""
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
+    try:
+        orders, next_cursor = Order.objects.history_page(
+            request.user, cursor=request.GET.get('cursor')
+        )
+    except ValueError:
+        return redirect('orders_list')
 
     context = {
         'orders': orders,
+        'next_cursor': next_cursor,
     }
     return render(request, 'users/orders.html', context)
 
@@ -0,0 +1,55 @@
+"""
+Настройки gunicorn; файл читается автоматически из рабочего каталога.
+
+Приложение импортируется в мастере до fork (preload_app): код, URLconf и
+скомпилированные шаблоны загружаются один раз, а воркеры делят эту память
+через copy-on-write и сразу готовы отвечать. Число воркеров и порт задают
+переменные окружения WEB_CONCURRENCY и PORT, которые gunicorn читает сам.
+"""
+
+import gc
+import os
+
+wsgi_app = 'config.wsgi:application'
+preload_app = True
+
+
+def when_ready(server):
+    """Прогрев в мастере: всё, что Django иначе загрузил бы на первом запросе."""
+    from django.template import engines
+    from django.template.exceptions import TemplateSyntaxError
+    from django.urls import get_resolver
+
+    # Импортирует все urls.py и представления
+    get_resolver().url_patterns
+
+    # Кэширующий загрузчик хранит скомпилированные шаблоны в движке. Прогреваются
+    # шаблоны проекта (DIRS): у сторонних есть требующие необязательных пакетов
+    for engine in engines.all():
+        for directory in engine.engine.dirs:
+            for root, dirs, files in os.walk(directory):
+                for name in files:
+                    if not name.endswith('.html'):
+                        continue
+                    path = os.path.relpath(os.path.join(root, name), directory)
+                    try:
+                        engine.get_template(path)
+                    except TemplateSyntaxError as e:
+                        server.log.warning('Шаблон %s не прогрет: %s', path, e)
+
+    # Индекс подсказок поиска тоже строится до fork и достаётся воркерам готовым
+    from products import suggest
+    try:
+        suggest.rebuild()
+    except Exception as e:
+        server.log.warning('Индекс подсказок не построен: %s', e)
+
+    # Объекты мастера дальше не меняются: сборщик мусора в воркерах не
+    # будет их обходить и копировать страницы памяти
+    gc.freeze()
+
+
+def pre_fork(server, worker):
+    # Соединение с БД, открытое в мастере, не должно достаться воркерам
+    from django.db import connections
+    connections.close_all()
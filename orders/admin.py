@@ -1,36 +1,159 @@
-from django.contrib import admin
-from .models import Order, OrderItem, Cart, CartItem
+from django.contrib import admin, messages
+from django.db.models import Count, F, Sum
+
+from utils.exports import export_action
+from utils.pagination import EstimatedCountPaginator
+
+from .exports import OrderExporter
+from .models import ArchivedOrder, Order, OrderEvent, OrderItem, Cart, CartItem
 
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
+    autocomplete_fields = ['product']
+    readonly_fields = ['product_name', 'product_slug', 'product_image', 'product_specs']
 
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ['order_number', 'user', 'status', 'total_price', 'created_at']
     list_filter = ['status', 'payment_method', 'created_at']
-    search_fields = ['order_number', 'user__username', 'phone', 'email']
+    search_fields = ['=order_number', '^user__username', '=phone', '=email']
     readonly_fields = ['order_number', 'created_at', 'updated_at']
+    autocomplete_fields = ['user']
     inlines = [OrderItemInline]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = [
+        'mark_processing', 'mark_shipped', 'mark_delivered', 'mark_cancelled',
+        export_action(OrderExporter),
+        export_action(OrderExporter, output='ndjson', description='Экспорт в NDJSON'),
+    ]
 
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('user')
 
+    def save_model(self, request, obj, form, change):
+        if change and 'status' in form.changed_data:
+            new_status = obj.status
+            obj.status = form.initial['status']
+            try:
+                obj.transition_to(new_status, source='admin')
+            except ValueError as e:
+                messages.error(request, str(e))
+                obj.status = form.initial['status']
+            form.changed_data.remove('status')
+        super().save_model(request, obj, form, change)
+
+    def _transition(self, request, queryset, status):
+        changed = queryset.bulk_transition(status, source='admin')
+        skipped = queryset.count() - changed
+        self.message_user(request, f'Изменено заказов: {changed}, пропущено: {skipped}')
+
+    @admin.action(description='Перевести в сборку')
+    def mark_processing(self, request, queryset):
+        self._transition(request, queryset, 'processing')
+
+    @admin.action(description='Отметить отправленными')
+    def mark_shipped(self, request, queryset):
+        self._transition(request, queryset, 'shipped')
+
+    @admin.action(description='Отметить доставленными')
+    def mark_delivered(self, request, queryset):
+        self._transition(request, queryset, 'delivered')
+
+    @admin.action(description='Отменить')
+    def mark_cancelled(self, request, queryset):
+        self._transition(request, queryset, 'cancelled')
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    list_display = ['order_number', 'user', 'status', 'total_price', 'created_at', 'archived_at']
+    list_filter = ['status']
+    search_fields = ['order_number', 'user__username']
+    exclude = ['payload']
+    actions = ['restore']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user').defer('payload')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.action(description='Вернуть из архива')
+    def restore(self, request, queryset):
+        restored = 0
+        for archived in queryset.select_related(None).only('id', 'payload'):
+            archived.restore()
+            restored += 1
+        self.message_user(request, f'Восстановлено заказов: {restored}')
+
+
+@admin.register(OrderEvent)
+class OrderEventAdmin(admin.ModelAdmin):
+    list_display = ['id', 'order', 'from_status', 'to_status', 'source', 'created_at']
+    list_filter = ['to_status', 'source']
+    raw_id_fields = ['order']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class CartItemInline(admin.TabularInline):
+    model = CartItem
+    extra = 0
+    autocomplete_fields = ['product']
+
 
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
     list_display = ['user', 'item_count', 'total_price', 'updated_at']
+    list_select_related = ['user']
+    search_fields = ['^user__username', '=user__email']
+    autocomplete_fields = ['user']
+    inlines = [CartItemInline]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            items_total=Count('items'),
+            price_total=Sum(F('items__quantity') * F('items__product__price')),
+        )
 
     def item_count(self, obj):
-        return obj.items.count()
+        return obj.items_total
     item_count.short_description = 'Товаров в корзине'
+    item_count.admin_order_field = 'items_total'
 
     def total_price(self, obj):
-        return obj.total_price
+        return obj.price_total or 0
     total_price.short_description = 'Общая сумма'
+    total_price.admin_order_field = 'price_total'
+
+
+@admin.register(OrderItem)
+class OrderItemAdmin(admin.ModelAdmin):
+    list_display = ['order', 'product_name', 'quantity', 'price']
+    list_select_related = ['order']
+    search_fields = ['=order__order_number', '^product_name']
+    autocomplete_fields = ['order', 'product']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
-admin.site.register(OrderItem)
-admin.site.register(CartItem)
\ No newline at end of file
+@admin.register(CartItem)
+class CartItemAdmin(admin.ModelAdmin):
+    list_display = ['cart', 'product', 'quantity']
+    list_select_related = ['cart__user', 'product']
+    autocomplete_fields = ['cart', 'product']
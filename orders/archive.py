@@ -0,0 +1,52 @@
+"""
+Архивация завершённых заказов.
+
+Заказы в статусах delivered/cancelled, не менявшиеся дольше заданного
+срока, переносятся пачками в ArchivedOrder. Рабочие таблицы orders_order
+и orders_orderitem и их индексы остаются небольшими.
+"""
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedOrder, Order, OrderItem
+
+
+def archive_batch(cutoff, batch_size=500):
+    """Архивирует одну пачку заказов. Возвращает число перенесённых заказов."""
+    with transaction.atomic():
+        orders = list(
+            Order.objects.select_for_update()
+            .filter(status__in=ArchivedOrder.ARCHIVE_STATUSES, updated_at__lt=cutoff)
+            .order_by('id')[:batch_size]
+        )
+        if not orders:
+            return 0
+
+        ids = [order.id for order in orders]
+        items = {}
+        for item in OrderItem.objects.filter(order_id__in=ids).order_by('id'):
+            items.setdefault(item.order_id, []).append(item)
+
+        ArchivedOrder.objects.bulk_create([
+            ArchivedOrder.from_order(order, items.get(order.id, []))
+            for order in orders
+        ])
+        Order.objects.filter(id__in=ids).delete()
+        return len(orders)
+
+
+def archive_orders(days, batch_size=500, max_batches=None):
+    """Архивирует заказы, завершённые более days дней назад."""
+    cutoff = timezone.now() - timedelta(days=days)
+    total = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        archived = archive_batch(cutoff, batch_size)
+        if not archived:
+            break
+        total += archived
+        batches += 1
+    return total
@@ -0,0 +1,81 @@
+"""
+Выгрузка заказов с позициями.
+"""
+
+from utils.exports import Exporter
+
+from .models import ArchivedOrder, Order
+
+
+class OrderExporter(Exporter):
+    name = 'orders'
+    filter_params = (
+        'status__exact', 'payment_method__exact', 'user_id__exact',
+        'created_at__gte', 'created_at__lt',
+    )
+    csv_header = (
+        'order_number', 'created_at', 'status', 'payment_method', 'total_price',
+        'username', 'email', 'phone', 'shipping_address',
+        'product_id', 'product_name', 'quantity', 'price',
+    )
+
+    # Фильтры, которые есть в колонках архива; способ оплаты — только в данных заказа
+    archived_filter_params = ('status__exact', 'user_id__exact', 'created_at__gte', 'created_at__lt')
+
+    def __init__(self):
+        self.archived = ArchivedOrder.objects.none()
+        self.payment_method = None
+
+    def get_queryset(self):
+        return Order.objects.select_related('user').prefetch_related('items')
+
+    def filter_queryset(self, queryset, params):
+        """
+        Фильтрует рабочие заказы и запоминает те же фильтры для архива:
+        выгрузка с фильтрами (API) продолжается архивными заказами.
+        """
+        self.archived = super().filter_queryset(
+            ArchivedOrder.objects.select_related('user'), params, self.archived_filter_params
+        )
+        self.payment_method = params.get('payment_method__exact', params.get('payment_method')) or None
+        return super().filter_queryset(queryset, params)
+
+    def iter_objects(self, queryset):
+        yield from super().iter_objects(queryset)
+        for archived in super().iter_objects(self.archived.using(queryset.db)):
+            order, items = archived.unpack()
+            if self.payment_method and order.payment_method != self.payment_method:
+                continue
+            order.user = archived.user
+            yield order
+
+    def csv_rows(self, order):
+        head = [
+            order.order_number, order.created_at.isoformat(), order.status,
+            order.payment_method, order.total_price, order.user.username,
+            order.email, order.phone, order.shipping_address,
+        ]
+        for item in order.items.all():
+            yield head + [item.product_id or '', item.product_name, item.quantity, item.price]
+
+    def as_json(self, order):
+        return {
+            'order_number': order.order_number,
+            'created_at': order.created_at.isoformat(),
+            'status': order.status,
+            'payment_method': order.payment_method,
+            'total_price': str(order.total_price),
+            'username': order.user.username,
+            'email': order.email,
+            'phone': order.phone,
+            'shipping_address': order.shipping_address,
+            'items': [
+                {
+                    'product_id': item.product_id,
+                    'product_name': item.product_name,
+                    'quantity': item.quantity,
+                    'price': str(item.price),
+                }
+                for item in order.items.all()
+            ],
+        }
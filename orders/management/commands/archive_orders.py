@@ -0,0 +1,24 @@
+"""
+Перенос завершённых заказов в архив.
+"""
+
+from django.core.management.base import BaseCommand
+
+from orders.archive import archive_orders
+
+
+class Command(BaseCommand):
+    help = 'Архивирует заказы delivered/cancelled старше заданного числа дней'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=180)
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--max-batches', type=int, default=None)
+
+    def handle(self, *args, **options):
+        archived = archive_orders(
+            options['days'],
+            batch_size=options['batch_size'],
+            max_batches=options['max_batches'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Архивировано заказов: {archived}'))
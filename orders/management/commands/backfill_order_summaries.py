@@ -0,0 +1,49 @@
+"""
+Заполнение сводки и снимков товаров для заказов, оформленных до их появления.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+
+from orders.models import Order, OrderItem
+
+
+class Command(BaseCommand):
+    help = 'Заполняет сводку заказов и снимки товаров в позициях старых заказов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        items = OrderItem.objects.select_related('product').order_by('id')
+        last_id = 0
+        updated = 0
+
+        while True:
+            batch = list(
+                Order.objects.filter(id__gt=last_id, items_count=0)
+                .prefetch_related(Prefetch('items', queryset=items))
+                .order_by('id')[:batch_size]
+            )
+            if not batch:
+                break
+
+            order_items = [item for order in batch for item in order.items.all()]
+            missing = [item for item in order_items if not item.product_name]
+            OrderItem.capture_snapshots(missing)
+            OrderItem.objects.bulk_update(
+                missing, ['product_name', 'product_slug', 'product_image', 'product_specs']
+            )
+
+            for order in batch:
+                order.fill_summary(list(order.items.all()))
+            Order.objects.bulk_update(
+                batch, ['items_count', 'first_item_name', 'first_item_image']
+            )
+
+            updated += len(batch)
+            last_id = batch[-1].id
+            self.stdout.write(f'Обработано заказов: {updated}')
+
+        self.stdout.write(self.style.SUCCESS(f'Готово, обновлено заказов: {updated}'))
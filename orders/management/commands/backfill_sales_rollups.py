@@ -0,0 +1,81 @@
+"""
+Пересчёт агрегатов продаж за период параллельными отрезками.
+
+Заказы берутся в состоянии на отметку журнала: при полном пересчёте —
+последнее событие, которое затем становится отметкой, при пересчёте
+периода — текущая отметка. На PostgreSQL отметка заблокирована на всё
+время пересчёта, и update_sales_rollups ждёт его окончания; на SQLite
+их нельзя запускать одновременно.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from orders.models import ArchivedOrder, Order, OrderEvent, RollupWatermark
+from orders.rollups import WATERMARK, day_chunks, rebuild_days
+
+
+def _rebuild_chunk(start, end, last_event_id):
+    try:
+        rebuild_days(start, end, last_event_id)
+    finally:
+        connection.close()
+    return start, end
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает агрегаты продаж за период с нуля'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help='Первый день (YYYY-MM-DD)')
+        parser.add_argument('--end', type=date.fromisoformat, help='Последний день (YYYY-MM-DD)')
+        parser.add_argument('--chunk-days', type=int, default=7)
+        parser.add_argument('--workers', type=int, default=4)
+
+    def handle(self, *args, **options):
+        locking = connection.features.has_select_for_update
+        with transaction.atomic() if locking else nullcontext():
+            watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=WATERMARK)
+            self._backfill(watermark, options)
+
+    def _backfill(self, watermark, options):
+        full = options['start'] is None and options['end'] is None
+        if full:
+            # События после этой отметки дочитает update_sales_rollups
+            last_event_id = OrderEvent.objects.aggregate(last=Max('id'))['last'] or 0
+        else:
+            last_event_id = watermark.last_event_id
+
+        # Границы по рабочим и архивным заказам
+        bounds = [
+            model.objects.aggregate(first=Min('created_at'), last=Max('created_at'))
+            for model in (Order, ArchivedOrder)
+        ]
+        firsts = [bound['first'] for bound in bounds if bound['first'] is not None]
+        if not firsts:
+            self.stdout.write('Заказов нет')
+            return
+
+        start = options['start'] or timezone.localdate(min(firsts))
+        end = options['end'] or timezone.localdate(max(bound['last'] for bound in bounds if bound['last']))
+        if start > end:
+            raise CommandError('--start позже --end')
+
+        chunks = list(day_chunks(start, end, options['chunk_days']))
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            futures = [executor.submit(_rebuild_chunk, *chunk, last_event_id) for chunk in chunks]
+            for done, future in enumerate(as_completed(futures), 1):
+                chunk_start, chunk_end = future.result()
+                self.stdout.write(f'[{done}/{len(chunks)}] {chunk_start} — {chunk_end}')
+
+        if full:
+            watermark.last_event_id = last_event_id
+            watermark.save(update_fields=['last_event_id', 'updated_at'])
+
+        self.stdout.write(self.style.SUCCESS('Агрегаты пересчитаны'))
@@ -0,0 +1,39 @@
+"""
+Рекомендации «часто покупают вместе» по журналу заказов.
+
+Обычный запуск дочитывает журнал OrderEvent с прошлой отметки (удобно по
+cron после update_sales_rollups); первый запуск считает пары по всем
+заказам. --refresh-all дополнительно пересчитывает lift у всех товаров,
+--reset заново считает пары по всем рабочим и архивным заказам.
+"""
+
+from django.core.management.base import BaseCommand
+
+from orders.recommendations import backfill, process_events, refresh_all
+
+
+class Command(BaseCommand):
+    help = 'Дочитывает журнал OrderEvent и обновляет рекомендации к товарам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--refresh-all', action='store_true',
+                            help='Пересчитать рекомендации всех товаров после прохода')
+        parser.add_argument('--reset', action='store_true',
+                            help='Посчитать счётчики заново по всем заказам')
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            self.stdout.write(f'Товаров с рекомендациями после пересчёта: {backfill()}')
+
+        total = 0
+        while True:
+            processed = process_events(batch_size=options['batch_size'])
+            if not processed:
+                break
+            total += processed
+        self.stdout.write(f'Обработано событий: {total}')
+
+        if options['refresh_all']:
+            self.stdout.write(f'Пересчитаны рекомендации товаров: {refresh_all()}')
+        self.stdout.write(self.style.SUCCESS('Готово'))
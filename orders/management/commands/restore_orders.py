@@ -0,0 +1,24 @@
+"""
+Возврат заказов из архива в рабочие таблицы.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.models import ArchivedOrder
+
+
+class Command(BaseCommand):
+    help = 'Восстанавливает архивные заказы по номерам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('order_numbers', nargs='+')
+
+    def handle(self, *args, **options):
+        archived = list(ArchivedOrder.objects.filter(order_number__in=options['order_numbers']))
+        missing = set(options['order_numbers']) - {order.order_number for order in archived}
+        if missing:
+            raise CommandError(f'Нет в архиве: {", ".join(sorted(missing))}')
+
+        for order in archived:
+            order.restore()
+            self.stdout.write(f'Восстановлен заказ {order.order_number}')
@@ -0,0 +1,24 @@
+"""
+Инкрементальное обновление агрегатов продаж по журналу заказов.
+"""
+
+from django.core.management.base import BaseCommand
+
+from orders.rollups import process_events
+
+
+class Command(BaseCommand):
+    help = 'Дочитывает журнал OrderEvent и обновляет агрегаты продаж'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            processed = process_events(batch_size=options['batch_size'])
+            if not processed:
+                break
+            total += processed
+
+        self.stdout.write(self.style.SUCCESS(f'Обработано событий: {total}'))
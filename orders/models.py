@@ -2,13 +2,143 @@
 Модели для заказов и корзины с поддержкой транзакций.
 """
 
-from django.db import models
+import base64
+import json
+import zlib
+from datetime import datetime
+
+from django.core.files.storage import default_storage
+from django.db import models, connection
 from django.utils import timezone
 from django.db import transaction
 from django.core.exceptions import ValidationError
 
+from utils.transactions_utils import REPEATABLE_READ, transaction_block, transactional
+
+from .numbering import generate_order_number
+
+
+class OrderQuerySet(models.QuerySet):
+    """QuerySet заказов."""
+    SUMMARY_FIELDS = (
+        'id', 'order_number', 'status', 'total_price', 'created_at',
+        'items_count', 'first_item_name', 'first_item_image',
+    )
+
+    def summaries(self):
+        """Только поля краткой сводки: без позиций и товаров."""
+        return self.only(*self.SUMMARY_FIELDS)
+
+    def history_page(self, user, cursor=None, limit=20):
+        """
+        Страница истории заказов с keyset-пагинацией по (created_at, id).
+
+        Возвращает (orders, next_cursor); next_cursor равен None на последней странице.
+        """
+        position = decode_cursor(cursor) if cursor else None
+        # Рабочие и архивные заказы читаются из одного снимка одной БД:
+        # иначе заказ, архивированный между запросами, пропал бы или задвоился
+        using = self.db
+        with transaction_block(REPEATABLE_READ, read_only=True, using=using):
+            orders = self._history_slice(
+                self.using(using).filter(user=user).summaries(), position, limit
+            )
+
+            # Архивные заказы подмешиваются прозрачно: обе выборки идут
+            # по одному ключу, поэтому достаточно слить их вершины
+            archived = ArchivedOrder.objects.using(using).filter(user=user).defer('payload')
+            orders += self._history_slice(archived, position, limit)
+        orders.sort(key=lambda order: (order.created_at, order.id), reverse=True)
+
+        next_cursor = None
+        if len(orders) > limit:
+            orders = orders[:limit]
+            next_cursor = encode_cursor(orders[-1])
+        return orders, next_cursor
+
+    @staticmethod
+    def _history_slice(queryset, position, limit):
+        queryset = queryset.order_by('-created_at', '-id')
+        if position:
+            created_at, pk = position
+            queryset = queryset.filter(
+                models.Q(created_at__lt=created_at) |
+                models.Q(created_at=created_at, id__lt=pk)
+            )
+        return list(queryset[:limit + 1])
+
+    def bulk_transition(self, to_status, source='', batch_size=1000):
+        """
+        Переводит заказы выборки в статус to_status пачками.
+
+        На каждую пачку — один UPDATE ... WHERE status IN (допустимые исходные)
+        и одна вставка OrderEvent через bulk_create. Заказы, для которых
+        переход запрещён, пропускаются. Возвращает число изменённых заказов.
+        """
+        sources = Order.allowed_sources(to_status)
+        if not sources:
+            raise ValueError(f'Недопустимый статус: {to_status}')
+
+        candidates = self.filter(status__in=sources).order_by('id').values_list('id', flat=True)
+        last_id = 0
+        changed = 0
+
+        while True:
+            ids = list(candidates.filter(id__gt=last_id)[:batch_size])
+            if not ids:
+                return changed
+            last_id = ids[-1]
+
+            with transaction.atomic():
+                rows = list(
+                    Order.objects.select_for_update()
+                    .filter(id__in=ids, status__in=sources)
+                    .values_list('id', 'status')
+                )
+                if not rows:
+                    continue
+
+                Order.objects.filter(
+                    id__in=[order_id for order_id, _ in rows],
+                    status__in=sources
+                ).update(status=to_status, updated_at=timezone.now())
 
-class Order(models.Model):
+                OrderEvent.objects.bulk_create([
+                    OrderEvent(
+                        order_id=order_id,
+                        from_status=from_status,
+                        to_status=to_status,
+                        source=source
+                    )
+                    for order_id, from_status in rows
+                ])
+                changed += len(rows)
+
+
+def encode_cursor(order):
+    raw = f'{order.created_at.isoformat()}|{order.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Некорректный курсор')
+
+
+class OrderSummaryMixin:
+    """Общее для заказа и архивного заказа в истории."""
+
+    @property
+    def first_item_image_url(self):
+        if self.first_item_image:
+            return default_storage.url(self.first_item_image)
+        return ''
+
+
+class Order(OrderSummaryMixin, models.Model):
     """Заказ."""
     STATUS_CHOICES = [
         ('pending', 'В обработке'),
@@ -18,6 +148,15 @@ class Order(models.Model):
         ('cancelled', 'Отменен'),
     ]
 
+    # Допустимые переходы статусов
+    TRANSITIONS = {
+        'pending': ('processing', 'cancelled'),
+        'processing': ('shipped', 'cancelled'),
+        'shipped': ('delivered',),
+        'delivered': (),
+        'cancelled': (),
+    }
+
     PAYMENT_METHOD_CHOICES = [
         ('card', 'Карта онлайн'),
         ('cash', 'Наличные'),
@@ -40,6 +179,13 @@ class Order(models.Model):
     created_at = models.DateTimeField('Дата создания', auto_now_add=True)
     updated_at = models.DateTimeField('Дата обновления', auto_now=True)
 
+    # Сводка для истории заказов, заполняется при оформлении
+    items_count = models.PositiveIntegerField('Количество товаров', default=0)
+    first_item_name = models.CharField('Первый товар', max_length=200, blank=True)
+    first_item_image = models.CharField('Изображение первого товара', max_length=255, blank=True)
+
+    objects = OrderQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Заказ'
         verbose_name_plural = 'Заказы'
@@ -55,14 +201,49 @@ class Order(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.order_number:
-            timestamp = timezone.now().strftime('%Y%m%d%H%M%S')
-            self.order_number = f'ORD-{timestamp}-{self.user.id}'
+            self.order_number = generate_order_number(self)
         super().save(*args, **kwargs)
 
-    @transaction.atomic
+    @classmethod
+    def allowed_sources(cls, to_status):
+        """Статусы, из которых разрешён переход в to_status."""
+        return [
+            status for status, targets in cls.TRANSITIONS.items()
+            if to_status in targets
+        ]
+
+    def can_transition_to(self, status):
+        return status in self.TRANSITIONS.get(self.status, ())
+
+    @transactional
+    def transition_to(self, status, source=''):
+        """Переводит заказ в новый статус и записывает событие."""
+        if not self.can_transition_to(status):
+            raise ValueError(
+                f'Переход {self.get_status_display()} → '
+                f'{dict(self.STATUS_CHOICES).get(status, status)} запрещён'
+            )
+
+        from_status = self.status
+        self.status = status
+        self.save(update_fields=['status', 'updated_at'])
+        OrderEvent.objects.create(
+            order=self, from_status=from_status, to_status=status, source=source
+        )
+
+    def fill_summary(self, order_items):
+        """Заполняет сводку по снимкам позиций заказа (без сохранения)."""
+        self.items_count = sum(item.quantity for item in order_items)
+        self.first_item_name = ''
+        self.first_item_image = ''
+        if order_items:
+            self.first_item_name = order_items[0].product_name
+            self.first_item_image = order_items[0].product_image
+
+    @transactional(isolation=REPEATABLE_READ)
     def process_order(self):
         """Обработка заказа с блокировками."""
-        for order_item in self.items.select_for_update().all():
+        for order_item in self.items.select_for_update().filter(product__isnull=False):
             product = order_item.product
 
             locked_product = type(product).objects.select_for_update().get(pk=product.pk)
@@ -77,11 +258,146 @@ class Order(models.Model):
             locked_product.quantity = models.F('quantity') - order_item.quantity
             locked_product.save(update_fields=['quantity'])
 
-        self.status = 'processing'
-        self.save(update_fields=['status'])
+        self.transition_to('processing')
         return True
 
 
+class OrderEvent(models.Model):
+    """
+    Событие смены статуса заказа. Журнал только дополняется;
+    потребители читают его инкрементально по id.
+    """
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='events'
+    )
+    from_status = models.CharField('Из статуса', max_length=20, blank=True)
+    to_status = models.CharField('В статус', max_length=20)
+    source = models.CharField('Источник', max_length=50, blank=True)
+    created_at = models.DateTimeField('Дата', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Событие заказа'
+        verbose_name_plural = 'События заказов'
+        ordering = ['id']
+
+    def __str__(self):
+        return f'{self.order_id}: {self.from_status or "—"} → {self.to_status}'
+
+
+class ArchivedOrder(OrderSummaryMixin, models.Model):
+    """
+    Заказ, перенесённый из рабочих таблиц в архив.
+
+    Сводка хранится в колонках (для истории заказов), полный заказ
+    с позициями — в сжатом zlib JSON. id совпадает с id исходного заказа.
+    """
+    ARCHIVE_STATUSES = ('delivered', 'cancelled')
+
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(
+        'users.User',
+        on_delete=models.CASCADE,
+        related_name='archived_orders'
+    )
+    order_number = models.CharField('Номер заказа', max_length=20, unique=True)
+    status = models.CharField('Статус', max_length=20, choices=Order.STATUS_CHOICES)
+    total_price = models.DecimalField('Общая сумма', max_digits=12, decimal_places=2)
+    created_at = models.DateTimeField('Дата создания')
+    items_count = models.PositiveIntegerField('Количество товаров', default=0)
+    first_item_name = models.CharField('Первый товар', max_length=200, blank=True)
+    first_item_image = models.CharField('Изображение первого товара', max_length=255, blank=True)
+    archived_at = models.DateTimeField('Дата архивации', auto_now_add=True)
+    payload = models.BinaryField('Данные заказа')
+
+    class Meta:
+        verbose_name = 'Архивный заказ'
+        verbose_name_plural = 'Архивные заказы'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at']),
+        ]
+
+    def __str__(self):
+        return self.order_number
+
+    @staticmethod
+    def _dump(instance):
+        return {
+            field.attname: field.value_from_object(instance)
+            for field in instance._meta.concrete_fields
+        }
+
+    @staticmethod
+    def _load(model, data):
+        return model(**{
+            field.attname: field.to_python(data[field.attname])
+            for field in model._meta.concrete_fields
+            if field.attname in data
+        })
+
+    @classmethod
+    def from_order(cls, order, order_items):
+        payload = {
+            'order': cls._dump(order),
+            'items': [cls._dump(item) for item in order_items],
+        }
+        return cls(
+            id=order.id,
+            user_id=order.user_id,
+            order_number=order.order_number,
+            status=order.status,
+            total_price=order.total_price,
+            created_at=order.created_at,
+            items_count=order.items_count,
+            first_item_name=order.first_item_name,
+            first_item_image=order.first_item_image,
+            payload=zlib.compress(json.dumps(payload, default=str).encode()),
+        )
+
+    def unpack(self):
+        """
+        Возвращает (order, items) — несохранённые экземпляры Order и OrderItem.
+
+        Позиции кладутся в кеш предзагрузки, поэтому order.items.all()
+        работает без запросов, как у обычного заказа.
+        """
+        data = json.loads(zlib.decompress(bytes(self.payload)))
+        order = self._load(Order, data['order'])
+        items = [self._load(OrderItem, item) for item in data['items']]
+
+        items_queryset = OrderItem.objects.none()
+        items_queryset._result_cache = items
+        items_queryset._prefetch_done = True
+        order._prefetched_objects_cache = {'items': items_queryset}
+        return order, items
+
+    @transaction.atomic
+    def restore(self):
+        """Возвращает заказ в рабочие таблицы и удаляет его из архива."""
+        from products.models import Product
+
+        order, items = self.unpack()
+        existing = set(
+            Product.objects.filter(id__in=[item.product_id for item in items if item.product_id])
+            .values_list('id', flat=True)
+        )
+        for item in items:
+            if item.product_id not in existing:
+                item.product_id = None
+
+        created_at, updated_at = order.created_at, order.updated_at
+        Order.objects.bulk_create([order])
+        # auto_now_add/auto_now перезаписываются при вставке — возвращаем исходные даты
+        Order.objects.filter(pk=order.pk).update(created_at=created_at, updated_at=updated_at)
+        order.created_at, order.updated_at = created_at, updated_at
+        OrderItem.objects.bulk_create(items)
+        self.delete()
+        return order
+
+
 class OrderItem(models.Model):
     """Элемент заказа."""
     order = models.ForeignKey(
@@ -91,23 +407,98 @@ class OrderItem(models.Model):
     )
     product = models.ForeignKey(
         'products.Product',
-        on_delete=models.CASCADE,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
         verbose_name='Товар'
     )
     quantity = models.IntegerField('Количество')
     price = models.DecimalField('Цена за единицу', max_digits=10, decimal_places=2)
 
+    # Снимок товара на момент покупки: история заказов не читает каталог
+    product_name = models.CharField('Название товара', max_length=200, blank=True)
+    product_slug = models.SlugField('URL товара', max_length=200, blank=True)
+    product_image = models.CharField('Изображение товара', max_length=255, blank=True)
+    product_specs = models.JSONField('Характеристики товара', default=dict, blank=True)
+
+    SNAPSHOT_SPECS_LIMIT = 5
+
     class Meta:
         verbose_name = 'Позиция заказа'
         verbose_name_plural = 'Позиции заказов'
 
     def __str__(self):
-        return f"{self.product.name} x {self.quantity}"
+        return f"{self.product_name} x {self.quantity}"
+
+    def save(self, *args, **kwargs):
+        if not self.product_name and self.product_id:
+            self.capture_snapshots([self])
+        super().save(*args, **kwargs)
 
     @property
     def total_price(self):
         return self.price * self.quantity
 
+    @property
+    def product_image_url(self):
+        if self.product_image:
+            return default_storage.url(self.product_image)
+        return ''
+
+    @classmethod
+    def capture_snapshots(cls, order_items):
+        """
+        Заполняет снимок товара для списка позиций.
+
+        Изображения и характеристики всех товаров читаются двумя запросами.
+        """
+        from products.models import ProductImage, Specification
+
+        product_ids = {item.product_id for item in order_items if item.product_id}
+        if not product_ids:
+            return
+
+        images = {}
+        for product_id, image in (
+            ProductImage.objects.filter(product_id__in=product_ids)
+            .order_by('-is_main', 'id')
+            .values_list('product_id', 'image')
+        ):
+            images.setdefault(product_id, image)
+
+        specs = {}
+        for product_id, name, value in (
+            Specification.objects.filter(product_id__in=product_ids)
+            .order_by('id')
+            .values_list('product_id', 'name', 'value')
+        ):
+            product_specs = specs.setdefault(product_id, {})
+            if len(product_specs) < cls.SNAPSHOT_SPECS_LIMIT:
+                product_specs[name] = value
+
+        for item in order_items:
+            if not item.product_id:
+                continue
+            item.product_name = item.product.name[:200]
+            item.product_slug = item.product.slug
+            item.product_image = images.get(item.product_id, '')
+            item.product_specs = specs.get(item.product_id, {})
+
+
+class CartQuerySet(models.QuerySet):
+    """QuerySet корзин."""
+
+    def with_items(self):
+        """Позиции корзины с товарами, их категориями, производителями и изображениями."""
+        return self.prefetch_related(
+            models.Prefetch(
+                'items',
+                queryset=CartItem.objects.select_related(
+                    'product__category', 'product__manufacturer'
+                ).prefetch_related('product__images', 'product__specifications').order_by('id')
+            )
+        )
+
 
 class Cart(models.Model):
     """Корзина покупок."""
@@ -119,6 +510,8 @@ class Cart(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CartQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Корзина'
         verbose_name_plural = 'Корзины'
@@ -131,44 +524,223 @@ class Cart(models.Model):
         """Общая стоимость товаров в корзине."""
         return sum(item.total_price for item in self.items.all())
 
-    @transaction.atomic
-    def checkout(self):
-        """Оформление заказа из корзины с блокировками."""
-        for cart_item in self.items.select_for_update().all():
-            product = cart_item.product
-
-            locked_product = type(product).objects.select_for_update().get(pk=product.pk)
+    @transactional(isolation=REPEATABLE_READ)
+    def checkout(self, **order_fields):
+        """
+        Оформление заказа из корзины с блокировками.
+
+        order_fields переопределяют поля заказа (способ оплаты, адрес,
+        телефон, email, комментарий); по умолчанию берутся из профиля.
+        Позиции корзины читаются без блокировки: если параллельный запрос
+        изменит их до удаления, удаление даст ошибку сериализации
+        (REPEATABLE READ) и оформление повторится, а не потеряет позицию.
+        """
+        from products.models import Product
+
+        # Не из кэша prefetch_related: позиции читаются внутри транзакции
+        cart_items = list(CartItem.objects.filter(cart=self))
+        if not cart_items:
+            raise ValueError('Корзина пуста')
+
+        products = Product.objects.select_for_update().order_by('id').in_bulk(
+            [item.product_id for item in cart_items]
+        )
 
-            if cart_item.quantity > locked_product.quantity:
+        for cart_item in cart_items:
+            product = products[cart_item.product_id]
+            if cart_item.quantity > product.quantity:
                 raise ValueError(
-                    f'Недостаточно товара: {locked_product.name}. '
-                    f'Доступно: {locked_product.quantity}'
+                    f'Недостаточно товара: {product.name}. '
+                    f'Доступно: {product.quantity}'
                 )
 
-        order = Order.objects.create(
+        fields = {
+            'payment_method': 'card',
+            'shipping_address': self.user.address or '',
+            'phone': self.user.phone or '',
+            'email': self.user.email,
+            'comment': 'Заказ из корзины',
+        }
+        fields.update(order_fields)
+
+        order = Order(
             user=self.user,
-            payment_method='card',
-            total_price=self.total_price,
-            shipping_address=self.user.address or '',
-            phone=self.user.phone or '',
-            email=self.user.email,
-            comment='Заказ из корзины'
+            total_price=sum(
+                products[item.product_id].price * item.quantity for item in cart_items
+            ),
+            **fields
         )
-
-        for cart_item in self.items.all():
-            OrderItem.objects.create(
+        order_items = [
+            OrderItem(
                 order=order,
-                product=cart_item.product,
-                quantity=cart_item.quantity,
-                price=cart_item.product.price
+                product=products[item.product_id],
+                quantity=item.quantity,
+                price=products[item.product_id].price
             )
+            for item in cart_items
+        ]
+        OrderItem.capture_snapshots(order_items)
+        order.fill_summary(order_items)
+        order.save()
+        OrderItem.objects.bulk_create(order_items)
+        OrderEvent.objects.create(order=order, from_status='', to_status=order.status)
 
-            cart_item.product.quantity -= cart_item.quantity
-            cart_item.product.save()
+        for cart_item in cart_items:
+            products[cart_item.product_id].quantity -= cart_item.quantity
+        Product.objects.bulk_update(products.values(), ['quantity'])
 
-        self.items.all().delete()
+        CartItem.objects.filter(cart=self).delete()
         return order
 
+    @transactional(isolation=REPEATABLE_READ)
+    def apply_operations(self, operations):
+        """
+        Применяет пачку операций над корзиной в одной транзакции.
+
+        Операция — словарь {'op': 'add'|'set'|'remove', 'product_id', 'quantity'}.
+        Остатки по всем товарам проверяются одним запросом, изменения
+        записываются через bulk_create/bulk_update и одно удаление.
+
+        Количества записываются абсолютными, поэтому имеющиеся позиции
+        блокируются до чтения. Позицию, которую параллельный
+        CartItem.objects.add вставил после начала транзакции, заблокировать
+        нельзя: её запись даёт ошибку сериализации (REPEATABLE READ, на
+        SQLite — устаревший снимок WAL), и транзакция повторяется.
+        """
+        from products.models import Product
+
+        product_ids = {op['product_id'] for op in operations}
+        items = {
+            item.product_id: item
+            for item in self.items.select_for_update().filter(product_id__in=product_ids)
+        }
+        stock = dict(
+            Product.objects.filter(id__in=product_ids).values_list('id', 'quantity')
+        )
+
+        missing = product_ids - stock.keys()
+        if missing:
+            raise ValueError(f'Товары не найдены: {", ".join(map(str, sorted(missing)))}')
+
+        quantities = {product_id: item.quantity for product_id, item in items.items()}
+        for op in operations:
+            product_id = op['product_id']
+            quantity = op.get('quantity', 1)
+            if op['op'] == 'add':
+                quantities[product_id] = quantities.get(product_id, 0) + quantity
+            elif op['op'] == 'set':
+                quantities[product_id] = quantity
+            elif op['op'] == 'remove':
+                quantities[product_id] = 0
+            else:
+                raise ValueError(f'Неизвестная операция: {op["op"]}')
+
+        errors = [
+            f'товар {product_id}: доступно {stock[product_id]}'
+            for product_id, quantity in quantities.items()
+            if quantity > stock[product_id]
+        ]
+        if errors:
+            raise ValueError(f'Недостаточно товара: {"; ".join(errors)}')
+
+        to_create, to_update, to_delete = [], [], []
+        for product_id, quantity in quantities.items():
+            item = items.get(product_id)
+            if quantity <= 0:
+                if item:
+                    to_delete.append(item.id)
+            elif item is None:
+                to_create.append(CartItem(cart=self, product_id=product_id, quantity=quantity))
+            elif item.quantity != quantity:
+                item.quantity = quantity
+                to_update.append(item)
+
+        if to_create:
+            CartItem.objects.bulk_create(
+                to_create,
+                update_conflicts=True,
+                unique_fields=['cart', 'product'],
+                update_fields=['quantity'],
+            )
+        if to_update:
+            CartItem.objects.bulk_update(to_update, ['quantity'])
+        if to_delete:
+            CartItem.objects.filter(id__in=to_delete).delete()
+
+    def reorder(self, order):
+        """Добавляет в корзину все позиции прошлого заказа."""
+        operations = [
+            {'op': 'add', 'product_id': product_id, 'quantity': quantity}
+            for product_id, quantity in (
+                order.items.filter(product__isnull=False).values_list('product_id', 'quantity')
+            )
+        ]
+        if operations:
+            self.apply_operations(operations)
+
+
+class CartItemManager(models.Manager):
+    """Менеджер элементов корзины."""
+
+    def add(self, cart, product_id, quantity):
+        """
+        Добавляет товар в корзину одним запросом INSERT ... ON CONFLICT.
+
+        Количество увеличивается атомарно, остаток проверяется в том же
+        запросе. Возвращает обновлённую позицию корзины.
+        """
+        if quantity <= 0:
+            raise ValueError('Количество должно быть положительным')
+
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            return self._add_with_lock(cart, product_id, quantity)
+
+        from products.models import Product
+
+        qn = connection.ops.quote_name
+        table = qn(self.model._meta.db_table)
+        products = qn(Product._meta.db_table)
+        sql = (
+            f'INSERT INTO {table} (cart_id, product_id, quantity) '
+            f'SELECT %s, p.id, %s FROM {products} p '
+            f'WHERE p.id = %s AND p.quantity >= %s '
+            f'ON CONFLICT (cart_id, product_id) DO UPDATE '
+            f'SET quantity = {table}.quantity + excluded.quantity '
+            f'WHERE {table}.quantity + excluded.quantity <= '
+            f'(SELECT quantity FROM {products} WHERE id = excluded.product_id) '
+            f'RETURNING id, quantity'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [cart.pk, quantity, product_id, quantity])
+            row = cursor.fetchone()
+
+        if row is None:
+            self._raise_not_enough(product_id)
+
+        return self.model(id=row[0], cart=cart, product_id=product_id, quantity=row[1])
+
+    @transactional
+    def _add_with_lock(self, cart, product_id, quantity):
+        from products.models import Product
+
+        product = Product.objects.select_for_update().get(pk=product_id)
+        cart_item, created = self.select_for_update().get_or_create(
+            cart=cart, product=product, defaults={'quantity': 0}
+        )
+        if cart_item.quantity + quantity > product.quantity:
+            self._raise_not_enough(product_id)
+        cart_item.quantity += quantity
+        cart_item.save(update_fields=['quantity'])
+        return cart_item
+
+    def _raise_not_enough(self, product_id):
+        from products.models import Product
+
+        available = Product.objects.filter(pk=product_id).values_list('quantity', flat=True).first()
+        if available is None:
+            raise Product.DoesNotExist(f'Товар {product_id} не найден')
+        raise ValueError(f'Недостаточно товара. Доступно: {available}')
+
 
 class CartItem(models.Model):
     """Элемент корзины."""
@@ -184,6 +756,8 @@ class CartItem(models.Model):
     )
     quantity = models.IntegerField('Количество', default=1)
 
+    objects = CartItemManager()
+
     class Meta:
         verbose_name = 'Элемент корзины'
         verbose_name_plural = 'Элементы корзины'
@@ -201,4 +775,192 @@ class CartItem(models.Model):
             raise ValidationError(
                 f'Недостаточно товара "{self.product.name}". '
                 f'Доступно: {self.product.quantity}'
-            )
\ No newline at end of file
+            )
+
+
+class SalesRollup(models.Model):
+    """Базовая агрегированная строка продаж за день."""
+    day = models.DateField('День')
+    units = models.IntegerField('Продано единиц', default=0)
+    revenue = models.DecimalField('Выручка', max_digits=14, decimal_places=2, default=0)
+    order_count = models.IntegerField('Заказов', default=0)
+
+    class Meta:
+        abstract = True
+
+
+class DailySales(SalesRollup):
+    """Продажи за день."""
+
+    class Meta:
+        verbose_name = 'Продажи за день'
+        verbose_name_plural = 'Продажи по дням'
+        constraints = [
+            models.UniqueConstraint(fields=['day'], name='unique_daily_sales'),
+        ]
+
+
+class DailyProductSales(SalesRollup):
+    """Продажи товара за день."""
+    product = models.ForeignKey(
+        'products.Product',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+'
+    )
+
+    class Meta:
+        verbose_name = 'Продажи товара за день'
+        verbose_name_plural = 'Продажи товаров по дням'
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product'], name='unique_daily_product_sales'),
+        ]
+
+
+class DailyCategorySales(SalesRollup):
+    """Продажи категории за день."""
+    category = models.ForeignKey(
+        'products.Category',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+'
+    )
+
+    class Meta:
+        verbose_name = 'Продажи категории за день'
+        verbose_name_plural = 'Продажи категорий по дням'
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'category'], name='unique_daily_category_sales'),
+        ]
+
+
+class DailyManufacturerSales(SalesRollup):
+    """Продажи производителя за день."""
+    manufacturer = models.ForeignKey(
+        'products.Manufacturer',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+'
+    )
+
+    class Meta:
+        verbose_name = 'Продажи производителя за день'
+        verbose_name_plural = 'Продажи производителей по дням'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'manufacturer'], name='unique_daily_manufacturer_sales'
+            ),
+        ]
+
+
+class RollupWatermark(models.Model):
+    """Позиция в журнале OrderEvent, до которой обработаны агрегаты."""
+    name = models.CharField(max_length=50, unique=True)
+    last_event_id = models.BigIntegerField(default=0)
+    # Заказов в агрегатах до last_event_id (созданные минус отменённые);
+    # ведут потребители, которым нужно их число (рекомендации)
+    orders = models.BigIntegerField('Учтено заказов', default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Отметка обработки журнала'
+        verbose_name_plural = 'Отметки обработки журнала'
+
+    def __str__(self):
+        return f'{self.name}: {self.last_event_id}'
+
+
+class ProductPairCount(models.Model):
+    """
+    Число заказов, в которых товары встретились вместе.
+
+    Пара хранится один раз (product_id <= other_id); строка с
+    product_id == other_id — число заказов с самим товаром.
+    """
+    product = models.ForeignKey(
+        'products.Product',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+'
+    )
+    other = models.ForeignKey(
+        'products.Product',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+'
+    )
+    orders = models.IntegerField('Заказов', default=0)
+
+    class Meta:
+        verbose_name = 'Совместные покупки'
+        verbose_name_plural = 'Совместные покупки'
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'other'], name='unique_product_pair'),
+        ]
+        indexes = [
+            models.Index(fields=['other']),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id} + {self.other_id}: {self.orders}'
+
+
+class ProductRecommendationQuerySet(models.QuerySet):
+
+    def for_product(self, product, limit=4):
+        """Рекомендации к товару, что есть в наличии; один запрос по индексу (product, rank)."""
+        return list(
+            self.filter(product=product, recommended__quantity__gt=0)
+            .select_related('recommended')
+            .order_by('rank')[:limit]
+        )
+
+    def for_products(self, product_ids, limit=4):
+        """
+        Рекомендации к набору товаров (корзине) одним запросом: товары
+        из набора пропускаются, у повторов остаётся лучший lift.
+        """
+        product_ids = list(product_ids)
+        if not product_ids:
+            return []
+        best = {}
+        queryset = (
+            self.filter(product_id__in=product_ids, recommended__quantity__gt=0)
+            .exclude(recommended_id__in=product_ids)
+            .select_related('recommended')
+            .order_by('-score')
+        )
+        for recommendation in queryset:
+            best.setdefault(recommendation.recommended_id, recommendation)
+        return list(best.values())[:limit]
+
+
+class ProductRecommendation(models.Model):
+    """Товар, который часто покупают вместе с product; rank 1 — самый сильный."""
+    product = models.ForeignKey(
+        'products.Product',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+'
+    )
+    recommended = models.ForeignKey(
+        'products.Product',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+'
+    )
+    rank = models.PositiveSmallIntegerField('Место')
+    score = models.FloatField('Lift')
+    orders = models.PositiveIntegerField('Заказов вместе')
+
+    objects = ProductRecommendationQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Рекомендация'
+        verbose_name_plural = 'Рекомендации'
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'rank'], name='unique_recommendation_rank'),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id} → {self.recommended_id} ({self.score:.2f})'
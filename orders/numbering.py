@@ -0,0 +1,170 @@
+"""
+Генераторы номеров заказов.
+
+Генератор выбирается настройкой ORDER_NUMBER_GENERATOR (путь к классу).
+По умолчанию используется SnowflakeOrderNumberGenerator: номер уникален
+без обращений к базе и сортируется по времени создания.
+"""
+
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+try:
+    import fcntl
+except ImportError:  # Windows: flock нет
+    fcntl = None
+
+DEFAULT_GENERATOR = 'orders.numbering.SnowflakeOrderNumberGenerator'
+
+# Base32 Крокфорда: без I, L, O, U, чтобы номер было легко продиктовать
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+
+
+def encode_base32(value, width):
+    chars = []
+    while value:
+        value, rem = divmod(value, 32)
+        chars.append(ALPHABET[rem])
+    return ''.join(reversed(chars)).rjust(width, '0')
+
+
+class SnowflakeOrderNumberGenerator:
+    """
+    K-сортируемый идентификатор: 41 бит миллисекунд от EPOCH_MS,
+    10 бит номера воркера и 12 бит счётчика внутри миллисекунды.
+
+    Номер воркера — база хоста ORDER_NUMBER_WORKER_ID (по умолчанию 0)
+    плюс слот процесса: первый свободный файл блокировки в
+    ORDER_NUMBER_LOCK_DIR, который процесс держит под flock до завершения.
+    Процессы одного хоста (воркеры gunicorn, фоновые задачи) так получают
+    разные номера, а слот упавшего процесса освобождает ядро. Хостам с
+    общей базой данных задаются базы с шагом не меньше числа процессов на
+    хосте. После fork() процесс занимает свой слот заново. Без flock
+    (Windows) номер воркера — сама база ORDER_NUMBER_WORKER_ID.
+    """
+    EPOCH_MS = 1704067200000  # 2024-01-01 UTC
+    WORKER_BITS = 10
+    SEQUENCE_BITS = 12
+    MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+    MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+    PREFIX = 'ORD-'
+
+    def __init__(self, worker_id=None):
+        self._explicit_worker_id = worker_id
+        self._slot_fd = None
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        if self._slot_fd is not None:
+            # Блокировку родителя держит его дескриптор; копию закрываем
+            os.close(self._slot_fd)
+            self._slot_fd = None
+        self._pid = os.getpid()
+        self.worker_id = self._resolve_worker_id()
+        self._last_ms = -1
+        self._sequence = 0
+
+    def _resolve_worker_id(self):
+        if self._explicit_worker_id is not None:
+            return self._check_worker_id(self._explicit_worker_id)
+        base = self._check_worker_id(getattr(settings, 'ORDER_NUMBER_WORKER_ID', None) or 0)
+        if fcntl is None:
+            return base
+        return base + self._acquire_slot(self.MAX_WORKER_ID - base)
+
+    def _check_worker_id(self, value):
+        # Обрезка по маске дала бы двум воркерам один номер
+        worker_id = int(value)
+        if not 0 <= worker_id <= self.MAX_WORKER_ID:
+            raise ValueError(f'Номер воркера {worker_id} вне диапазона 0..{self.MAX_WORKER_ID}')
+        return worker_id
+
+    def _acquire_slot(self, max_slot):
+        directory = getattr(settings, 'ORDER_NUMBER_LOCK_DIR', None) or tempfile.gettempdir()
+        for slot in range(max_slot + 1):
+            path = os.path.join(directory, f'order-number-worker-{slot}.lock')
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            self._slot_fd = fd
+            return slot
+        raise ValueError(f'Все номера воркеров заняты (каталог {directory})')
+
+    @staticmethod
+    def _now_ms():
+        return time.time_ns() // 1_000_000
+
+    def next_id(self):
+        with self._lock:
+            if os.getpid() != self._pid:
+                self._reset()
+
+            now = self._now_ms()
+            if now < self._last_ms:
+                # Часы ушли назад: продолжаем с последней метки
+                now = self._last_ms
+
+            if now == self._last_ms:
+                self._sequence = (self._sequence + 1) & self.MAX_SEQUENCE
+                if self._sequence == 0:
+                    while now <= self._last_ms:
+                        now = self._now_ms()
+            else:
+                self._sequence = 0
+
+            self._last_ms = now
+            return (
+                ((now - self.EPOCH_MS) << (self.WORKER_BITS + self.SEQUENCE_BITS))
+                | (self.worker_id << self.SEQUENCE_BITS)
+                | self._sequence
+            )
+
+    def __call__(self, order):
+        return f'{self.PREFIX}{encode_base32(self.next_id(), 13)}'
+
+
+class SequenceOrderNumberGenerator:
+    """Номер из последовательности PostgreSQL: ORD-00000042."""
+    SEQUENCE_NAME = 'orders_order_number_seq'
+    PREFIX = 'ORD-'
+
+    def __init__(self):
+        self._created = False
+
+    def __call__(self, order):
+        with connection.cursor() as cursor:
+            if not self._created:
+                cursor.execute(f'CREATE SEQUENCE IF NOT EXISTS {self.SEQUENCE_NAME}')
+                self._created = True
+            cursor.execute('SELECT nextval(%s)', [self.SEQUENCE_NAME])
+            value = cursor.fetchone()[0]
+        return f'{self.PREFIX}{value:08d}'
+
+
+_generator = None
+_generator_lock = threading.Lock()
+
+
+def get_order_number_generator():
+    """Возвращает сконфигурированный генератор (один на процесс)."""
+    global _generator
+    if _generator is None:
+        with _generator_lock:
+            if _generator is None:
+                path = getattr(settings, 'ORDER_NUMBER_GENERATOR', DEFAULT_GENERATOR)
+                _generator = import_string(path)()
+    return _generator
+
+
+def generate_order_number(order):
+    return get_order_number_generator()(order)
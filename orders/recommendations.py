@@ -0,0 +1,239 @@
+"""
+Рекомендации «часто покупают вместе» по совместным покупкам.
+
+Счётчики пар (ProductPairCount) обновляются по журналу OrderEvent, как
+агрегаты продаж: создание заказа добавляет его пары, отмена — вычитает.
+Пары пачки заказов считает БД самосоединением позиций по order_id с
+GROUP BY, так что в Python приходят уже свёрнутые счётчики, а не позиции.
+Пары архивных заказов считаются в Python по их сжатым данным.
+
+Первый проход (и backfill()) считает пары заново по всем рабочим и
+архивным заказам в состоянии на последнее событие журнала, включая
+заказы, созданные до его появления, и ставит отметку на это событие;
+дальше счётчики ведутся по журналу, как в update_sales_rollups.
+
+Сила связи — lift = N · n_ab / (n_a · n_b), где N — число заказов
+(ведётся в отметке вместе с позицией в журнале), n_a — заказов с товаром
+a, n_ab — заказов с обоими. Пары реже MIN_PAIR_ORDERS заказов и с lift
+не больше 1 не рекомендуются. Для
+товаров из обработанной пачки TOP_K соседей переписываются в
+ProductRecommendation; у остальных lift немного отстаёт (меняются N и
+n_b), пока refresh_all() не пересчитает всё.
+"""
+
+import heapq
+
+from django.db import connection, transaction
+from django.db.models import F, Max, Q
+
+from .models import (
+    ArchivedOrder, Order, OrderEvent, OrderItem, ProductPairCount, ProductRecommendation,
+    RollupWatermark,
+)
+from .rollups import as_of
+
+WATERMARK = 'recommendations'
+TOP_K = 10
+MIN_PAIR_ORDERS = 2
+# Товаров на один запрос: два списка IN укладываются в 999 параметров SQLite
+CHUNK_SIZE = 400
+
+CREATED = Q(from_status='')
+CANCELLED = Q(to_status='cancelled')
+
+
+def _chunks(values, size=CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def count_pairs(events):
+    """
+    {(a, b): заказов} по заказам из выборки событий events; a <= b,
+    пара (a, a) — заказы с товаром a.
+    """
+    order_ids = events.order_by().values('order_id')
+    return _pair_counts(order_ids, ArchivedOrder.objects.filter(id__in=order_ids))
+
+
+def _pair_counts(order_ids, archived):
+    """Пары по позициям заказов order_ids (выборка id) и по архивным заказам archived."""
+    subquery, params = order_ids.query.sql_with_params()
+    qn = connection.ops.quote_name
+    items = qn(OrderItem._meta.db_table)
+    sql = (
+        f'SELECT a.product_id, b.product_id, COUNT(DISTINCT a.order_id) '
+        f'FROM {items} a JOIN {items} b '
+        f'ON b.order_id = a.order_id AND b.product_id >= a.product_id '
+        f'WHERE a.order_id IN ({subquery}) GROUP BY a.product_id, b.product_id'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        counts = {(a, b): orders for a, b, orders in cursor.fetchall()}
+
+    for archived_order in archived.iterator(chunk_size=500):
+        order, order_items = archived_order.unpack()
+        products = sorted({item.product_id for item in order_items if item.product_id})
+        for index, a in enumerate(products):
+            for b in products[index:]:
+                counts[(a, b)] = counts.get((a, b), 0) + 1
+    return counts
+
+
+def _add_pairs(counts):
+    """Прибавляет счётчики пар: INSERT ... ON CONFLICT DO UPDATE."""
+    counts = {pair: orders for pair, orders in counts.items() if orders}
+    if not counts:
+        return
+
+    if connection.vendor not in ('postgresql', 'sqlite'):
+        for (a, b), orders in counts.items():
+            updated = ProductPairCount.objects.filter(product_id=a, other_id=b).update(
+                orders=F('orders') + orders
+            )
+            if not updated:
+                ProductPairCount.objects.create(product_id=a, other_id=b, orders=orders)
+        return
+
+    qn = connection.ops.quote_name
+    table = qn(ProductPairCount._meta.db_table)
+    sql = (
+        f'INSERT INTO {table} ({qn("product_id")}, {qn("other_id")}, {qn("orders")}) '
+        f'VALUES (%s, %s, %s) '
+        f'ON CONFLICT ({qn("product_id")}, {qn("other_id")}) DO UPDATE SET '
+        f'{qn("orders")} = {table}.{qn("orders")} + excluded.{qn("orders")}'
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [[a, b, orders] for (a, b), orders in counts.items()])
+
+
+def _product_orders(product_ids):
+    """{товар: заказов с ним} по диагональным строкам счётчиков."""
+    counts = {}
+    for chunk in _chunks(product_ids, CHUNK_SIZE * 2):
+        counts.update(
+            ProductPairCount.objects.filter(product_id__in=chunk, other_id=F('product_id'))
+            .values_list('product_id', 'orders')
+        )
+    return counts
+
+
+def top_neighbours(product_id, neighbours, product_orders, total):
+    """TOP_K пар (lift, заказов вместе, сосед) по убыванию lift."""
+    own = product_orders.get(product_id, 0)
+    if own <= 0 or total <= 0:
+        return []
+    candidates = []
+    for other_id, together in neighbours.items():
+        other = product_orders.get(other_id, 0)
+        if together < MIN_PAIR_ORDERS or other <= 0:
+            continue
+        lift = total * together / (own * other)
+        if lift > 1:
+            candidates.append((lift, together, other_id))
+    return heapq.nlargest(TOP_K, candidates)
+
+
+def refresh(product_ids, total):
+    """Переписывает рекомендации товаров product_ids по текущим счётчикам."""
+    for chunk in _chunks(sorted(product_ids)):
+        neighbours = {product_id: {} for product_id in chunk}
+        pairs = ProductPairCount.objects.filter(
+            Q(product_id__in=chunk) | Q(other_id__in=chunk), orders__gt=0,
+        ).exclude(product_id=F('other_id')).values_list('product_id', 'other_id', 'orders')
+        for a, b, orders in pairs:
+            if a in neighbours:
+                neighbours[a][b] = orders
+            if b in neighbours:
+                neighbours[b][a] = orders
+
+        involved = set(chunk).union(*(set(found) for found in neighbours.values()))
+        product_orders = _product_orders(involved)
+        recommendations = [
+            ProductRecommendation(
+                product_id=product_id, recommended_id=other_id,
+                rank=rank, score=round(lift, 4), orders=together,
+            )
+            for product_id in chunk
+            for rank, (lift, together, other_id) in enumerate(
+                top_neighbours(product_id, neighbours[product_id], product_orders, total), 1
+            )
+        ]
+        with transaction.atomic():
+            ProductRecommendation.objects.filter(product_id__in=chunk).delete()
+            ProductRecommendation.objects.bulk_create(recommendations, batch_size=1000)
+
+
+def process_events(batch_size=5000):
+    """
+    Учитывает новую пачку событий журнала заказов и обновляет рекомендации
+    затронутых товаров. Возвращает число событий (0 — журнал дочитан).
+    """
+    with transaction.atomic():
+        watermark, created = RollupWatermark.objects.select_for_update().get_or_create(name=WATERMARK)
+        if created:
+            _backfill(watermark)
+            return 0
+
+        ids = list(
+            OrderEvent.objects.filter(id__gt=watermark.last_event_id)
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0
+
+        events = OrderEvent.objects.filter(id__gt=watermark.last_event_id, id__lte=ids[-1])
+        created = events.filter(CREATED)
+        cancelled = events.filter(CANCELLED)
+        counts = count_pairs(created)
+        for pair, orders in count_pairs(cancelled).items():
+            counts[pair] = counts.get(pair, 0) - orders
+        _add_pairs(counts)
+
+        watermark.last_event_id = ids[-1]
+        watermark.orders += created.count() - cancelled.count()
+        watermark.save(update_fields=['last_event_id', 'orders', 'updated_at'])
+
+        affected = {a for a, b in counts} | {b for a, b in counts}
+        refresh(affected, watermark.orders)
+        return len(ids)
+
+
+def refresh_all():
+    """Пересчитывает рекомендации всех товаров по текущим счётчикам."""
+    watermark = RollupWatermark.objects.filter(name=WATERMARK).first()
+    if watermark is None:
+        return 0
+    counted = ProductPairCount.objects.filter(other_id=F('product_id'))
+    ProductRecommendation.objects.exclude(product_id__in=counted.values('product_id')).delete()
+    products = set(counted.values_list('product_id', flat=True))
+    refresh(products, watermark.orders)
+    return len(products)
+
+
+def _backfill(watermark):
+    last_event_id = OrderEvent.objects.aggregate(last=Max('id'))['last'] or 0
+    orders = as_of(Order.objects.order_by(), last_event_id).values('id')
+    archived = as_of(ArchivedOrder.objects.order_by(), last_event_id)
+    counts = _pair_counts(orders, archived)
+
+    ProductRecommendation.objects.all().delete()
+    ProductPairCount.objects.all().delete()
+    _add_pairs(counts)
+
+    # События после этой отметки дочитает process_events
+    watermark.last_event_id = last_event_id
+    watermark.orders = orders.count() + archived.count()
+    watermark.save(update_fields=['last_event_id', 'orders', 'updated_at'])
+    return refresh_all()
+
+
+def backfill():
+    """
+    Считает счётчики и рекомендации заново по всем заказам в состоянии на
+    последнее событие журнала (см. rollups.as_of). Возвращает число товаров.
+    """
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=WATERMARK)
+        return _backfill(watermark)
@@ -0,0 +1,249 @@
+"""
+Инкрементальные агрегаты продаж.
+
+Агрегаты обновляются по журналу OrderEvent: создание заказа добавляет его
+позиции, отмена — вычитает. Так оформление заказа не тратит время
+на пересчёт отчётов. Позиции заказов, перенесённых в архив, читаются из
+сжатых данных ArchivedOrder.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.db import connection, transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (
+    ArchivedOrder, DailySales, DailyProductSales, DailyCategorySales, DailyManufacturerSales,
+    OrderEvent, OrderItem, RollupWatermark,
+)
+
+WATERMARK = 'sales'
+
+# Модель агрегата -> поле-ключ (None для итогов за день) и путь от позиции заказа
+ROLLUPS = [
+    (DailySales, None, None),
+    (DailyProductSales, 'product_id', 'product_id'),
+    (DailyCategorySales, 'category_id', 'product__category_id'),
+    (DailyManufacturerSales, 'manufacturer_id', 'product__manufacturer_id'),
+]
+
+# Поля позиции заказа, из которых складываются агрегаты
+LINE_FIELDS = (
+    'order_id', 'order__created_at', 'product_id',
+    'product__category_id', 'product__manufacturer_id', 'quantity', 'price',
+)
+
+
+def _upsert_add(model, key_field, rows):
+    """Прибавляет значения к агрегатам: INSERT ... ON CONFLICT DO UPDATE."""
+    if not rows:
+        return
+
+    if connection.vendor not in ('postgresql', 'sqlite'):
+        for (day, key), (units, revenue, orders) in rows.items():
+            lookup = {'day': day}
+            if key_field:
+                lookup[key_field] = key
+            updated = model.objects.filter(**lookup).update(
+                units=F('units') + units,
+                revenue=F('revenue') + revenue,
+                order_count=F('order_count') + orders,
+            )
+            if not updated:
+                model.objects.create(units=units, revenue=revenue, order_count=orders, **lookup)
+        return
+
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    key_columns = ['day'] + ([key_field] if key_field else [])
+    columns = key_columns + ['units', 'revenue', 'order_count']
+    sql = (
+        f'INSERT INTO {table} ({", ".join(map(qn, columns))}) '
+        f'VALUES ({", ".join(["%s"] * len(columns))}) '
+        f'ON CONFLICT ({", ".join(map(qn, key_columns))}) DO UPDATE SET '
+        f'units = {table}.units + excluded.units, '
+        f'revenue = {table}.revenue + excluded.revenue, '
+        f'order_count = {table}.order_count + excluded.order_count'
+    )
+    params = [
+        [day] + ([key] if key_field else []) + [units, revenue, orders]
+        for (day, key), (units, revenue, orders) in rows.items()
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def record_orders(order_ids, sign=1):
+    """Добавляет (sign=1) или вычитает (sign=-1) заказы из агрегатов."""
+    if not order_ids:
+        return
+
+    items = OrderItem.objects.filter(order_id__in=order_ids).values_list(*LINE_FIELDS)
+    archived = ArchivedOrder.objects.filter(id__in=order_ids)
+
+    rows = _empty_rows()
+    _accumulate(rows, items, sign)
+    _accumulate(rows, archived_lines(archived), sign)
+    for model, key_field, _ in ROLLUPS:
+        _upsert_add(model, key_field, rows[model])
+
+
+def _empty_rows():
+    return {model: defaultdict(lambda: [0, Decimal(0), 0]) for model, _, _ in ROLLUPS}
+
+
+def _accumulate(rows, lines, sign):
+    """Добавляет позиции (в порядке LINE_FIELDS) к строкам агрегатов rows со знаком sign."""
+    seen = set()
+    for order_id, created_at, product_id, category_id, manufacturer_id, quantity, price in lines:
+        day = timezone.localdate(created_at)
+        keys = {
+            DailySales: None,
+            DailyProductSales: product_id,
+            DailyCategorySales: category_id,
+            DailyManufacturerSales: manufacturer_id,
+        }
+        for model, key_field, _ in ROLLUPS:
+            key = keys[model]
+            if key_field and key is None:
+                # Товар удалён из каталога — учитываем только в итогах за день
+                continue
+            row = rows[model][(day, key)]
+            row[0] += sign * quantity
+            row[1] += sign * price * quantity
+            if (model, day, key, order_id) not in seen:
+                seen.add((model, day, key, order_id))
+                row[2] += sign
+
+
+def archived_lines(archived, batch_size=500):
+    """
+    Позиции архивных заказов в порядке LINE_FIELDS. Категория и
+    производитель берутся из текущего каталога, как и у рабочих заказов.
+    """
+    from products.models import Product
+
+    orders = archived.iterator(chunk_size=batch_size)
+    while True:
+        batch = [archived_order.unpack() for archived_order in islice(orders, batch_size)]
+        if not batch:
+            return
+        product_ids = {item.product_id for _, items in batch for item in items if item.product_id}
+        catalog = {
+            product_id: (category_id, manufacturer_id)
+            for product_id, category_id, manufacturer_id in Product.objects.filter(id__in=product_ids)
+            .values_list('id', 'category_id', 'manufacturer_id')
+        }
+        for order, items in batch:
+            for item in items:
+                category_id, manufacturer_id = catalog.get(item.product_id, (None, None))
+                product_id = item.product_id if item.product_id in catalog else None
+                yield (order.id, order.created_at, product_id, category_id, manufacturer_id,
+                       item.quantity, item.price)
+
+
+def as_of(queryset, last_event_id, order_field='id', status_field='status'):
+    """
+    Заказы (или их позиции) в том состоянии, в каком их видел журнал на
+    событии last_event_id: без созданных позже и без отменённых до него.
+    Заказы и отмены без событий (до появления журнала) берутся по статусу.
+    """
+    events = OrderEvent.objects.filter(order_id=OuterRef(order_field))
+    cancellations = events.filter(to_status='cancelled')
+    return queryset.exclude(
+        Exists(events.filter(from_status='', id__gt=last_event_id))
+    ).exclude(
+        Exists(cancellations.filter(id__lte=last_event_id))
+    ).exclude(
+        Q(**{status_field: 'cancelled'}) & ~Exists(cancellations)
+    )
+
+
+def process_events(batch_size=5000):
+    """
+    Обрабатывает новую пачку событий журнала заказов.
+
+    Возвращает число обработанных событий (0 — журнал дочитан).
+    """
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=WATERMARK)
+        events = list(
+            OrderEvent.objects.filter(id__gt=watermark.last_event_id)
+            .order_by('id')
+            .values_list('id', 'order_id', 'from_status', 'to_status')[:batch_size]
+        )
+        if not events:
+            return 0
+
+        created = [order_id for _, order_id, from_status, _ in events if not from_status]
+        cancelled = [order_id for _, order_id, _, to_status in events if to_status == 'cancelled']
+        record_orders(created, sign=1)
+        record_orders(cancelled, sign=-1)
+
+        watermark.last_event_id = events[-1][0]
+        watermark.save(update_fields=['last_event_id', 'updated_at'])
+        return len(events)
+
+
+def rebuild_days(start, end, last_event_id):
+    """
+    Пересчитывает агрегаты за дни [start, end] с нуля по рабочим и
+    архивным заказам в состоянии на событие last_event_id (см. as_of):
+    события после него учтёт process_events, и ни одно не будет учтено дважды.
+    """
+    items = as_of(
+        OrderItem.objects.filter(
+            order__created_at__date__gte=start,
+            order__created_at__date__lte=end,
+        ),
+        last_event_id, order_field='order_id', status_field='order__status',
+    ).annotate(day=TruncDate('order__created_at'))
+
+    # Архивные заказы не агрегируются в SQL: их позиции внутри сжатых данных
+    archived = _empty_rows()
+    _accumulate(archived, archived_lines(as_of(
+        ArchivedOrder.objects.filter(created_at__date__gte=start, created_at__date__lte=end),
+        last_event_id,
+    )), 1)
+
+    with transaction.atomic():
+        for model, key_field, path in ROLLUPS:
+            model.objects.filter(day__gte=start, day__lte=end).delete()
+
+            group_by = ['day'] + ([path] if path else [])
+            aggregates = (
+                items.filter(**({f'{path}__isnull': False} if path else {}))
+                .values(*group_by)
+                .annotate(
+                    total_units=Sum('quantity'),
+                    total_revenue=Sum(F('price') * F('quantity')),
+                    total_orders=Count('order_id', distinct=True),
+                )
+                .order_by()
+            )
+            rows = archived[model]
+            for row in aggregates:
+                totals = rows[(row['day'], row[path] if path else None)]
+                totals[0] += row['total_units']
+                totals[1] += row['total_revenue']
+                totals[2] += row['total_orders']
+            model.objects.bulk_create([
+                model(
+                    day=day, units=units, revenue=revenue, order_count=orders,
+                    **({key_field: key} if key_field else {})
+                )
+                for (day, key), (units, revenue, orders) in rows.items()
+            ], batch_size=1000)
+
+
+def day_chunks(start, end, days):
+    """Разбивает диапазон дат на отрезки по days дней."""
+    while start <= end:
+        chunk_end = min(start + timedelta(days=days - 1), end)
+        yield start, chunk_end
+        start = chunk_end + timedelta(days=1)
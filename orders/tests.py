@@ -1,3 +1,563 @@
-from django.test import TestCase
+import multiprocessing
+import tempfile
+import threading
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import OperationalError, connections
+from django.test import (
+    SimpleTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature,
+)
+from django.utils import timezone
+
+from products.models import Category, Manufacturer, Product, ProductImage, Specification
+from users.models import User
+from utils.testing import ChangelistQueryBudgetMixin
+
+from . import numbering, recommendations, rollups
+from .archive import archive_orders
+from .exports import OrderExporter
+from .models import (
+    ArchivedOrder, Cart, CartItem, DailyProductSales, DailySales, Order, OrderEvent, OrderItem,
+    ProductPairCount, ProductRecommendation, RollupWatermark,
+)
+from .numbering import SnowflakeOrderNumberGenerator
+
+
+def _generate_numbers(generator, count, queue):
+    numbers = [generator(None) for _ in range(count)]
+    queue.put((generator.worker_id, numbers))
+
+
+class OrderNumberGeneratorTests(SimpleTestCase):
+    """Тесты генератора номеров заказов."""
+
+    def test_numbers_are_sortable_and_fit_field(self):
+        generator = SnowflakeOrderNumberGenerator(worker_id=1)
+        numbers = [generator(None) for _ in range(5000)]
+
+        self.assertEqual(numbers, sorted(numbers))
+        self.assertEqual(len(set(numbers)), len(numbers))
+        self.assertTrue(all(len(number) <= 20 for number in numbers))
+
+    def test_no_collisions_across_threads(self):
+        generator = SnowflakeOrderNumberGenerator(worker_id=2)
+        results = []
+        lock = threading.Lock()
+
+        def worker():
+            numbers = [generator(None) for _ in range(2000)]
+            with lock:
+                results.extend(numbers)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(set(results)), 8 * 2000)
+
+    def test_no_collisions_across_processes(self):
+        # Как в gunicorn с preload_app: генератор создан до fork, номера
+        # выдают воркеры, номер воркера определяется по умолчанию
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(ORDER_NUMBER_WORKER_ID=None, ORDER_NUMBER_LOCK_DIR=directory):
+            generator = SnowflakeOrderNumberGenerator()
+            ctx = multiprocessing.get_context('fork')
+            queue = ctx.Queue()
+            processes = [
+                ctx.Process(target=_generate_numbers, args=(generator, 5000, queue))
+                for _ in range(4)
+            ]
+            for process in processes:
+                process.start()
+            worker_ids, results = [], []
+            for _ in processes:
+                worker_id, numbers = queue.get(timeout=30)
+                worker_ids.append(worker_id)
+                results.extend(numbers)
+            for process in processes:
+                process.join()
+
+        self.assertEqual(len(set(worker_ids)), 4)
+        self.assertNotIn(generator.worker_id, worker_ids)
+        self.assertEqual(len(set(results)), 4 * 5000)
+
+    def test_worker_id_is_offset_by_host_base(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(ORDER_NUMBER_WORKER_ID='100', ORDER_NUMBER_LOCK_DIR=directory):
+            first = SnowflakeOrderNumberGenerator()
+            second = SnowflakeOrderNumberGenerator()
+
+        self.assertEqual((first.worker_id, second.worker_id), (100, 101))
+
+    def test_out_of_range_worker_id_is_rejected(self):
+        for worker_id in (-1, SnowflakeOrderNumberGenerator.MAX_WORKER_ID + 1):
+            with self.subTest(worker_id=worker_id), self.assertRaises(ValueError):
+                SnowflakeOrderNumberGenerator(worker_id=worker_id)
+        with override_settings(ORDER_NUMBER_WORKER_ID='5000'), self.assertRaises(ValueError):
+            SnowflakeOrderNumberGenerator()
+
+    def test_without_flock_base_is_the_worker_id(self):
+        with mock.patch.object(numbering, 'fcntl', None), \
+                override_settings(ORDER_NUMBER_WORKER_ID='7'):
+            generators = [SnowflakeOrderNumberGenerator() for _ in range(2)]
+
+        self.assertEqual([generator.worker_id for generator in generators], [7, 7])
+
+
+def _catalog(quantity=10):
+    category = Category.objects.create(name='Категория', slug='cat')
+    manufacturer = Manufacturer.objects.create(name='Производитель', country='RU')
+    return Product.objects.create(
+        name='Товар', slug='product', description='', price=100, quantity=quantity,
+        category=category, manufacturer=manufacturer,
+    )
+
+
+def _place_order(user, *lines, journal=True):
+    """Заказ с позициями [(товар, количество)] и, если journal, событием создания."""
+    order = Order.objects.create(
+        user=user, total_price=sum(product.price * quantity for product, quantity in lines),
+        payment_method='card', shipping_address='-', phone='-', email='b@example.com',
+    )
+    items = [
+        OrderItem(order=order, product=product, quantity=quantity, price=product.price)
+        for product, quantity in lines
+    ]
+    OrderItem.capture_snapshots(items)
+    OrderItem.objects.bulk_create(items)
+    if journal:
+        OrderEvent.objects.create(order=order, from_status='', to_status=order.status)
+    return order
+
+
+class CartItemAddTests(TestCase):
+    """Добавление в корзину одним запросом с проверкой остатка."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = _catalog(quantity=5)
+        cls.cart = Cart.objects.create(user=User.objects.create_user('buyer', 'b@example.com', 'x'))
+
+    def test_quantity_is_accumulated(self):
+        CartItem.objects.add(self.cart, self.product.id, 2)
+        item = CartItem.objects.add(self.cart, self.product.id, 3)
+
+        self.assertEqual(item.quantity, 5)
+        self.assertEqual(CartItem.objects.get(cart=self.cart).quantity, 5)
+
+    def test_insufficient_stock_leaves_item_unchanged(self):
+        with self.assertRaisesMessage(ValueError, 'Доступно: 5'):
+            CartItem.objects.add(self.cart, self.product.id, 6)
+        self.assertFalse(CartItem.objects.filter(cart=self.cart).exists())
+
+        CartItem.objects.add(self.cart, self.product.id, 4)
+        with self.assertRaisesMessage(ValueError, 'Доступно: 5'):
+            CartItem.objects.add(self.cart, self.product.id, 2)
+        self.assertEqual(CartItem.objects.get(cart=self.cart).quantity, 4)
+
+    def test_unknown_product(self):
+        with self.assertRaises(Product.DoesNotExist):
+            CartItem.objects.add(self.cart, 0, 1)
+
+
+class ConcurrentCartItemAddTests(TransactionTestCase):
+    """Параллельные добавления не теряются и не превышают остаток."""
+
+    def test_concurrent_adds(self):
+        product = _catalog(quantity=5)
+        cart = Cart.objects.create(user=User.objects.create_user('buyer', 'b@example.com', 'x'))
+        barrier = threading.Barrier(8)
+        results = []
+
+        def worker():
+            barrier.wait()
+            try:
+                while True:
+                    try:
+                        CartItem.objects.add(cart, product.id, 1)
+                        results.append('added')
+                    except ValueError:
+                        results.append('rejected')
+                    except OperationalError as e:
+                        # Тестовая SQLite в памяти (shared cache) не ждёт busy timeout,
+                        # а сразу отвечает "database table is locked"
+                        if 'locked' in str(e):
+                            continue
+                        results.append(repr(e))
+                    break
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(results), ['added'] * 5 + ['rejected'] * 3)
+        self.assertEqual(CartItem.objects.get(cart=cart).quantity, 5)
+
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_batch_does_not_overwrite_concurrent_adds(self):
+        product = _catalog(quantity=100000)
+        cart = Cart.objects.create(user=User.objects.create_user('buyer', 'b@example.com', 'x'))
+
+        def batch():
+            try:
+                for _ in range(50):
+                    cart.apply_operations([{'op': 'add', 'product_id': product.id, 'quantity': 1}])
+            finally:
+                connections.close_all()
+
+        def add():
+            try:
+                for _ in range(50):
+                    CartItem.objects.add(cart, product.id, 1)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=batch), threading.Thread(target=add)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(CartItem.objects.get(cart=cart).quantity, 100)
+
+
+class CartBatchTests(TestCase):
+    """Пачка операций над корзиной и повтор заказа."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('buyer', 'b@example.com', 'x')
+        cls.product = _catalog(quantity=5)
+        cls.other = Product.objects.create(
+            name='Другой', slug='other', description='', price=50, quantity=3,
+            category=cls.product.category, manufacturer=cls.product.manufacturer,
+        )
+        cls.cart = Cart.objects.create(user=cls.user)
+
+    def _quantities(self):
+        return dict(CartItem.objects.filter(cart=self.cart).values_list('product_id', 'quantity'))
+
+    def test_operations_are_applied_in_order(self):
+        CartItem.objects.add(self.cart, self.product.id, 1)
+        self.cart.apply_operations([
+            {'op': 'add', 'product_id': self.product.id, 'quantity': 2},
+            {'op': 'set', 'product_id': self.other.id, 'quantity': 2},
+            {'op': 'add', 'product_id': self.other.id, 'quantity': 1},
+        ])
+        self.assertEqual(self._quantities(), {self.product.id: 3, self.other.id: 3})
+
+        self.cart.apply_operations([{'op': 'remove', 'product_id': self.product.id}])
+        self.assertEqual(self._quantities(), {self.other.id: 3})
+
+    def test_insufficient_stock_rejects_whole_batch(self):
+        CartItem.objects.add(self.cart, self.product.id, 1)
+        with self.assertRaisesMessage(ValueError, f'товар {self.other.id}: доступно 3'):
+            self.cart.apply_operations([
+                {'op': 'add', 'product_id': self.product.id, 'quantity': 1},
+                {'op': 'add', 'product_id': self.other.id, 'quantity': 4},
+            ])
+        self.assertEqual(self._quantities(), {self.product.id: 1})
+
+    def test_reorder_adds_order_items(self):
+        CartItem.objects.add(self.cart, self.product.id, 1)
+        order = Order.objects.create(
+            user=self.user, total_price=100, payment_method='card',
+            shipping_address='-', phone='-', email='b@example.com',
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=self.product, quantity=2, price=100),
+            OrderItem(order=order, product=self.other, quantity=1, price=50),
+        ])
+        self.cart.reorder(order)
+        self.assertEqual(self._quantities(), {self.product.id: 3, self.other.id: 1})
+
+
+class OrderItemSnapshotTests(TestCase):
+    """Снимок товара в позиции заказа."""
+
+    def test_snapshot_survives_product_deletion(self):
+        product = _catalog()
+        other = Product.objects.create(
+            name='Без фото', slug='plain', description='', price=50, quantity=1,
+            category=product.category, manufacturer=product.manufacturer,
+        )
+        ProductImage.objects.bulk_create([
+            ProductImage(product=product, image='products/side.jpg'),
+            ProductImage(product=product, image='products/main.jpg', is_main=True),
+        ])
+        Specification.objects.bulk_create([
+            Specification(product=product, name=f'Параметр {n}', value=str(n))
+            for n in range(OrderItem.SNAPSHOT_SPECS_LIMIT + 2)
+        ])
+        order = Order.objects.create(
+            user=User.objects.create_user('buyer', 'b@example.com', 'x'), total_price=150,
+            payment_method='card', shipping_address='-', phone='-', email='b@example.com',
+        )
+        items = [
+            OrderItem(order=order, product=product, quantity=1, price=100),
+            OrderItem(order=order, product=other, quantity=1, price=50),
+        ]
+        with self.assertNumQueries(2):
+            OrderItem.capture_snapshots(items)
+        OrderItem.objects.bulk_create(items)
+
+        product.delete()
+        item, plain = OrderItem.objects.filter(order=order).order_by('id')
+        self.assertIsNone(item.product_id)
+        self.assertEqual((item.product_name, item.product_slug), ('Товар', 'product'))
+        self.assertEqual(item.product_image, 'products/main.jpg')
+        self.assertEqual(
+            item.product_specs,
+            {f'Параметр {n}': str(n) for n in range(OrderItem.SNAPSHOT_SPECS_LIMIT)},
+        )
+        self.assertEqual((plain.product_name, plain.product_image, plain.product_specs),
+                         ('Без фото', '', {}))
+
+
+class AdminChangelistQueryBudgetTests(ChangelistQueryBudgetMixin, TestCase):
+    """Списки заказов и корзин в админке не делают запросов на каждую строку."""
+
+    app_label = 'orders'
+    changelist_models = ('order', 'cart')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+        category = Category.objects.create(name='Категория', slug='cat')
+        manufacturer = Manufacturer.objects.create(name='Производитель', country='RU')
+        cls.product = Product.objects.create(
+            name='Товар', slug='product', description='', price=100, quantity=1000,
+            category=category, manufacturer=manufacturer,
+        )
+
+    def _create_rows(self, count):
+        start = User.objects.count()
+        users = User.objects.bulk_create([User(username=f'user{start + i}') for i in range(count)])
+        carts = Cart.objects.bulk_create([Cart(user=user) for user in users])
+        CartItem.objects.bulk_create([CartItem(cart=cart, product=self.product, quantity=2) for cart in carts])
+        for user in users:
+            Order.objects.create(
+                user=user, total_price=100, payment_method='card',
+                shipping_address='-', phone='-', email='a@example.com',
+            )
+
+
+
+class RecommendationTests(TestCase):
+    """Рекомендации по совместным покупкам из журнала заказов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('buyer', 'buyer@example.com', 'x')
+        category = Category.objects.create(name='Категория', slug='cat')
+        manufacturer = Manufacturer.objects.create(name='Производитель', country='RU')
+        cls.laptop, cls.mouse, cls.cable, cls.monitor = Product.objects.bulk_create([
+            Product(name=name, slug=name, description='', price=100, quantity=10,
+                    category=category, manufacturer=manufacturer)
+            for name in ('laptop', 'mouse', 'cable', 'monitor')
+        ])
+
+    def _order(self, *products):
+        return _place_order(self.user, *((product, 1) for product in products))
+
+    def test_pairs_with_lift_are_recommended_and_cancellations_subtracted(self):
+        together = [self._order(self.laptop, self.mouse) for _ in range(3)]
+        for _ in range(3):
+            self._order(self.cable)
+        # Встретились вместе один раз — меньше MIN_PAIR_ORDERS
+        self._order(self.laptop, self.monitor)
+        recommendations.process_events()
+
+        recommended = ProductRecommendation.objects.for_product(self.laptop)
+        self.assertEqual([r.recommended for r in recommended], [self.mouse])
+        # N = 7, laptop в 4 заказах, mouse в 3, вместе в 3
+        self.assertAlmostEqual(recommended[0].score, 7 * 3 / (4 * 3), places=3)
+        self.assertEqual(
+            [r.recommended for r in ProductRecommendation.objects.for_products([self.mouse.id])],
+            [self.laptop],
+        )
+
+        together[0].transition_to('cancelled')
+        together[1].transition_to('cancelled')
+        recommendations.process_events()
+        self.assertEqual(ProductRecommendation.objects.for_product(self.laptop), [])
+        self.assertEqual(RollupWatermark.objects.get(name=recommendations.WATERMARK).orders, 5)
+
+    def _pairs(self):
+        return dict(ProductPairCount.objects.filter(product=self.laptop).values_list('other_id', 'orders'))
+
+    def test_pre_journal_orders_are_backfilled(self):
+        legacy = _place_order(self.user, (self.laptop, 1), (self.mouse, 1), journal=False)
+        for _ in range(2):
+            self._order(self.laptop, self.mouse)
+        self._order(self.cable)
+        self.assertEqual(recommendations.process_events(), 0)
+        self.assertEqual(self._pairs(), {self.laptop.id: 3, self.mouse.id: 3})
+        self.assertEqual(RollupWatermark.objects.get(name=recommendations.WATERMARK).orders, 4)
+
+        legacy.transition_to('cancelled')
+        self.assertEqual(recommendations.process_events(), 1)
+
+        self.assertEqual(self._pairs(), {self.laptop.id: 2, self.mouse.id: 2})
+        self.assertEqual(RollupWatermark.objects.get(name=recommendations.WATERMARK).orders, 3)
+        # N = 3, laptop и mouse в 2 заказах, вместе в 2
+        recommended = ProductRecommendation.objects.for_product(self.laptop)
+        self.assertAlmostEqual(recommended[0].score, 3 * 2 / (2 * 2), places=3)
+
+    def test_backfill_continues_from_the_journal(self):
+        recommendations.process_events()
+        first = self._order(self.laptop, self.mouse)
+        self._order(self.laptop, self.mouse)
+        self._order(self.cable)
+        ProductPairCount.objects.all().delete()
+
+        self.assertEqual(recommendations.backfill(), 3)
+        self.assertEqual(self._pairs(), {self.laptop.id: 2, self.mouse.id: 2})
+        self.assertEqual(recommendations.process_events(), 0)
+
+        first.transition_to('cancelled')
+        self.assertEqual(recommendations.process_events(), 1)
+        self.assertEqual(self._pairs(), {self.laptop.id: 1, self.mouse.id: 1})
+        self.assertEqual(RollupWatermark.objects.get(name=recommendations.WATERMARK).orders, 2)
+
+
+def _sales():
+    """(штук, выручка, заказов) за сегодня по итогам дня и по товарам."""
+    day = timezone.localdate()
+    total = DailySales.objects.filter(day=day).values_list('units', 'revenue', 'order_count').first()
+    products = {
+        product_id: (units, order_count)
+        for product_id, units, order_count in DailyProductSales.objects.filter(day=day)
+        .values_list('product_id', 'units', 'order_count')
+    }
+    return total, products
+
+
+class SalesRollupTests(TestCase):
+    """Агрегаты продаж по журналу и их пересчёт."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('buyer', 'b@example.com', 'x')
+        cls.laptop = _catalog()
+        cls.mouse = Product.objects.create(
+            name='Мышь', slug='mouse', description='', price=10, quantity=10,
+            category=cls.laptop.category, manufacturer=cls.laptop.manufacturer,
+        )
+
+    def test_events_add_orders_and_cancellations_subtract(self):
+        first = _place_order(self.user, (self.laptop, 2), (self.mouse, 1))
+        _place_order(self.user, (self.mouse, 3))
+        rollups.process_events()
+        self.assertEqual(_sales(), ((6, 240, 2), {self.laptop.id: (2, 1), self.mouse.id: (4, 2)}))
+
+        first.transition_to('cancelled')
+        self.assertEqual(rollups.process_events(), 1)
+        self.assertEqual(rollups.process_events(), 0)
+        self.assertEqual(_sales(), ((3, 30, 1), {self.laptop.id: (0, 0), self.mouse.id: (3, 1)}))
+
+    def test_rebuild_counts_events_after_watermark_once(self):
+        cancelled_later = _place_order(self.user, (self.laptop, 2))
+        _place_order(self.user, (self.mouse, 1))
+        last_event_id = OrderEvent.objects.latest('id').id
+        # События, записанные во время пересчёта
+        _place_order(self.user, (self.laptop, 1))
+        cancelled_later.transition_to('cancelled')
+
+        today = timezone.localdate()
+        rollups.rebuild_days(today, today, last_event_id)
+        RollupWatermark.objects.create(name=rollups.WATERMARK, last_event_id=last_event_id)
+        rollups.process_events()
+
+        self.assertEqual(_sales(), ((2, 110, 2), {self.laptop.id: (1, 1), self.mouse.id: (1, 1)}))
+
+
+class BackfillSalesRollupsTests(TransactionTestCase):
+    """Полный пересчёт командой совпадает с агрегатами по журналу."""
+
+    def test_backfill_includes_orders_before_journal(self):
+        user = User.objects.create_user('buyer', 'b@example.com', 'x')
+        laptop = _catalog()
+        _place_order(user, (laptop, 1), journal=False)
+        cancelled = _place_order(user, (laptop, 5), journal=False)
+        Order.objects.filter(id=cancelled.id).update(status='cancelled')
+        _place_order(user, (laptop, 2))
+
+        call_command('backfill_sales_rollups', workers=1, stdout=StringIO())
+
+        self.assertEqual(_sales(), ((3, 300, 2), {laptop.id: (3, 2)}))
+        watermark = RollupWatermark.objects.get(name=rollups.WATERMARK)
+        self.assertEqual(watermark.last_event_id, OrderEvent.objects.latest('id').id)
+        self.assertEqual(rollups.process_events(), 0)
+
+
+class ArchiveTests(TestCase):
+    """Архивные заказы: перенос, возврат и учёт в отчётах, рекомендациях и выгрузке."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('buyer', 'b@example.com', 'x')
+        cls.laptop = _catalog()
+        cls.mouse = Product.objects.create(
+            name='Мышь', slug='mouse', description='', price=10, quantity=10,
+            category=cls.laptop.category, manufacturer=cls.laptop.manufacturer,
+        )
+
+    def _archive(self):
+        """Два заказа с ноутбуком и мышью; первый доставлен и перенесён в архив."""
+        delivered = _place_order(self.user, (self.laptop, 1), (self.mouse, 2))
+        _place_order(self.user, (self.laptop, 1), (self.mouse, 1))
+        for status in ('processing', 'shipped', 'delivered'):
+            delivered.transition_to(status)
+        self.assertEqual(archive_orders(days=0), 1)
+        return delivered
+
+    def test_archive_and_restore_round_trip(self):
+        delivered = self._archive()
+        self.assertFalse(Order.objects.filter(id=delivered.id).exists())
+        self.assertFalse(OrderItem.objects.filter(order_id=delivered.id).exists())
+
+        archived = ArchivedOrder.objects.get(id=delivered.id)
+        self.assertEqual(archived.status, 'delivered')
+        self.mouse.delete()
+
+        order = archived.restore()
+        self.assertFalse(ArchivedOrder.objects.filter(id=delivered.id).exists())
+        restored = Order.objects.get(id=delivered.id)
+        self.assertEqual(restored.created_at, delivered.created_at)
+        self.assertEqual(restored.order_number, delivered.order_number)
+        items = OrderItem.objects.filter(order=order).values_list('product_name', 'product_id', 'quantity')
+        self.assertEqual(
+            {name: (product_id, quantity) for name, product_id, quantity in items},
+            {'Мышь': (None, 2), 'Товар': (self.laptop.id, 1)},
+        )
+
+    def test_rebuild_reads_archived_orders(self):
+        self._archive()
+        today = timezone.localdate()
+        rollups.rebuild_days(today, today, OrderEvent.objects.latest('id').id)
+        self.assertEqual(_sales(), ((5, 230, 2), {self.laptop.id: (2, 2), self.mouse.id: (3, 2)}))
+
+    def test_recommendation_reset_reads_archived_orders(self):
+        self._archive()
+        recommendations.backfill()
+        pairs = dict(ProductPairCount.objects.filter(product=self.laptop).values_list('other_id', 'orders'))
+        self.assertEqual(pairs, {self.laptop.id: 2, self.mouse.id: 2})
+
+    def test_export_includes_archived_orders(self):
+        delivered = self._archive()
+        exporter = OrderExporter()
+        queryset = exporter.filter_queryset(exporter.get_queryset(), {'status': 'delivered'})
+        lines = list(exporter.iter_lines(queryset, 'ndjson'))
+
+        self.assertEqual(len(lines), 1)
+        self.assertIn(delivered.order_number, lines[0])
+        self.assertIn('"quantity": 2', lines[0])
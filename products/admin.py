@@ -1,6 +1,12 @@
 from django.contrib import admin
+from django.db.models import Count
 from django.utils.html import format_html
-from .models import Category, Manufacturer, Product, ProductImage, Specification
+
+from utils.exports import export_action
+from utils.pagination import EstimatedCountPaginator
+
+from .exports import ProductExporter
+from .models import Category, Manufacturer, PriceHistory, Product, ProductImage, Specification
 
 
 @admin.register(Category)
@@ -9,9 +15,13 @@ class CategoryAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('name',)}
     search_fields = ['name']
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(products_total=Count('products'))
+
     def product_count(self, obj):
-        return obj.products.count()
+        return obj.products_total
     product_count.short_description = 'Количество товаров'
+    product_count.admin_order_field = 'products_total'
 
 
 @admin.register(Manufacturer)
@@ -19,9 +29,13 @@ class ManufacturerAdmin(admin.ModelAdmin):
     list_display = ['name', 'country', 'product_count']
     search_fields = ['name', 'country']
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(products_total=Count('products'))
+
     def product_count(self, obj):
-        return obj.products.count()
+        return obj.products_total
     product_count.short_description = 'Количество товаров'
+    product_count.admin_order_field = 'products_total'
 
 
 class ProductImageInline(admin.TabularInline):
@@ -38,11 +52,40 @@ class SpecificationInline(admin.TabularInline):
 class ProductAdmin(admin.ModelAdmin):
     list_display = ['name', 'category', 'manufacturer', 'price', 'quantity', 'available', 'created_at']
     list_filter = ['category', 'manufacturer', 'created_at']
-    search_fields = ['name', 'description']
+    list_select_related = ['category', 'manufacturer']
+    # Поиск по префиксу названия и точному slug — оба идут по индексам
+    search_fields = ['^name', '=slug']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     prepopulated_fields = {'slug': ('name',)}
+    autocomplete_fields = ['category', 'manufacturer']
     inlines = [ProductImageInline, SpecificationInline]
+    actions = [
+        export_action(ProductExporter),
+        export_action(ProductExporter, output='ndjson', description='Экспорт в NDJSON'),
+    ]
 
     def available(self, obj):
         return obj.quantity > 0
     available.boolean = True
-    available.short_description = 'В наличии'
\ No newline at end of file
+    available.short_description = 'В наличии'
+
+
+@admin.register(PriceHistory)
+class PriceHistoryAdmin(admin.ModelAdmin):
+    list_display = ['product', 'old_price', 'new_price', 'reason', 'created_at']
+    list_filter = ['reason']
+    list_select_related = ['product']
+    autocomplete_fields = ['product']
+    date_hierarchy = 'created_at'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,46 @@
+"""
+Выгрузка товаров с характеристиками.
+"""
+
+from utils.exports import Exporter
+
+from .models import Product
+
+
+class ProductExporter(Exporter):
+    name = 'products'
+    filter_params = (
+        'category__id__exact', 'manufacturer__id__exact',
+        'created_at__gte', 'created_at__lt',
+    )
+    csv_header = (
+        'id', 'name', 'slug', 'category', 'manufacturer', 'price', 'quantity',
+        'warranty', 'specifications',
+    )
+
+    def get_queryset(self):
+        return Product.objects.select_related('category', 'manufacturer').prefetch_related(
+            'specifications'
+        )
+
+    def csv_rows(self, product):
+        specs = '; '.join(f'{spec.name}={spec.value}' for spec in product.specifications.all())
+        yield [
+            product.id, product.name, product.slug, product.category.name,
+            product.manufacturer.name, product.price, product.quantity,
+            product.warranty, specs,
+        ]
+
+    def as_json(self, product):
+        return {
+            'id': product.id,
+            'name': product.name,
+            'slug': product.slug,
+            'description': product.description,
+            'category': product.category.name,
+            'manufacturer': product.manufacturer.name,
+            'price': str(product.price),
+            'quantity': product.quantity,
+            'warranty': product.warranty,
+            'specifications': {spec.name: spec.value for spec in product.specifications.all()},
+        }
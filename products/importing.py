@@ -0,0 +1,371 @@
+"""
+Пакетный импорт каталога из CSV/JSONL-фидов поставщиков.
+
+Формат строки (CSV-колонки или ключи JSON):
+    name, slug (необязательно), description, price, quantity, warranty,
+    category, manufacturer, country, specs, images
+
+specs — JSON-объект или строка "Ключ=Значение; Ключ=Значение",
+images — список или строка "a.jpg;b.jpg" (файлы ищутся в --images-dir).
+Товар идентифицируется по slug: если он не задан, slug строится из названия,
+коллизии с другими названиями разрешаются суффиксами -2, -3, ...
+"""
+
+import csv
+import json
+import os
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.validators import validate_slug
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .models import Category, Manufacturer, Product, ProductImage, Specification
+from .signals import catalog_changed
+
+
+class ImportRowError(ValueError):
+    """Некорректная строка фида."""
+
+
+TRANSLIT = str.maketrans({
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e', 'ж': 'zh',
+    'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o',
+    'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'h', 'ц': 'ts',
+    'ч': 'ch', 'ш': 'sh', 'щ': 'sch', 'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu',
+    'я': 'ya',
+})
+
+# Product.price: max_digits=10, decimal_places=2
+MAX_PRICE = Decimal('99999999.99')
+# quantity и warranty — IntegerField
+MAX_INTEGER = 2 ** 31 - 1
+SLUG_MAX_LENGTH = 200
+
+
+def make_slug(name, max_length=200):
+    """slugify с транслитерацией кириллицы (иначе русские названия дают пустой slug)."""
+    slug = slugify(name.lower().translate(TRANSLIT)) or 'item'
+    return slug[:max_length].strip('-') or 'item'
+
+
+def _parse_specs(value):
+    if not value:
+        return {}
+    if isinstance(value, dict):
+        return {str(k): str(v) for k, v in value.items()}
+    value = value.strip()
+    if value.startswith('{'):
+        return {str(k): str(v) for k, v in json.loads(value).items()}
+    specs = {}
+    for part in value.split(';'):
+        if '=' in part:
+            key, val = part.split('=', 1)
+            specs[key.strip()] = val.strip()
+    return specs
+
+
+def _parse_images(value):
+    if not value:
+        return []
+    if isinstance(value, list):
+        return [str(v) for v in value if v]
+    return [part.strip() for part in value.split(';') if part.strip()]
+
+
+def normalize_row(raw):
+    """Приводит строку фида к словарю с проверенными типами."""
+    if isinstance(raw, str):
+        raw = json.loads(raw)
+
+    name = (raw.get('name') or '').strip()
+    if not name:
+        raise ImportRowError('не указано название')
+    category = (raw.get('category') or '').strip()
+    manufacturer = (raw.get('manufacturer') or '').strip()
+    if not category or not manufacturer:
+        raise ImportRowError(f'{name}: не указаны категория или производитель')
+
+    try:
+        price = Decimal(str(raw.get('price', '0')).replace(',', '.').strip() or '0')
+        quantity = int(raw.get('quantity') or 0)
+        warranty = int(raw.get('warranty') or 12)
+    except (InvalidOperation, ValueError, TypeError, OverflowError):
+        raise ImportRowError(f'{name}: некорректные цена, количество или гарантия')
+    # NaN и Infinity Decimal разбирает, но сравнение с NaN бросает InvalidOperation
+    if not price.is_finite():
+        raise ImportRowError(f'{name}: некорректные цена, количество или гарантия')
+    if price < 0 or quantity < 0:
+        raise ImportRowError(f'{name}: отрицательные цена или количество')
+    if price > MAX_PRICE:
+        raise ImportRowError(f'{name}: слишком большая цена')
+    if quantity > MAX_INTEGER or not 0 <= warranty <= MAX_INTEGER:
+        raise ImportRowError(f'{name}: количество или гарантия вне допустимого диапазона')
+
+    slug = (raw.get('slug') or '').strip()
+    if len(slug) > SLUG_MAX_LENGTH:
+        raise ImportRowError(f'{name}: slug длиннее {SLUG_MAX_LENGTH} символов')
+    if slug:
+        try:
+            validate_slug(slug)
+        except ValidationError:
+            raise ImportRowError(f'{name}: некорректный slug {slug!r}')
+
+    return {
+        'name': name[:200],
+        'slug': slug,
+        'description': raw.get('description') or '',
+        'price': price,
+        'quantity': quantity,
+        'warranty': warranty,
+        'category': category[:100],
+        'manufacturer': manufacturer[:100],
+        'country': (raw.get('country') or '').strip()[:50],
+        'specs': _parse_specs(raw.get('specs')),
+        'images': _parse_images(raw.get('images')),
+    }
+
+
+def normalize_chunk(chunk):
+    """Нормализует пачку строк; ошибки возвращаются вместо исключений."""
+    rows, errors = [], []
+    for raw in chunk:
+        try:
+            rows.append(normalize_row(raw))
+        except (ImportRowError, json.JSONDecodeError, AttributeError) as e:
+            errors.append(str(e))
+    return rows, errors
+
+
+def read_raw_chunks(path, chunk_size):
+    """Читает фид и отдаёт пачки сырых строк (dict для CSV, str для JSONL)."""
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        if path.endswith('.csv'):
+            source = csv.DictReader(f)
+        else:
+            source = (line for line in f if line.strip())
+
+        chunk = []
+        for raw in source:
+            chunk.append(raw)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+class SlugResolver:
+    """
+    Подбирает уникальные slug для названий пачкой запросов.
+
+    Slug занятый тем же названием переиспользуется (повторный импорт
+    обновляет ту же запись), занятый другим — получает суффикс.
+    """
+
+    def __init__(self, model, max_length):
+        self.model = model
+        self.max_length = max_length
+        self.owners = {}
+        self.loaded_suffixes = set()
+
+    def _load(self, slugs):
+        slugs = [slug for slug in slugs if slug not in self.owners]
+        for start in range(0, len(slugs), 500):
+            self.owners.update(
+                self.model.objects.filter(slug__in=slugs[start:start + 500])
+                .values_list('slug', 'name')
+            )
+
+    def _load_suffixes(self, base):
+        if base not in self.loaded_suffixes:
+            self.loaded_suffixes.add(base)
+            self.owners.update(
+                self.model.objects.filter(slug__startswith=f'{base}-')
+                .values_list('slug', 'name')
+            )
+
+    def resolve(self, names):
+        bases = {name: make_slug(name, self.max_length - 6) for name in names}
+        self._load(set(bases.values()))
+
+        result = {}
+        for name, base in bases.items():
+            slug, n = base, 1
+            while self.owners.get(slug, name) != name:
+                self._load_suffixes(base)
+                n += 1
+                slug = f'{base}-{n}'
+            self.owners[slug] = name
+            result[name] = slug
+        return result
+
+
+class CatalogImporter:
+    """Пакетная запись нормализованных строк каталога."""
+
+    def __init__(self, images_dir=None):
+        self.images_dir = images_dir
+        self.category_slugs = SlugResolver(Category, 100)
+        self.product_slugs = SlugResolver(Product, SLUG_MAX_LENGTH)
+        self.categories = {}
+        self.manufacturers = {}
+        self.stats = {'products': 0, 'specifications': 0, 'images': 0}
+
+    def _sync_categories(self, rows):
+        names = {row['category'] for row in rows} - self.categories.keys()
+        if not names:
+            return
+        self.categories.update(Category.objects.filter(name__in=names).values_list('name', 'id'))
+        missing = names - self.categories.keys()
+        if missing:
+            slugs = self.category_slugs.resolve(sorted(missing))
+            Category.objects.bulk_create(
+                [Category(name=name, slug=slugs[name]) for name in missing],
+                ignore_conflicts=True
+            )
+            self.categories.update(
+                Category.objects.filter(name__in=missing).values_list('name', 'id')
+            )
+
+    def _sync_manufacturers(self, rows):
+        countries = {}
+        for row in rows:
+            if row['country']:
+                countries[row['manufacturer']] = row['country']
+            elif row['manufacturer'] not in self.manufacturers:
+                countries.setdefault(row['manufacturer'], '')
+        if not countries:
+            return
+        with_country = [name for name, country in countries.items() if country]
+        if with_country:
+            Manufacturer.objects.bulk_create(
+                [Manufacturer(name=name, country=countries[name]) for name in with_country],
+                update_conflicts=True,
+                unique_fields=['name'],
+                update_fields=['country'],
+            )
+        Manufacturer.objects.bulk_create(
+            [Manufacturer(name=name, country='') for name, country in countries.items() if not country],
+            ignore_conflicts=True
+        )
+        self.manufacturers.update(
+            Manufacturer.objects.filter(name__in=countries).values_list('name', 'id')
+        )
+
+    def _product_slugs(self, rows):
+        derived = self.product_slugs.resolve(
+            sorted({row['name'] for row in rows if not row['slug']})
+        )
+        return [row['slug'] or derived[row['name']] for row in rows]
+
+    def _sync_specifications(self, rows, product_ids):
+        ids = [product_ids[slug] for slug, row in rows if row['specs']]
+        if not ids:
+            return
+        Specification.objects.filter(product_id__in=ids).delete()
+
+        # Характеристик в разы больше, чем товаров: простой INSERT через executemany
+        # обходится без создания экземпляров моделей
+        qn = connection.ops.quote_name
+        sql = (
+            f'INSERT INTO {qn(Specification._meta.db_table)} '
+            f'({qn("product_id")}, {qn("name")}, {qn("value")}) VALUES (%s, %s, %s)'
+        )
+        params = [
+            (product_ids[slug], name[:100], value[:200])
+            for slug, row in rows
+            for name, value in row['specs'].items()
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+        self.stats['specifications'] += len(params)
+
+    def _sync_images(self, rows, product_ids):
+        if not self.images_dir:
+            return
+        ids = [product_ids[slug] for slug, row in rows if row['images']]
+        if not ids:
+            return
+
+        existing = {}
+        for product_id, image in ProductImage.objects.filter(product_id__in=ids).values_list(
+            'product_id', 'image'
+        ):
+            existing.setdefault(product_id, set()).add(image)
+
+        images = []
+        for slug, row in rows:
+            product_id = product_ids[slug]
+            attached = existing.setdefault(product_id, set())
+            for filename in row['images']:
+                filename = os.path.basename(filename)
+                path = os.path.join(self.images_dir, filename)
+                # Имя в хранилище детерминировано, чтобы повторный импорт не дублировал файлы
+                target = f'products/{slug}-{filename}'
+                if target in attached or not os.path.isfile(path):
+                    continue
+                if not default_storage.exists(target):
+                    with open(path, 'rb') as f:
+                        default_storage.save(target, File(f))
+                images.append(ProductImage(
+                    product_id=product_id,
+                    image=target,
+                    alt_text=row['name'][:100],
+                    is_main=not attached,
+                ))
+                attached.add(target)
+
+        ProductImage.objects.bulk_create(images)
+        self.stats['images'] += len(images)
+
+    @transaction.atomic
+    def import_rows(self, rows):
+        """Записывает пачку строк. Возвращает число товаров."""
+        if not rows:
+            return 0
+
+        self._sync_categories(rows)
+        self._sync_manufacturers(rows)
+
+        # Последняя строка с одним slug побеждает
+        by_slug = dict(zip(self._product_slugs(rows), rows))
+        now = timezone.now()
+        Product.objects.bulk_create(
+            [
+                Product(
+                    slug=slug,
+                    name=row['name'],
+                    description=row['description'],
+                    price=row['price'],
+                    quantity=row['quantity'],
+                    warranty=row['warranty'],
+                    category_id=self.categories[row['category']],
+                    manufacturer_id=self.manufacturers[row['manufacturer']],
+                    updated_at=now,
+                )
+                for slug, row in by_slug.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['slug'],
+            update_fields=[
+                'name', 'description', 'price', 'quantity', 'warranty',
+                'category', 'manufacturer', 'updated_at',
+            ],
+            batch_size=1000,
+        )
+        product_ids = dict(
+            Product.objects.filter(slug__in=list(by_slug)).values_list('slug', 'id')
+        )
+
+        items = list(by_slug.items())
+        self._sync_specifications(items, product_ids)
+        self._sync_images(items, product_ids)
+
+        self.stats['products'] += len(by_slug)
+        transaction.on_commit(lambda: catalog_changed.send(sender=Product))
+        return len(by_slug)
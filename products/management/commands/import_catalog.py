@@ -0,0 +1,74 @@
+"""
+Пакетный импорт каталога из CSV/JSONL-фида поставщика.
+"""
+
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.importing import CatalogImporter, normalize_chunk, read_raw_chunks
+
+
+def _parallel_map(executor, func, chunks, window):
+    """Как executor.map, но не читает весь фид вперёд: в работе не больше window пачек."""
+    pending = deque()
+    for chunk in chunks:
+        pending.append(executor.submit(func, chunk))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class Command(BaseCommand):
+    help = 'Импортирует товары, характеристики и изображения из CSV/JSONL-фида'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл фида (.csv или .jsonl)')
+        parser.add_argument('--images-dir', help='Каталог с файлами изображений')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument(
+            '--workers', type=int, default=min(4, os.cpu_count() or 1),
+            help='Процессы для разбора строк (1 — без параллелизма)'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.isfile(path):
+            raise CommandError(f'Файл не найден: {path}')
+        if options['images_dir'] and not os.path.isdir(options['images_dir']):
+            raise CommandError(f'Каталог не найден: {options["images_dir"]}')
+
+        importer = CatalogImporter(images_dir=options['images_dir'])
+        chunks = read_raw_chunks(path, options['batch_size'])
+        started = time.monotonic()
+        total = 0
+        errors = 0
+
+        executor = ProcessPoolExecutor(options['workers']) if options['workers'] > 1 else None
+        try:
+            # Разбор идёт в процессах, запись — пачками в основном процессе
+            if executor:
+                results = _parallel_map(executor, normalize_chunk, chunks, options['workers'] * 2)
+            else:
+                results = map(normalize_chunk, chunks)
+            for rows, row_errors in results:
+                for error in row_errors:
+                    self.stderr.write(f'Пропущена строка: {error}')
+                errors += len(row_errors)
+                total += importer.import_rows(rows)
+
+                elapsed = time.monotonic() - started
+                self.stdout.write(f'Импортировано товаров: {total} ({total / elapsed:.0f} строк/с)')
+        finally:
+            if executor:
+                executor.shutdown()
+
+        stats = importer.stats
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: товаров {stats["products"]}, характеристик {stats["specifications"]}, '
+            f'изображений {stats["images"]}, ошибок {errors}'
+        ))
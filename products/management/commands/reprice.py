@@ -0,0 +1,62 @@
+"""
+Массовая переоценка товаров по правилам.
+
+Пример: скидка 15% на категорию с округлением до 10 и ценой "на 99":
+    manage.py reprice --category noutbuki --percent -15 --round 10 --absolute -0.01
+Правила применяются в порядке указания.
+"""
+
+import argparse
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.models import Product
+from products.pricing import reprice
+
+
+class RuleAction(argparse.Action):
+    """Собирает правила в общий список, сохраняя порядок аргументов."""
+
+    def __call__(self, parser, namespace, value, option_string=None):
+        try:
+            value = Decimal(value)
+        except InvalidOperation:
+            raise argparse.ArgumentError(self, f'некорректное число: {value}')
+        rules = getattr(namespace, 'rules', None) or []
+        rules.append((self.const, value))
+        namespace.rules = rules
+
+
+class Command(BaseCommand):
+    help = 'Меняет цены товаров категории/производителя одним UPDATE и пишет историю цен'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--category', help='slug категории')
+        parser.add_argument('--manufacturer', help='Название производителя')
+        parser.add_argument('--percent', action=RuleAction, const='percent', dest='rules',
+                            help='Изменить на N процентов (-10 — скидка)')
+        parser.add_argument('--absolute', action=RuleAction, const='absolute', dest='rules',
+                            help='Прибавить N к цене')
+        parser.add_argument('--round', action=RuleAction, const='round', dest='rules',
+                            help='Округлить до шага N')
+        parser.add_argument('--reason', default='', help='Причина для истории цен')
+
+    def handle(self, *args, **options):
+        if not options['rules']:
+            raise CommandError('Укажите хотя бы одно правило: --percent, --absolute или --round')
+        if not options['category'] and not options['manufacturer']:
+            raise CommandError('Укажите --category или --manufacturer')
+
+        queryset = Product.objects.all()
+        if options['category']:
+            queryset = queryset.filter(category__slug=options['category'])
+        if options['manufacturer']:
+            queryset = queryset.filter(manufacturer__name=options['manufacturer'])
+
+        try:
+            updated = reprice(queryset, options['rules'], reason=options['reason'] or 'command')
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(f'Изменено цен: {updated}'))
@@ -3,10 +3,13 @@
 """
 
 from django.db import models
+from django.db.models.functions import Upper
 from django.utils.text import slugify
-from django.db import transaction
 from django.core.exceptions import ValidationError
 
+from utils.db import PatternOpClass
+from utils.transactions_utils import REPEATABLE_READ, transactional
+
 
 class Category(models.Model):
     """Категория товаров."""
@@ -46,8 +49,48 @@ class Manufacturer(models.Model):
         return self.name
 
 
+class ProductQuerySet(models.QuerySet):
+    """QuerySet товаров."""
+
+    def for_listing(self):
+        """Для карточек каталога: категория и изображения без запросов на каждый товар."""
+        return self.select_related('category').prefetch_related('images')
+
+    def with_details(self):
+        """Товары со всеми связанными объектами (страница товара, API)."""
+        return self.select_related('category', 'manufacturer').prefetch_related(
+            'images', 'specifications'
+        )
+
+    def filter_catalog(self, category=None, manufacturer=None, min_price=None,
+                       max_price=None, search=None, spec=None):
+        """Фильтры каталога; пустые значения пропускаются. spec — 'название:значение'."""
+        queryset = self
+        if category:
+            queryset = queryset.filter(category_id=category)
+        if manufacturer:
+            queryset = queryset.filter(manufacturer_id=manufacturer)
+        if min_price:
+            queryset = queryset.filter(price__gte=min_price)
+        if max_price:
+            queryset = queryset.filter(price__lte=max_price)
+        if search:
+            queryset = queryset.filter(
+                models.Q(name__icontains=search) | models.Q(description__icontains=search)
+            )
+        if spec:
+            name, separator, value = spec.partition(':')
+            queryset = queryset.filter(models.Exists(
+                Specification.objects.filter(product=models.OuterRef('pk'), name=name, value=value)
+            ))
+        return queryset
+
+
 class Product(models.Model):
     """Товар с поддержкой транзакций."""
+    # Поля, от которых зависит каталог (подсказки поиска и версия его кэша)
+    CATALOG_FIELDS = ('name', 'category', 'manufacturer')
+
     name = models.CharField('Название', max_length=200)
     slug = models.SlugField('URL', max_length=200, unique=True)
     description = models.TextField('Описание')
@@ -72,6 +115,8 @@ class Product(models.Model):
     created_at = models.DateTimeField('Дата создания', auto_now_add=True)
     updated_at = models.DateTimeField('Дата обновления', auto_now=True)
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Товар'
         verbose_name_plural = 'Товары'
@@ -80,15 +125,47 @@ class Product(models.Model):
             models.Index(fields=['slug']),
             models.Index(fields=['price']),
             models.Index(fields=['category', 'manufacturer']),
+            # Поиск по префиксу названия без учёта регистра (name__istartswith)
+            models.Index(PatternOpClass(Upper('name')), name='product_name_upper_idx'),
         ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._catalog_state = instance._catalog_values()
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._catalog_state = self._catalog_values()
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
         super().save(*args, **kwargs)
+        self._catalog_state = self._catalog_values()
+
+    def _catalog_values(self):
+        """Загруженные значения полей каталога (отложенные не читаются)."""
+        attnames = (self._meta.get_field(name).attname for name in self.CATALOG_FIELDS)
+        return {attname: self.__dict__[attname] for attname in attnames if attname in self.__dict__}
+
+    def catalog_fields_changed(self, update_fields=None):
+        """Изменились ли поля каталога с момента загрузки из БД."""
+        state = getattr(self, '_catalog_state', None)
+        if state is None:
+            # Объект создан не из БД: прежние значения неизвестны
+            return True
+        for name in self.CATALOG_FIELDS:
+            attname = self._meta.get_field(name).attname
+            if update_fields is not None and name not in update_fields and attname not in update_fields:
+                continue
+            if attname not in state or self.__dict__.get(attname) != state[attname]:
+                return True
+        return False
 
     def clean(self):
         if self.price < 0:
@@ -100,16 +177,22 @@ class Product(models.Model):
     def available(self):
         return self.quantity > 0
 
-    @transaction.atomic
+    @property
+    def main_image(self):
+        """Главное изображение (иначе первое); с prefetch_related('images') — без запроса."""
+        images = self.images.all()
+        return min(images, key=lambda image: (not image.is_main, image.pk), default=None)
+
+    @transactional(isolation=REPEATABLE_READ)
     def reserve(self, quantity):
         """Резервирование товара с блокировкой."""
-        if quantity > self.quantity:
-            raise ValueError(f"Недостаточно товара. Доступно: {self.quantity}")
-
-        # Блокируем строку для обновления
+        # Блокируем строку для обновления; остаток проверяем по ней, а не по self
         product = Product.objects.select_for_update().get(pk=self.pk)
+        if quantity > product.quantity:
+            raise ValueError(f"Недостаточно товара. Доступно: {product.quantity}")
+
         product.quantity = models.F('quantity') - quantity
-        product.save()
+        product.save(update_fields=['quantity', 'updated_at'])
         return True
 
 
@@ -147,4 +230,27 @@ class Specification(models.Model):
         verbose_name_plural = 'Характеристики'
 
     def __str__(self):
-        return f"{self.name}: {self.value}"
\ No newline at end of file
+        return f"{self.name}: {self.value}"
+
+
+class PriceHistory(models.Model):
+    """Журнал изменений цен (только добавление)."""
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='price_history'
+    )
+    old_price = models.DecimalField(max_digits=10, decimal_places=2)
+    new_price = models.DecimalField(max_digits=10, decimal_places=2)
+    reason = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = 'Изменение цены'
+        verbose_name_plural = 'История цен'
+        indexes = [
+            models.Index(fields=['product', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.old_price} → {self.new_price}"
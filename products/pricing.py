@@ -0,0 +1,93 @@
+"""
+Массовая переоценка товаров.
+
+Правила (процент, абсолютная надбавка, округление) собираются в одно
+SQL-выражение: цены меняются одним UPDATE, а история пишется одним
+INSERT ... SELECT из того же выражения, без загрузки товаров в Python.
+"""
+
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import DecimalField, F, Value
+from django.db.models.functions import Greatest, Round
+from django.utils import timezone
+
+from .models import PriceHistory, Product
+from .signals import catalog_changed
+
+RULES = ('percent', 'absolute', 'round')
+
+
+def price_expression(rules):
+    """
+    Выражение новой цены по списку правил [(rule, value), ...].
+
+    percent  — изменить на value процентов (-10 — скидка 10%);
+    absolute — прибавить value (может быть отрицательным);
+    round    — округлить до шага value (например, 10 или 0.01).
+    """
+    output = DecimalField(max_digits=10, decimal_places=2)
+    # Процент передаётся с запасом точности: до округления итоговой цены
+    # множитель 1.125 не должен превращаться в 1.13, а 0.996 — в 1.00
+    factor = DecimalField(max_digits=20, decimal_places=10)
+    expression = F('price')
+    for rule, value in rules:
+        value = Decimal(str(value))
+        if rule == 'percent':
+            expression = expression * Value(1 + value / 100, output_field=factor)
+        elif rule == 'absolute':
+            expression = expression + Value(value, output_field=output)
+        elif rule == 'round':
+            if value <= 0:
+                raise ValueError('Шаг округления должен быть положительным')
+            step = Value(value, output_field=output)
+            expression = Round(expression / step) * step
+        else:
+            raise ValueError(f'Неизвестное правило: {rule}')
+    return Round(
+        Greatest(expression, Value(Decimal(0), output_field=output), output_field=output),
+        2,
+        output_field=output,
+    )
+
+
+def _insert_history(queryset):
+    """INSERT ... SELECT: строки истории из аннотированного queryset."""
+    source = queryset.values_list('pk', 'price', 'new_price', 'history_reason', 'history_created_at')
+    select_sql, params = source.query.sql_with_params()
+
+    qn = connection.ops.quote_name
+    columns = ', '.join(map(qn, ['product_id', 'old_price', 'new_price', 'reason', 'created_at']))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {qn(PriceHistory._meta.db_table)} ({columns}) {select_sql}',
+            params,
+        )
+
+
+@transaction.atomic
+def reprice(queryset, rules, reason=''):
+    """
+    Применяет правила к товарам queryset. Возвращает число изменённых цен.
+    """
+    expression = price_expression(rules)
+    now = timezone.now()
+    queryset = queryset.order_by()
+
+    # Блокируем строки, чтобы история и UPDATE видели одни и те же цены
+    if connection.features.has_select_for_update:
+        list(queryset.select_for_update().values_list('pk', flat=True))
+
+    changed = queryset.annotate(
+        new_price=expression,
+        history_reason=Value(reason[:100]),
+        history_created_at=Value(now, output_field=PriceHistory._meta.get_field('created_at')),
+    ).exclude(price=F('new_price'))
+
+    _insert_history(changed)
+    updated = queryset.exclude(price=expression).update(price=expression, updated_at=now)
+
+    if updated:
+        transaction.on_commit(lambda: catalog_changed.send(sender=Product, reason=reason))
+    return updated
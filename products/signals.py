@@ -0,0 +1,44 @@
+"""
+Сигналы каталога и версия кэша каталога.
+
+Массовые операции (импорт, переоценка) отправляют catalog_changed один раз
+на пачку, сохранение или удаление одного объекта — с аргументом instance.
+Кэши каталога включают catalog_cache_version() в ключ и устаревают при её
+увеличении. Сохранение товара, не затронувшее Product.CATALOG_FIELDS
+(остатки, цены), версию не меняет.
+"""
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .models import Category, Manufacturer, Product
+
+catalog_changed = Signal()
+
+CATALOG_VERSION_KEY = 'catalog:version'
+
+
+def catalog_cache_version():
+    return cache.get_or_set(CATALOG_VERSION_KEY, 1, None)
+
+
+@receiver(catalog_changed)
+def bump_catalog_version(sender, **kwargs):
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOG_VERSION_KEY, 2, None)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Manufacturer)
+@receiver(post_delete, sender=Manufacturer)
+def catalog_object_changed(sender, instance, signal, created=False, update_fields=None, **kwargs):
+    if (signal is post_save and not created and isinstance(instance, Product)
+            and not instance.catalog_fields_changed(update_fields)):
+        return
+    catalog_changed.send(sender=sender, instance=instance)
@@ -0,0 +1,297 @@
+"""
+Подсказки поиска: индекс префиксов в памяти процесса.
+
+Ключи — нормализованные названия товаров, категорий, производителей и
+популярных значений характеристик, начиная с каждого слова («ноутбук asus
+air», «asus air», «air»), в отсортированном списке; диапазон ключей с
+нужным префиксом находится bisect'ом. Подсказки ранжируются по продажам за
+SALES_WINDOW_DAYS (витрина DailyProductSales): категория и производитель —
+по сумме продаж своих товаров. Ответы для префиксов хранятся в LRU, самые
+короткие префиксы считаются при построении, так что запрос к подсказкам не
+обращается к БД.
+
+Индекс у каждого процесса свой. Сохранение и удаление товара применяются
+к нему после коммита; массовые изменения (catalog_changed) и смена версии
+каталога помечают индекс устаревшим, и он перестраивается в фоновом
+потоке, пока запросы обслуживает старый. Раз в REBUILD_INTERVAL индекс
+перестраивается в любом случае — так подтягиваются продажи и изменения из
+других процессов, если кэш Django у процессов не общий.
+"""
+
+import bisect
+import heapq
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from django.db import connections, transaction
+from django.db.models import Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.urls import reverse
+from django.utils import timezone
+
+from orders.models import DailyProductSales
+from .models import Category, Manufacturer, Product, Specification
+from .signals import catalog_cache_version, catalog_changed
+
+logger = logging.getLogger(__name__)
+
+SALES_WINDOW_DAYS = 90
+REBUILD_INTERVAL = 15 * 60
+# Как часто сверять версию каталога, с
+VERSION_CHECK_INTERVAL = 5
+MAX_LIMIT = 20
+MAX_KEY_LENGTH = 40
+CACHE_SIZE = 10000
+# Префиксы такой длины считаются при построении: по ним больше всего ключей
+PRECOMPUTED_PREFIX_LENGTH = 2
+# Значение характеристики подсказывается, если встречается хотя бы у стольких товаров
+MIN_SPEC_PRODUCTS = 3
+MAX_SPEC_VALUES = 5000
+
+_WORD = re.compile(r'\w+')
+_LAST = '\U0010ffff'
+
+
+def normalize(text):
+    """Нижний регистр, ё → е, слова через один пробел."""
+    return ' '.join(_WORD.findall(text.lower().replace('ё', 'е')))
+
+
+def _keys(text):
+    words = normalize(text).split(' ')
+    return {' '.join(words[i:])[:MAX_KEY_LENGTH] for i in range(len(words)) if words[i]}
+
+
+class SuggestIndex:
+    """
+    Отсортированные пары (ключ, ссылка) и подсказки по ссылкам.
+    Ссылка — ('product', id), ('category', id), ('manufacturer', id) или
+    ('spec', 'название:значение').
+    """
+
+    def __init__(self, version=None):
+        self.pairs = []
+        self.entries = {}
+        self.keys = {}
+        self.version = version
+        self.built_at = time.monotonic()
+        self.checked_at = self.built_at
+        self.stale = False
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, ref, text, rank, url):
+        """Добавляет подсказку при построении; после freeze() — только через update()."""
+        self.entries[ref] = ((-rank, len(text), text), {
+            'type': ref[0], 'id': ref[1], 'text': text, 'url': url,
+        })
+        self.keys[ref] = _keys(text)
+        self.pairs.extend((key, ref) for key in self.keys[ref])
+
+    def freeze(self):
+        """Сортирует ключи и считает ответы для коротких префиксов."""
+        self.pairs.sort()
+        prefixes = {key[:length] for key, ref in self.pairs
+                    for length in range(1, PRECOMPUTED_PREFIX_LENGTH + 1)}
+        for prefix in prefixes:
+            self._cache[prefix] = self._scan(prefix)
+
+    def _scan(self, prefix):
+        pairs = self.pairs
+        start = bisect.bisect_left(pairs, (prefix,))
+        end = bisect.bisect_left(pairs, (prefix + _LAST,), start)
+        refs = {ref for key, ref in pairs[start:end]}
+        entries = self.entries
+        return heapq.nsmallest(MAX_LIMIT, refs, key=lambda ref: entries[ref][0])
+
+    def query(self, text, limit=MAX_LIMIT):
+        prefix = normalize(text)[:MAX_KEY_LENGTH]
+        if not prefix:
+            return []
+        with self._lock:
+            refs = self._cache.get(prefix)
+            if refs is not None:
+                self._cache.move_to_end(prefix)
+        if refs is None:
+            with self._lock:
+                refs = self._scan(prefix)
+                self._cache[prefix] = refs
+                if len(self._cache) > CACHE_SIZE:
+                    self._cache.popitem(last=False)
+        entries = self.entries
+        return [entries[ref][1] for ref in refs[:limit] if ref in entries]
+
+    def update(self, ref, text=None, rank=None, url=None):
+        """Заменяет подсказку ref (text=None — удаляет); ранг по умолчанию прежний."""
+        with self._lock:
+            old_keys = self.keys.pop(ref, set())
+            old = self.entries.get(ref)
+            pairs = [pair for pair in self.pairs if pair[1] != ref] if old_keys else list(self.pairs)
+            if text is None:
+                self.entries.pop(ref, None)
+                new_keys = set()
+            else:
+                if rank is None:
+                    rank = -old[0][0] if old else 0
+                self.entries[ref] = ((-rank, len(text), text), {
+                    'type': ref[0], 'id': ref[1], 'text': text, 'url': url,
+                })
+                new_keys = self.keys[ref] = _keys(text)
+                for key in new_keys:
+                    bisect.insort(pairs, (key, ref))
+            # Запросы, начатые до замены, дочитают старый список
+            self.pairs = pairs
+            short = set()
+            for key in old_keys | new_keys:
+                for length in range(1, len(key) + 1):
+                    self._cache.pop(key[:length], None)
+                short.update(key[:length] for length in range(1, PRECOMPUTED_PREFIX_LENGTH + 1))
+            # Короткие префиксы считаются сразу, чтобы запросы по ним не ждали
+            for prefix in short:
+                self._cache[prefix] = self._scan(prefix)
+
+    def needs_rebuild(self):
+        now = time.monotonic()
+        if now - self.checked_at >= VERSION_CHECK_INTERVAL:
+            self.checked_at = now
+            if catalog_cache_version() != self.version:
+                self.stale = True
+        return self.stale or now - self.built_at >= REBUILD_INTERVAL
+
+
+def _product_url(product_id):
+    return reverse('product_detail', args=[product_id])
+
+
+def build_index():
+    """Строит индекс по текущему каталогу и продажам за SALES_WINDOW_DAYS."""
+    index = SuggestIndex(version=catalog_cache_version())
+    since = timezone.localdate() - timedelta(days=SALES_WINDOW_DAYS)
+    sales = dict(
+        DailyProductSales.objects.filter(day__gte=since)
+        .values('product_id').annotate(units=Sum('units'))
+        .values_list('product_id', 'units')
+    )
+    catalog_url = reverse('products')
+    category_sales = {}
+    manufacturer_sales = {}
+
+    products = Product.objects.values_list('id', 'name', 'category_id', 'manufacturer_id')
+    for product_id, name, category_id, manufacturer_id in products.iterator(chunk_size=5000):
+        units = sales.get(product_id, 0)
+        category_sales[category_id] = category_sales.get(category_id, 0) + units
+        manufacturer_sales[manufacturer_id] = manufacturer_sales.get(manufacturer_id, 0) + units
+        index.add(('product', product_id), name, units, _product_url(product_id))
+
+    for category_id, name in Category.objects.values_list('id', 'name'):
+        index.add(('category', category_id), name, category_sales.get(category_id, 0),
+                  f'{catalog_url}?{urlencode({"category": category_id})}')
+    for manufacturer_id, name in Manufacturer.objects.values_list('id', 'name'):
+        index.add(('manufacturer', manufacturer_id), name, manufacturer_sales.get(manufacturer_id, 0),
+                  f'{catalog_url}?{urlencode({"manufacturer": manufacturer_id})}')
+
+    # Значения характеристик: (название, значение) -> [товаров, продажи]
+    specs = {}
+    rows = Specification.objects.values_list('product_id', 'name', 'value')
+    for product_id, name, value in rows.iterator(chunk_size=20000):
+        stats = specs.setdefault((name, value), [0, 0])
+        stats[0] += 1
+        stats[1] += sales.get(product_id, 0)
+    popular = heapq.nlargest(
+        MAX_SPEC_VALUES,
+        ((stats[1], stats[0], spec) for spec, stats in specs.items() if stats[0] >= MIN_SPEC_PRODUCTS),
+    )
+    for units, count, (name, value) in popular:
+        spec = f'{name}:{value}'
+        index.add(('spec', spec), f'{name}: {value}', units,
+                  f'{catalog_url}?{urlencode({"spec": spec})}')
+
+    index.freeze()
+    return index
+
+
+_index = None
+_build_lock = threading.Lock()
+
+
+def _build():
+    global _index
+    started = time.perf_counter()
+    _index = build_index()
+    logger.info('Индекс подсказок построен за %.2f с: %d подсказок, %d ключей',
+                time.perf_counter() - started, len(_index.entries), len(_index.pairs))
+    return _index
+
+
+def rebuild():
+    """Строит индекс заново и подменяет им текущий."""
+    with _build_lock:
+        return _build()
+
+
+def _rebuild_in_background():
+    try:
+        rebuild()
+    except Exception:
+        logger.exception('Не удалось перестроить индекс подсказок')
+    finally:
+        connections.close_all()
+
+
+def get_index():
+    """Текущий индекс; первый вызов строит его, устаревший перестраивается в фоне."""
+    index = _index
+    if index is None:
+        with _build_lock:
+            return _index or _build()
+    if index.needs_rebuild() and not _build_lock.locked():
+        # Повторный запуск не страшен: второй поток дождётся блокировки и построит ещё раз
+        index.stale = False
+        index.built_at = time.monotonic()
+        threading.Thread(target=_rebuild_in_background, daemon=True).start()
+    return index
+
+
+def suggest(text, limit=10):
+    """Подсказки для начала поискового запроса, популярные первыми."""
+    return get_index().query(text, min(limit, MAX_LIMIT))
+
+
+@receiver(post_save, sender=Product)
+def _product_saved(sender, instance, update_fields=None, **kwargs):
+    index = _index
+    if index is None or (update_fields is not None and 'name' not in update_fields):
+        return
+    ref = ('product', instance.pk)
+    entry = index.entries.get(ref)
+    # Остатки и цены меняются часто, а на подсказки влияет только название
+    if entry is not None and entry[1]['text'] == instance.name:
+        return
+    name, url = instance.name, _product_url(instance.pk)
+    transaction.on_commit(lambda: _index.update(ref, name, url=url))
+
+
+@receiver(post_delete, sender=Product)
+def _product_deleted(sender, instance, **kwargs):
+    if _index is None:
+        return
+    ref = ('product', instance.pk)
+    transaction.on_commit(lambda: _index.update(ref))
+
+
+@receiver(catalog_changed)
+def _catalog_changed(sender, instance=None, **kwargs):
+    index = _index
+    if index is None:
+        return
+    if isinstance(instance, Product):
+        # Изменение одного товара индекс применит сам, после коммита
+        index.version = catalog_cache_version()
+    else:
+        index.stale = True
@@ -1,3 +1,202 @@
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+
+from orders.models import DailyProductSales
+from users.models import User
+from utils.testing import ChangelistQueryBudgetMixin
+
+from . import suggest
+from .importing import normalize_chunk, normalize_row
+from .models import Category, Manufacturer, PriceHistory, Product, Specification
+from .pricing import reprice
+from .signals import catalog_cache_version
+
+
+class AdminChangelistQueryBudgetTests(ChangelistQueryBudgetMixin, TestCase):
+    """Списки каталога в админке не делают запросов на каждую строку."""
+
+    app_label = 'products'
+    changelist_models = ('product', 'category', 'manufacturer')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+
+    def _create_rows(self, count):
+        start = Category.objects.count()
+        categories = Category.objects.bulk_create(
+            [Category(name=f'Категория {start + i}', slug=f'cat-{start + i}') for i in range(count)]
+        )
+        manufacturers = Manufacturer.objects.bulk_create(
+            [Manufacturer(name=f'Производитель {start + i}', country='RU') for i in range(count)]
+        )
+        Product.objects.bulk_create([
+            Product(
+                name=f'Товар {start + i}', slug=f'product-{start + i}', description='',
+                price=100, quantity=i, category=category, manufacturer=manufacturer,
+            )
+            for i, (category, manufacturer) in enumerate(zip(categories, manufacturers))
+        ])
+
+
+
+class SuggestIndexTests(TestCase):
+    """Подсказки ранжируются по продажам и следуют за изменениями товаров."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Ноутбуки', slug='noutbuki')
+        manufacturer = Manufacturer.objects.create(name='Asus', country='TW')
+        cls.air, cls.pro = [
+            Product.objects.create(
+                name=name, slug=f'product-{i}', description='', price=100, quantity=1,
+                category=category, manufacturer=manufacturer,
+            )
+            for i, name in enumerate(['Ноутбук Air', 'Ноутбук Pro'])
+        ]
+        DailyProductSales.objects.create(
+            day=timezone.localdate(), product=cls.pro, units=5, revenue=500, order_count=5
+        )
+
+    def setUp(self):
+        suggest.rebuild()
+
+    def _texts(self, query):
+        return [item['text'] for item in suggest.suggest(query)]
+
+    def test_popular_first(self):
+        self.assertEqual(self._texts('ноут'), ['Ноутбуки', 'Ноутбук Pro', 'Ноутбук Air'])
+        self.assertEqual(self._texts('ASUS'), ['Asus'])
+        self.assertEqual(self._texts('pro'), ['Ноутбук Pro'])
+
+    def test_follows_product_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.air.name = 'Ультрабук Air'
+            self.air.save()
+        self.assertEqual(self._texts('ультра'), ['Ультрабук Air'])
+        self.assertEqual(self._texts('ноутбук'), ['Ноутбуки', 'Ноутбук Pro'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.air.delete()
+        self.assertEqual(self._texts('air'), [])
+
+    def test_stock_changes_keep_catalog_version(self):
+        version = catalog_cache_version()
+        index = suggest.get_index()
+
+        self.air.quantity = 5
+        self.air.save(update_fields=['quantity'])
+        self.air.reserve(1)
+        product = Product.objects.get(pk=self.pro.pk)
+        product.price = 90
+        product.save()
+
+        self.assertEqual(catalog_cache_version(), version)
+        index.checked_at = float('-inf')
+        self.assertFalse(index.needs_rebuild())
+
+        product.manufacturer = Manufacturer.objects.create(name='Acer', country='TW')
+        product.save(update_fields=['manufacturer'])
+        self.assertNotEqual(catalog_cache_version(), version)
+
+
+class CatalogImportTests(TestCase):
+    """Разбор строк фида и запись каталога."""
+
+    ROW = {'name': 'Ноутбук', 'category': 'Ноутбуки', 'manufacturer': 'Acme', 'price': '999,90'}
+
+    def _row(self, **fields):
+        return {**self.ROW, **fields}
+
+    def test_normalize_row(self):
+        row = normalize_row(self._row(quantity='3', specs='ОЗУ=16 ГБ; Диск=512 ГБ'))
+
+        self.assertEqual(row['price'], Decimal('999.90'))
+        self.assertEqual(row['quantity'], 3)
+        self.assertEqual(row['warranty'], 12)
+        self.assertEqual(row['specs'], {'ОЗУ': '16 ГБ', 'Диск': '512 ГБ'})
+
+    def test_bad_rows_become_errors(self):
+        bad = [
+            self._row(price='NaN'),
+            self._row(price='Infinity'),
+            self._row(price='-1'),
+            self._row(price='100000000'),
+            self._row(slug='ноутбук'),
+            self._row(slug='a' * 201),
+            self._row(quantity=[1]),
+            self._row(warranty={'months': 12}),
+            self._row(quantity=2 ** 31),
+            self._row(warranty=-1),
+            '{"name": "a", "category": "c", "manufacturer": "m", "quantity": 1e400}',
+            self._row(category=''),
+            '{"name": ',
+        ]
+        rows, errors = normalize_chunk(bad + [self._row(slug='notebook')])
+
+        self.assertEqual([row['slug'] for row in rows], ['notebook'])
+        self.assertEqual(len(errors), len(bad))
+
+    def test_command_imports_and_updates_by_slug(self):
+        feed = (
+            '{"name": "Ноутбук", "category": "Ноутбуки", "manufacturer": "Acme", '
+            '"price": "1000", "specs": {"ОЗУ": "16 ГБ"}}\n'
+            '{"name": "Ноутбук", "category": "Ноутбуки", "manufacturer": "Acme", "price": "NaN"}\n'
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'feed.jsonl')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(feed)
+            stderr = StringIO()
+            call_command('import_catalog', path, workers=1, stdout=StringIO(), stderr=stderr)
+            call_command('import_catalog', path, workers=1, stdout=StringIO(), stderr=StringIO())
+
+        product = Product.objects.get()
+        self.assertEqual(product.slug, 'noutbuk')
+        self.assertEqual(product.price, Decimal('1000'))
+        self.assertEqual(Specification.objects.filter(product=product).count(), 1)
+        self.assertIn('Пропущена строка', stderr.getvalue())
+
+
+class RepriceTests(TestCase):
+    """Массовая переоценка одним UPDATE."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Категория', slug='cat')
+        manufacturer = Manufacturer.objects.create(name='Производитель', country='RU')
+        Product.objects.bulk_create([
+            Product(
+                name=f'Товар {price}', slug=f'product-{price}', description='', price=price,
+                quantity=1, category=category, manufacturer=manufacturer,
+            )
+            for price in (100, 99)
+        ])
+
+    def _prices(self):
+        return dict(Product.objects.values_list('slug', 'price'))
+
+    def test_fractional_and_small_percent(self):
+        for percent, expected in (('12.5', '112.50'), ('-0.4', '99.60'), ('10', '110.00')):
+            with self.subTest(percent=percent):
+                reprice(Product.objects.filter(slug='product-100'), [('percent', percent)])
+                self.assertEqual(self._prices()['product-100'], Decimal(expected))
+                Product.objects.filter(slug='product-100').update(price=100)
+
+    def test_rules_are_combined_and_logged(self):
+        updated = reprice(
+            Product.objects.all(), [('percent', 10), ('absolute', '-0.9'), ('round', 1)], reason='sale'
+        )
 
-# Create your tests here.
+        self.assertEqual(updated, 2)
+        self.assertEqual(self._prices(), {'product-100': Decimal('109'), 'product-99': Decimal('108')})
+        self.assertEqual(
+            sorted(PriceHistory.objects.values_list('old_price', 'new_price', 'reason')),
+            [(Decimal('99'), Decimal('108'), 'sale'), (Decimal('100'), Decimal('109'), 'sale')],
+        )
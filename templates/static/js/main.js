@@ -38,6 +38,9 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
 
+    // Подсказки в строке поиска
+    document.querySelectorAll('[data-suggest-url]').forEach(initSearchSuggest);
+
     // Автоматическое скрытие уведомлений
     const alerts = document.querySelectorAll('.alert');
     alerts.forEach(alert => {
@@ -78,4 +81,124 @@ function addToCartViaAPI(productId, quantity = 1) {
         console.error('Ошибка:', error);
         alert('Ошибка при добавлении в корзину');
     });
-}
\ No newline at end of file
+}
+
+/**
+ * Пачка изменений корзины одним запросом.
+ * operations: [{op: 'add'|'set'|'remove', product_id, quantity}]
+ */
+function updateCartViaAPI(operations) {
+    return postCartAPI('/api/cart/batch/', {operations: operations});
+}
+
+/**
+ * Повтор заказа: все позиции заказа добавляются в корзину одним запросом.
+ */
+function reorderViaAPI(orderId) {
+    return postCartAPI('/api/cart/reorder/', {order_id: orderId});
+}
+
+function postCartAPI(url, payload) {
+    const csrfToken = document.querySelector('[name=csrfmiddlewaretoken]').value;
+
+    return fetch(url, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': csrfToken,
+        },
+        body: JSON.stringify(payload)
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.error) {
+            alert('Ошибка: ' + data.error);
+        } else {
+            location.href = '/cart/';
+        }
+        return data;
+    })
+    .catch(error => {
+        console.error('Ошибка:', error);
+        alert('Ошибка при обновлении корзины');
+    });
+}
+
+const SUGGEST_TYPES = {
+    product: 'Товар',
+    category: 'Категория',
+    manufacturer: 'Производитель',
+    spec: 'Характеристика',
+};
+
+/**
+ * Подсказки поиска: запрос уходит после паузы в наборе, ответ на
+ * устаревший запрос отбрасывается, одинаковые строки не запрашиваются повторно.
+ */
+function initSearchSuggest(input, delay = 150) {
+    const menu = input.form.querySelector('.search-suggestions');
+    const url = input.dataset.suggestUrl;
+    let timer = null;
+    let controller = null;
+    let lastQuery = null;
+
+    function hide() {
+        menu.classList.remove('show');
+    }
+
+    function render(results) {
+        menu.replaceChildren(...results.map(item => {
+            const link = document.createElement('a');
+            link.className = 'dropdown-item d-flex justify-content-between';
+            link.href = item.url;
+            const text = document.createElement('span');
+            text.textContent = item.text;
+            const type = document.createElement('small');
+            type.className = 'text-muted ms-2';
+            type.textContent = SUGGEST_TYPES[item.type] || '';
+            link.append(text, type);
+            return link;
+        }));
+        menu.classList.toggle('show', results.length > 0);
+    }
+
+    function load() {
+        const query = input.value.trim();
+        if (query === lastQuery) {
+            return;
+        }
+        lastQuery = query;
+        if (controller) {
+            controller.abort();
+        }
+        if (!query) {
+            hide();
+            return;
+        }
+        controller = new AbortController();
+        fetch(url + '?' + new URLSearchParams({q: query, limit: 8}), {signal: controller.signal})
+            .then(response => response.json())
+            .then(data => render(data.results))
+            .catch(error => {
+                if (error.name !== 'AbortError') {
+                    console.error('Ошибка подсказок:', error);
+                }
+            });
+    }
+
+    input.addEventListener('input', () => {
+        clearTimeout(timer);
+        timer = setTimeout(load, delay);
+    });
+    input.addEventListener('focus', () => menu.classList.toggle('show', menu.children.length > 0));
+    input.addEventListener('keydown', event => {
+        if (event.key === 'Escape') {
+            hide();
+        }
+    });
+    document.addEventListener('click', event => {
+        if (!input.form.contains(event.target)) {
+            hide();
+        }
+    });
+}
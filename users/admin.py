@@ -1,5 +1,9 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+
+from utils.exports import export_action
+
+from .exports import UserExporter
 from .models import User
 
 
@@ -7,7 +11,11 @@ from .models import User
 class CustomUserAdmin(UserAdmin):
     list_display = ['username', 'email', 'phone', 'date_joined']
     list_filter = ['is_staff', 'is_superuser', 'is_active']
-    search_fields = ['username', 'email', 'phone']
+    search_fields = ['^username', '^email', '=phone']
+    actions = [
+        export_action(UserExporter),
+        export_action(UserExporter, output='ndjson', description='Экспорт в NDJSON'),
+    ]
 
     fieldsets = UserAdmin.fieldsets + (
         ('Дополнительная информация', {
@@ -0,0 +1,129 @@
+"""
+Аутентификация по токену с кэшированием пользователя.
+
+Соответствие токен → пользователь хранится в памяти процесса (короткий TTL)
+и, если TOKEN_AUTH_CACHE_TTL > 0, в общем кэше Django (Redis, см. CACHES).
+В общий кэш попадают только id пользователя и is_active: ни токен (ключ —
+его SHA-256), ни хэш пароля туда не пишутся. При выходе, смене пароля или
+деактивации запись удаляется после фиксации транзакции (см.
+users/signals.py); копии в памяти других процессов живут не дольше
+TOKEN_AUTH_LOCAL_TTL. С кэшем в памяти процесса общий уровень выключен
+(TOKEN_AUTH_CACHE_TTL = 0): удаление из него не дошло бы до других воркеров.
+"""
+
+import copy
+import hashlib
+import hmac
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+CACHE_PREFIX = 'auth:token:'
+LOCAL_MAX_SIZE = 10000
+
+_local = {}
+_local_lock = threading.Lock()
+
+
+def token_digest(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def _cache_key(digest):
+    return f'{CACHE_PREFIX}{digest}'
+
+
+def _local_get(digest):
+    entry = _local.get(digest)
+    if entry is None:
+        return None
+    expires, user = entry
+    if expires < time.monotonic():
+        with _local_lock:
+            _local.pop(digest, None)
+        return None
+    return user
+
+
+def _local_set(digest, user):
+    ttl = getattr(settings, 'TOKEN_AUTH_LOCAL_TTL', 5)
+    with _local_lock:
+        if len(_local) >= LOCAL_MAX_SIZE:
+            _local.clear()
+        _local[digest] = (time.monotonic() + ttl, user)
+
+
+def invalidate_token(key):
+    """Удаляет токен из кэшей (вызывается при отзыве)."""
+    digest = token_digest(key)
+    with _local_lock:
+        _local.pop(digest, None)
+    cache.delete(_cache_key(digest))
+
+
+def invalidate_tokens(keys):
+    """
+    Удаляет токены из кэшей после фиксации текущей транзакции: удаление до
+    неё позволило бы параллельному запросу снова закэшировать старое состояние.
+    """
+    keys = list(keys)
+
+    def invalidate():
+        for key in keys:
+            invalidate_token(key)
+
+    transaction.on_commit(invalidate)
+
+
+def invalidate_user_tokens(user_id):
+    invalidate_tokens(Token.objects.filter(user_id=user_id).values_list('key', flat=True))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без соединения с таблицей токенов на каждый API-запрос."""
+
+    def authenticate_credentials(self, key):
+        digest = token_digest(key)
+
+        user = _local_get(digest)
+        if user is None:
+            user = self._load_user(key, digest)
+            _local_set(digest, user)
+
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed('Пользователь неактивен или удалён.')
+
+        # Копия, чтобы изменения request.user не попадали в общий кэш процесса
+        user = copy.copy(user)
+        return user, Token(key=key, user=user)
+
+    def _load_user(self, key, digest):
+        ttl = getattr(settings, 'TOKEN_AUTH_CACHE_TTL', 0)
+        entry = cache.get(_cache_key(digest)) if ttl else None
+        if entry is not None:
+            user_id, is_active = entry
+            if not is_active:
+                raise exceptions.AuthenticationFailed('Пользователь неактивен или удалён.')
+            user = get_user_model().objects.filter(pk=user_id).first()
+            if user is not None:
+                return user
+
+        try:
+            token = Token.objects.select_related('user').get(key=key)
+        except Token.DoesNotExist:
+            raise exceptions.AuthenticationFailed('Недействительный токен.')
+        # Сравнение за постоянное время и с учётом регистра: сопоставление
+        # в БД может быть регистронезависимым (MySQL)
+        if not hmac.compare_digest(token.key.encode(), key.encode()):
+            raise exceptions.AuthenticationFailed('Недействительный токен.')
+
+        if ttl:
+            cache.set(_cache_key(digest), (token.user_id, token.user.is_active), ttl)
+        return token.user
@@ -0,0 +1,31 @@
+"""
+Выгрузка покупателей.
+"""
+
+from utils.exports import Exporter
+
+from .models import User
+
+
+class UserExporter(Exporter):
+    name = 'users'
+    filter_params = (
+        'is_staff__exact', 'is_superuser__exact', 'is_active__exact',
+        'date_joined__gte', 'date_joined__lt',
+    )
+    csv_header = (
+        'id', 'username', 'email', 'first_name', 'last_name', 'phone', 'address',
+        'date_joined', 'is_active',
+    )
+
+    def get_queryset(self):
+        return User.objects.all()
+
+    def csv_rows(self, user):
+        yield [
+            user.id, user.username, user.email, user.first_name, user.last_name,
+            user.phone, user.address, user.date_joined.isoformat(), user.is_active,
+        ]
+
+    def as_json(self, user):
+        return dict(zip(self.csv_header, next(self.csv_rows(user))))
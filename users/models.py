@@ -4,6 +4,9 @@
 
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.functions import Upper
+
+from utils.db import PatternOpClass
 
 
 class User(AbstractUser):
@@ -16,6 +19,11 @@ class User(AbstractUser):
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
         ordering = ['-date_joined']
+        indexes = [
+            # Поиск в админке и автодополнение по префиксу без учёта регистра
+            models.Index(PatternOpClass(Upper('username')), name='user_username_upper_idx'),
+            models.Index(PatternOpClass(Upper('email')), name='user_email_upper_idx'),
+        ]
 
     def __str__(self):
         return self.username
\ No newline at end of file
@@ -0,0 +1,37 @@
+"""
+Сброс кэша аутентификации по токену при отзыве доступа.
+"""
+
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_tokens, invalidate_user_tokens
+from .models import User
+
+
+# Поля, от которых зависит доступ по токену
+AUTH_FIELDS = {'password', 'is_active'}
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    """Смена пароля, деактивация, удаление — кэш пользователя устарел."""
+    # save(update_fields=['last_login']) и т.п. доступ не меняют
+    if update_fields is not None and not AUTH_FIELDS.intersection(update_fields):
+        return
+    invalidate_user_tokens(instance.pk)
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def token_changed(sender, instance, **kwargs):
+    invalidate_tokens([instance.key])
+
+
+@receiver(user_logged_out)
+def user_logged_out_handler(sender, user, **kwargs):
+    if user is not None:
+        invalidate_user_tokens(user.pk)
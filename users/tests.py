@@ -1,3 +1,102 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from . import authentication
+from .models import User
+
+
+class TokenAuthenticationTestMixin:
+
+    def setUp(self):
+        cache.clear()
+        authentication._local.clear()
+        self.user = User.objects.create_user('buyer', 'buyer@example.com', 'secret')
+        self.token = Token.objects.create(user=self.user)
+
+    def _get(self, key=None):
+        return self.client.get('/api/orders/', HTTP_AUTHORIZATION=f'Token {key or self.token.key}')
+
+    def _forget_local(self):
+        # Истёк TOKEN_AUTH_LOCAL_TTL (или запрос пришёл в другой воркер)
+        authentication._local.clear()
+
+    def _cached(self):
+        return cache.get(authentication._cache_key(authentication.token_digest(self.token.key)))
+
+
+@override_settings(TOKEN_AUTH_CACHE_TTL=300)
+class SharedTokenCacheTests(TokenAuthenticationTestMixin, TestCase):
+    """Общий кэш токенов: что в нём хранится и когда он сбрасывается."""
+
+    def test_shared_cache_holds_only_id_and_flag(self):
+        self.assertEqual(self._get().status_code, 200)
+        self.assertEqual(self._cached(), (self.user.pk, True))
+
+        self._forget_local()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self._get().status_code, 200)
+        self.assertFalse(any('authtoken_token' in query['sql'] for query in queries))
+
+    def test_revoked_token_is_rejected(self):
+        self.assertEqual(self._get().status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/auth/logout/', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+        self.assertEqual(self._get().status_code, 401)
+
+    def test_deactivation_is_applied_after_commit(self):
+        self.assertEqual(self._get().status_code, 200)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.is_active = False
+            self.user.save(update_fields=['is_active'])
+        # До фиксации запись не трогаем: иначе её заново заполнили бы старым состоянием
+        self.assertEqual(self._cached(), (self.user.pk, True))
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self._get().status_code, 401)
+        self._forget_local()
+        self.assertEqual(self._get().status_code, 401)
+
+    def test_unrelated_update_keeps_cache(self):
+        self.assertEqual(self._get().status_code, 200)
+
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks() as callbacks:
+            self.user.save(update_fields=['last_login'])
+
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(callbacks, [])
+        self.assertIsNotNone(self._cached())
+
+    def test_token_key_must_match_exactly(self):
+        with mock.patch.object(Token.objects, 'select_related') as select_related:
+            select_related.return_value.get.return_value = self.token
+            self.assertEqual(self._get(self.token.key.upper()).status_code, 401)
+
+
+class LocalTokenCacheTests(TokenAuthenticationTestMixin, TestCase):
+    """Без общего кэша (кэш Django в памяти процесса) общий уровень выключен."""
+
+    def test_nothing_is_cached_across_workers(self):
+        self.assertEqual(self._get().status_code, 200)
+
+        self.assertIsNone(self._cached())
+
+    def test_revocation_in_another_worker_applies_after_local_ttl(self):
+        self.assertEqual(self._get().status_code, 200)
+
+        # Выход обработал другой воркер: кэши этого процесса не сбрасывались
+        with mock.patch.object(authentication, 'invalidate_token'):
+            with self.captureOnCommitCallbacks(execute=True):
+                Token.objects.filter(pk=self.token.pk).delete()
+        self.assertEqual(self._get().status_code, 200)
+
+        self._forget_local()
+        self.assertEqual(self._get().status_code, 401)
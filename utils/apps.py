@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class UtilsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'utils'
\ No newline at end of file
+    name = 'utils'
+
+    def ready(self):
+        from .db import configure_sqlite, register_index_wrappers
+        connection_created.connect(configure_sqlite, dispatch_uid='utils.configure_sqlite')
+        register_index_wrappers()
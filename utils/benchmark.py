@@ -0,0 +1,620 @@
+"""
+Нагрузочные бенчмарки: генератор данных и прогон сценариев.
+
+generate_data() заполняет пустую БД детерминированным набором (одинаковый
+seed — одинаковые данные): каталог с характеристиками и изображениями,
+пользователи, история заказов. Записи вставляются пачками bulk_create.
+
+run_benchmarks() гоняет сценарии через django.test.Client в нескольких
+потоках (WSGI) и/или через AsyncClient в event loop (ASGI) — полный стек
+middleware, без сети — и считает перцентили задержки,
+пропускную способность и число SQL-запросов на запрос. compare_with_baseline()
+сравнивает результат с сохранённым эталоном.
+"""
+
+import asyncio
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connections, transaction
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+
+from orders.models import Cart, CartItem, Order, OrderEvent, OrderItem
+from products.importing import make_slug
+from products.models import Category, Manufacturer, Product, ProductImage, Specification
+from products.signals import catalog_changed
+from users.models import User
+from utils.transactions_utils import transactional
+
+DEFAULT_SEED = 42
+
+# (категория, товар в единственном числе, серии моделей)
+KINDS = [
+    ('Ноутбуки', 'Ноутбук', ['Air', 'Pro', 'Book', 'Gaming']),
+    ('Мониторы', 'Монитор', ['View', 'Ultra', 'Office', 'Curve']),
+    ('Видеокарты', 'Видеокарта', ['RTX', 'RX', 'Arc', 'Turbo']),
+    ('Процессоры', 'Процессор', ['Core', 'Ryzen', 'Xeon', 'Athlon']),
+    ('Материнские платы', 'Материнская плата', ['Prime', 'Tuf', 'Aorus', 'Pro']),
+    ('Оперативная память', 'Модуль памяти', ['Fury', 'Vengeance', 'Ripjaws', 'Value']),
+    ('Накопители SSD', 'SSD', ['Evo', 'Nvme', 'Blue', 'Black']),
+    ('Блоки питания', 'Блок питания', ['Gold', 'Bronze', 'Modular', 'Silent']),
+    ('Корпуса', 'Корпус', ['Tower', 'Mini', 'Mesh', 'Glass']),
+    ('Клавиатуры', 'Клавиатура', ['Mech', 'Slim', 'Wireless', 'Tkl']),
+    ('Мыши', 'Мышь', ['Click', 'Glide', 'Sniper', 'Ergo']),
+    ('Смартфоны', 'Смартфон', ['Note', 'Mini', 'Max', 'Lite']),
+]
+
+MANUFACTURERS = [
+    ('Asus', 'Тайвань'), ('Acer', 'Тайвань'), ('MSI', 'Тайвань'), ('Gigabyte', 'Тайвань'),
+    ('Lenovo', 'Китай'), ('Huawei', 'Китай'), ('Xiaomi', 'Китай'), ('Dell', 'США'),
+    ('HP', 'США'), ('Intel', 'США'), ('AMD', 'США'), ('Nvidia', 'США'),
+    ('Corsair', 'США'), ('Kingston', 'США'), ('Samsung', 'Корея'), ('LG', 'Корея'),
+    ('Logitech', 'Швейцария'), ('Be Quiet', 'Германия'), ('Apple', 'США'), ('Sony', 'Япония'),
+]
+
+SPECS = [
+    ('Цвет', ['черный', 'белый', 'серый', 'серебристый', 'синий']),
+    ('Гарантия производителя', ['1 год', '2 года', '3 года']),
+    ('Страна производства', ['Китай', 'Тайвань', 'Вьетнам', 'Малайзия']),
+    ('Интерфейс', ['USB-C', 'USB-A', 'PCIe 4.0', 'PCIe 5.0', 'SATA', 'Bluetooth']),
+    ('Вес', ['0.1 кг', '0.5 кг', '1.2 кг', '1.8 кг', '2.5 кг', '8 кг']),
+    ('Подсветка', ['нет', 'RGB', 'белая']),
+    ('Энергопотребление', ['15 Вт', '65 Вт', '125 Вт', '250 Вт', '450 Вт']),
+]
+
+# Слова для сценария поиска: встречаются в названиях товаров
+SEARCH_TERMS = [kind[1] for kind in KINDS] + [name for name, country in MANUFACTURERS]
+
+ORDER_STATUSES = ['delivered'] * 6 + ['cancelled', 'shipped', 'processing', 'pending']
+PAYMENT_METHODS = [code for code, label in Order.PAYMENT_METHOD_CHOICES]
+
+# Точка отсчёта дат заказов: от текущего времени данные зависеть не должны
+ORDERS_EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+ORDERS_SPAN_SECONDS = 365 * 24 * 3600
+
+WORKER_USERNAME = 'benchmark-worker-{}'
+
+
+@contextmanager
+def _explicit_timestamps(model):
+    """Отключает auto_now/auto_now_add, чтобы bulk_create сохранил заданные даты."""
+    fields = [
+        (field, field.auto_now, field.auto_now_add)
+        for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    for field, auto_now, auto_now_add in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in fields:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _chunks(total, size):
+    for start in range(0, total, size):
+        yield start, min(start + size, total)
+
+
+def generate_data(products=100_000, orders=1_000_000, users=None, seed=DEFAULT_SEED,
+                  batch_size=5000, progress=None):
+    """
+    Заполняет пустую БД данными для бенчмарков.
+
+    users по умолчанию — один покупатель на десять заказов. progress(stage, done, total)
+    вызывается после каждой пачки. Возвращает число созданных записей по моделям.
+    """
+    if Product.objects.exists() or Order.objects.exists():
+        raise ValueError('Генератор заполняет только пустую БД: в ней уже есть товары или заказы')
+    if users is None:
+        users = max(1, orders // 10)
+    progress = progress or (lambda stage, done, total: None)
+    rng = random.Random(seed)
+    now = ORDERS_EPOCH
+
+    categories = Category.objects.bulk_create([
+        Category(name=name, slug=make_slug(name), description=f'{name} для бенчмарков')
+        for name, singular, series in KINDS
+    ])
+    manufacturers = Manufacturer.objects.bulk_create([
+        Manufacturer(name=name, country=country) for name, country in MANUFACTURERS
+    ])
+    counts = {'categories': len(categories), 'manufacturers': len(manufacturers)}
+
+    # (id, name, slug, price, image) — для снимков позиций заказов
+    catalog = []
+    counts.update(products=0, specifications=0, images=0)
+    for start, end in _chunks(products, batch_size):
+        batch, extras = [], []
+        for number in range(start, end):
+            kind_index = rng.randrange(len(KINDS))
+            category_name, singular, series = KINDS[kind_index]
+            manufacturer = rng.choice(manufacturers)
+            name = f'{singular} {manufacturer.name} {rng.choice(series)} {rng.randint(100, 9999)}'
+            batch.append(Product(
+                name=name,
+                slug=f'{make_slug(name)}-{number}',
+                description=f'{name}. {category_name}, модель {number}.',
+                price=Decimal(rng.randint(500, 300000)),
+                category=categories[kind_index],
+                manufacturer=manufacturer,
+                quantity=0 if rng.random() < 0.1 else rng.randint(1, 500),
+                warranty=rng.choice([6, 12, 24, 36]),
+            ))
+            extras.append((
+                rng.sample(SPECS, rng.randint(3, 6)),
+                rng.randint(1, 3),
+            ))
+
+        with transaction.atomic():
+            Product.objects.bulk_create(batch)
+            specs, images = [], []
+            for product, (spec_rows, image_count) in zip(batch, extras):
+                specs.extend(
+                    Specification(product=product, name=spec_name, value=rng.choice(values))
+                    for spec_name, values in spec_rows
+                )
+                images.extend(
+                    ProductImage(
+                        product=product,
+                        image=f'products/bench/{product.slug}-{index}.jpg',
+                        alt_text=product.name[:100],
+                        is_main=index == 0,
+                    )
+                    for index in range(image_count)
+                )
+                catalog.append((product.id, product.name, product.slug, product.price,
+                                f'products/bench/{product.slug}-0.jpg'))
+            Specification.objects.bulk_create(specs)
+            ProductImage.objects.bulk_create(images)
+
+        counts['products'] += len(batch)
+        counts['specifications'] += len(specs)
+        counts['images'] += len(images)
+        progress('products', end, products)
+
+    # Хэш пароля считается один раз: make_password на каждого занял бы минуты
+    password = make_password('benchmark')
+    user_ids = []
+    for start, end in _chunks(users, batch_size):
+        created = User.objects.bulk_create([
+            User(username=f'user{number:07d}', email=f'user{number:07d}@example.com',
+                 password=password, phone=f'+7900{number:07d}')
+            for number in range(start, end)
+        ])
+        user_ids.extend(user.id for user in created)
+        progress('users', end, users)
+    counts['users'] = len(user_ids)
+
+    counts.update(orders=0, order_items=0)
+    # Событие создания на каждый заказ: журнал читают агрегаты продаж и рекомендации
+    with _explicit_timestamps(Order), _explicit_timestamps(OrderEvent):
+        for start, end in _chunks(orders, batch_size):
+            batch, batch_items = [], []
+            for number in range(start, end):
+                created_at = now + timedelta(seconds=rng.randrange(ORDERS_SPAN_SECONDS))
+                items = []
+                for product_id, name, slug, price, image in rng.sample(catalog, rng.randint(1, 4)):
+                    items.append(OrderItem(
+                        product_id=product_id, quantity=rng.randint(1, 3), price=price,
+                        product_name=name, product_slug=slug, product_image=image,
+                    ))
+                order = Order(
+                    user_id=rng.choice(user_ids),
+                    order_number=f'BN{number:012d}',
+                    status=rng.choice(ORDER_STATUSES),
+                    payment_method=rng.choice(PAYMENT_METHODS),
+                    total_price=sum(item.price * item.quantity for item in items),
+                    shipping_address=f'г. Москва, ул. Тестовая, д. {rng.randint(1, 200)}',
+                    phone=f'+7900{rng.randrange(10 ** 7):07d}',
+                    email=f'user{number % users:07d}@example.com',
+                    created_at=created_at,
+                    updated_at=created_at,
+                )
+                order.fill_summary(items)
+                batch.append(order)
+                batch_items.append(items)
+
+            with transaction.atomic():
+                Order.objects.bulk_create(batch)
+                rows = []
+                for order, items in zip(batch, batch_items):
+                    for item in items:
+                        item.order = order
+                        rows.append(item)
+                OrderItem.objects.bulk_create(rows)
+                OrderEvent.objects.bulk_create([
+                    OrderEvent(order=order, from_status='', to_status=order.status,
+                               source='benchmark', created_at=order.created_at)
+                    for order in batch
+                ])
+
+            counts['orders'] += len(batch)
+            counts['order_items'] += len(rows)
+            progress('orders', end, orders)
+
+    catalog_changed.send(sender=Product)
+    return counts
+
+
+# --- Сценарии ---
+
+class Scenario:
+    """
+    Один вид запроса. request(context, rng) возвращает (method, path, data);
+    prepare(context, worker) выполняется перед каждым запросом и не измеряется.
+    auth: None — аноним, 'session' — вход через сессию, 'token' — заголовок токена.
+    """
+
+    def __init__(self, name, request, auth=None, prepare=None):
+        self.name = name
+        self.request = request
+        self.auth = auth
+        self.prepare = prepare
+
+
+def _price_band(rng):
+    low = rng.randrange(500, 290000, 500)
+    return low, low + rng.choice([2000, 5000, 20000])
+
+
+def _browse(context, rng):
+    return 'get', f'/api/products/?page={rng.randint(1, context["pages"])}', None
+
+
+def _filter(context, rng):
+    low, high = _price_band(rng)
+    return 'get', (
+        f'/api/products/?category={rng.choice(context["categories"])}'
+        f'&min_price={low}&max_price={high}'
+    ), None
+
+
+def _catalog_page(context, rng):
+    low, high = _price_band(rng)
+    return 'get', (
+        f'/products/?category={rng.choice(context["categories"])}'
+        f'&min_price={low}&max_price={high}'
+    ), None
+
+
+def _search(context, rng):
+    return 'get', f'/api/products/?search={rng.choice(SEARCH_TERMS)}', None
+
+
+def _detail(context, rng):
+    return 'get', f'/products/{rng.choice(context["products"])}/', None
+
+
+def _cart_add(context, rng):
+    return 'post', '/api/cart/add_item/', {
+        'product_id': rng.choice(context['in_stock']), 'quantity': 1,
+    }
+
+
+def _async_browse(context, rng):
+    return 'get', f'/api/async/products/?page={rng.randint(1, context["pages"])}', None
+
+
+def _async_filter(context, rng):
+    method, path, data = _filter(context, rng)
+    return method, path.replace('/api/', '/api/async/', 1), data
+
+
+def _api_detail(context, rng):
+    return 'get', f'/api/products/{rng.choice(context["products"])}/', None
+
+
+def _async_detail(context, rng):
+    return 'get', f'/api/async/products/{rng.choice(context["products"])}/', None
+
+
+def _async_cart_add(context, rng):
+    return 'post', '/api/async/cart/items/', {
+        'product_id': rng.choice(context['in_stock']), 'quantity': 1,
+    }
+
+
+def _cart_page(context, rng):
+    return 'get', '/cart/', None
+
+
+@transactional
+def _fill_cart(context, worker):
+    cart, created = Cart.objects.get_or_create(user=worker['user'])
+    cart.items.all().delete()
+    CartItem.objects.add(cart, worker['rng'].choice(context['in_stock']), 1)
+
+
+def _checkout(context, rng):
+    return 'post', '/api/orders/', {
+        'payment_method': 'card',
+        'shipping_address': 'г. Москва, ул. Тестовая, д. 1',
+        'phone': '+79000000000',
+    }
+
+
+SCENARIOS = {
+    scenario.name: scenario for scenario in [
+        Scenario('home', lambda context, rng: ('get', '/', None)),
+        Scenario('catalog_browse', _browse),
+        Scenario('catalog_filter', _filter),
+        Scenario('catalog_page', _catalog_page),
+        Scenario('search', _search),
+        Scenario('product_detail', _detail),
+        Scenario('cart_add', _cart_add, auth='token'),
+        Scenario('cart_page', _cart_page, auth='session', prepare=_fill_cart),
+        Scenario('checkout', _checkout, auth='token', prepare=_fill_cart),
+        # Те же запросы к async-эндпоинтам: сравнивать с ними удобнее под --handler both
+        Scenario('api_product_detail', _api_detail),
+        Scenario('async_catalog_browse', _async_browse),
+        Scenario('async_catalog_filter', _async_filter),
+        Scenario('async_product_detail', _async_detail),
+        Scenario('async_cart_add', _async_cart_add, auth='token'),
+        Scenario('api_cart', lambda context, rng: ('get', '/api/cart/', None),
+                 auth='token', prepare=_fill_cart),
+        Scenario('async_cart', lambda context, rng: ('get', '/api/async/cart/', None),
+                 auth='token', prepare=_fill_cart),
+    ]
+}
+
+
+def build_context():
+    """Идентификаторы, из которых сценарии выбирают параметры запросов."""
+    products = list(Product.objects.order_by('id').values_list('id', flat=True))
+    if not products:
+        raise ValueError('В БД нет товаров: сначала выполните generate_benchmark_data')
+    page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE') or 20
+    return {
+        'products': products,
+        'in_stock': list(
+            Product.objects.filter(quantity__gt=100).order_by('id').values_list('id', flat=True)
+        ) or products,
+        'categories': list(Category.objects.order_by('id').values_list('id', flat=True)),
+        # Глубокие страницы — отдельная тема; бенчмарк листает первые 50
+        'pages': max(1, min(50, len(products) // page_size)),
+    }
+
+
+def _worker_users(count):
+    password = make_password(None)
+    users = []
+    for index in range(count):
+        user, created = User.objects.get_or_create(
+            username=WORKER_USERNAME.format(index),
+            defaults={'email': f'benchmark-{index}@example.com', 'password': password},
+        )
+        token, created = Token.objects.get_or_create(user=user)
+        users.append((user, token.key))
+    return users
+
+
+def percentile(values, q):
+    """Перцентиль q (0–100) отсортированного списка с линейной интерполяцией."""
+    if not values:
+        return 0.0
+    position = (len(values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+# Число запросов берётся из Server-Timing QueryInstrumentationMiddleware:
+# так оно одинаково считается под WSGI и под ASGI, где SQL идёт в другом потоке
+_QUERIES_TIMING = re.compile(r'desc="(\d+) queries"')
+
+HANDLERS = ('wsgi', 'asgi')
+
+
+def _query_count(response):
+    match = _QUERIES_TIMING.search(response.headers.get('Server-Timing', ''))
+    return int(match.group(1)) if match else 0
+
+
+def _auth_headers(scenario, token):
+    return {'Authorization': f'Token {token}'} if scenario.auth == 'token' else {}
+
+
+def _send(client, method, path, data, headers):
+    """Запрос клиентом Client или AsyncClient (у второго — корутина)."""
+    if method == 'get':
+        return client.get(path, headers=headers)
+    return getattr(client, method)(path, data, content_type='application/json', headers=headers)
+
+
+def _run_worker(scenario, context, user, token, iterations, warmup, seed, results):
+    rng = random.Random(seed)
+    worker = {'user': user, 'rng': rng}
+    # Ошибка представления — это ответ 500 и ошибка в отчёте, а не падение потока
+    client = Client(raise_request_exception=False)
+    headers = _auth_headers(scenario, token)
+    if scenario.auth == 'session':
+        client.force_login(user)
+
+    try:
+        for iteration in range(warmup + iterations):
+            if scenario.prepare:
+                scenario.prepare(context, worker)
+            method, path, data = scenario.request(context, rng)
+            started = time.perf_counter()
+            response = _send(client, method, path, data, headers)
+            elapsed = time.perf_counter() - started
+            if iteration >= warmup:
+                results.append((elapsed, _query_count(response), response.status_code < 400))
+    finally:
+        # Соединения потока закрываются вместе с ним, а не по сборке мусора
+        connections.close_all()
+
+
+async def _run_async_worker(scenario, context, user, token, iterations, warmup, seed, results):
+    rng = random.Random(seed)
+    worker = {'user': user, 'rng': rng}
+    client = AsyncClient(raise_request_exception=False)
+    headers = _auth_headers(scenario, token)
+    if scenario.auth == 'session':
+        await sync_to_async(client.force_login)(user)
+
+    for iteration in range(warmup + iterations):
+        if scenario.prepare:
+            await sync_to_async(scenario.prepare)(context, worker)
+        method, path, data = scenario.request(context, rng)
+        started = time.perf_counter()
+        # ASGIHandler даёт каждому запросу свой поток для синхронного кода,
+        # AsyncClient — нет: без контекста запросы делили бы одно соединение
+        async with ThreadSensitiveContext():
+            response = await _send(client, method, path, data, headers)
+        elapsed = time.perf_counter() - started
+        if iteration >= warmup:
+            results.append((elapsed, _query_count(response), response.status_code < 400))
+
+
+def _run_asgi(scenario, context, users, per_worker, concurrency, warmup, seed, results):
+    """concurrency задач в одном event loop — как воркер uvicorn."""
+    async def main():
+        await asyncio.gather(*[
+            _run_async_worker(scenario, context, users[index][0], users[index][1],
+                              per_worker, warmup, seed * 1000 + index, results)
+            for index in range(concurrency)
+        ])
+        await sync_to_async(connections.close_all)()
+
+    asyncio.run(main())
+
+
+def _run_wsgi(scenario, context, users, per_worker, concurrency, warmup, seed, results):
+    """concurrency потоков — как воркер gunicorn с потоками."""
+    threads = [
+        threading.Thread(
+            target=_run_worker,
+            args=(scenario, context, users[index][0], users[index][1], per_worker,
+                  warmup, seed * 1000 + index, results),
+        )
+        for index in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def run_scenario(scenario, context, users, requests=200, concurrency=4, warmup=10,
+                 seed=DEFAULT_SEED, handler='wsgi'):
+    """
+    Прогоняет сценарий через обработчик handler ('wsgi' — Client в потоках,
+    'asgi' — AsyncClient в event loop) и возвращает сводку метрик.
+    """
+    if handler not in HANDLERS:
+        raise ValueError(f'Неизвестный обработчик: {handler}')
+    per_worker = max(1, requests // concurrency)
+    results = []
+    run = _run_asgi if handler == 'asgi' else _run_wsgi
+    started = time.perf_counter()
+    run(scenario, context, users, per_worker, concurrency, warmup, seed, results)
+    wall = time.perf_counter() - started
+
+    latencies = sorted(elapsed * 1000 for elapsed, queries, ok in results)
+    queries = [queries for elapsed, queries, ok in results]
+    total = len(results)
+    return {
+        'handler': handler,
+        'requests': total,
+        'errors': sum(1 for elapsed, queries, ok in results if not ok),
+        'concurrency': concurrency,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p90_ms': round(percentile(latencies, 90), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'mean_ms': round(sum(latencies) / total, 2) if total else 0.0,
+        'max_ms': round(latencies[-1], 2) if latencies else 0.0,
+        # Прогрев входит во время стены, поэтому пропускная способность — нижняя оценка
+        'throughput_rps': round(total / wall, 2) if wall else 0.0,
+        'queries_per_request': round(sum(queries) / total, 2) if total else 0.0,
+        'max_queries': max(queries, default=0),
+    }
+
+
+def run_benchmarks(names=None, requests=200, concurrency=4, warmup=10, seed=DEFAULT_SEED,
+                   handlers=('wsgi',), progress=None):
+    """
+    Прогоняет сценарии names (по умолчанию все) через каждый обработчик из
+    handlers и возвращает отчёт для JSON. Результаты под ASGI хранятся под
+    ключом 'имя:asgi', чтобы оба варианта лежали рядом в одном отчёте.
+    """
+    names = names or list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise ValueError(f'Неизвестные сценарии: {", ".join(unknown)}')
+    for handler in handlers:
+        if handler not in HANDLERS:
+            raise ValueError(f'Неизвестный обработчик: {handler}')
+
+    context = build_context()
+    users = _worker_users(concurrency)
+    report = {
+        'meta': {
+            'seed': seed,
+            'requests': requests,
+            'concurrency': concurrency,
+            'warmup': warmup,
+            'handlers': list(handlers),
+            'database': connections['default'].vendor,
+            'products': len(context['products']),
+            'orders': Order.objects.count(),
+            'started_at': datetime.now(dt_timezone.utc).isoformat(timespec='seconds'),
+        },
+        'scenarios': {},
+    }
+    # django.test.Client обращается к хосту testserver; Server-Timing нужен на каждом ответе
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                           SQL_INSTRUMENTATION_SAMPLE_RATE=1.0):
+        for name in names:
+            for handler in handlers:
+                key = name if handler == 'wsgi' else f'{name}:{handler}'
+                report['scenarios'][key] = run_scenario(
+                    SCENARIOS[name], context, users, requests, concurrency, warmup, seed, handler,
+                )
+                if progress:
+                    progress(key, report['scenarios'][key])
+    return report
+
+
+def compare_with_baseline(report, baseline, tolerance=0.2):
+    """
+    Список регрессий относительно эталона.
+
+    Задержка p95, пропускная способность и число SQL-запросов на запрос
+    сравниваются с допуском tolerance (повторы транзакций при конфликтах
+    немного меняют число запросов), ошибки недопустимы. Сценарии, которых
+    нет в эталоне, не проверяются.
+    """
+    failures = []
+    for name, result in report['scenarios'].items():
+        base = baseline.get('scenarios', {}).get(name)
+        if base is None:
+            continue
+        if result['errors']:
+            failures.append(f'{name}: ошибок {result["errors"]} из {result["requests"]}')
+        if result['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            failures.append(f'{name}: p95 {result["p95_ms"]} мс > эталона {base["p95_ms"]} мс')
+        if result['throughput_rps'] < base['throughput_rps'] * (1 - tolerance):
+            failures.append(
+                f'{name}: {result["throughput_rps"]} запр./с < эталона {base["throughput_rps"]}'
+            )
+        if result['queries_per_request'] > base['queries_per_request'] * (1 + tolerance):
+            failures.append(
+                f'{name}: {result["queries_per_request"]} SQL-запросов на запрос '
+                f'> эталона {base["queries_per_request"]}'
+            )
+    return failures
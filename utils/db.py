@@ -0,0 +1,73 @@
+"""
+Настройка соединений с БД: таймауты запросов, профиль SQLite и индексы.
+"""
+
+from contextlib import contextmanager
+
+from django.contrib.postgres.indexes import OpClass
+from django.db import connections, transaction
+from django.db.models import OrderBy
+from django.db.models.functions import Collate
+from django.db.models.indexes import IndexExpression
+
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-65536',
+)
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Обработчик connection_created: WAL, synchronous=NORMAL и mmap для SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+
+
+@contextmanager
+def statement_timeout(milliseconds, using='default'):
+    """
+    Ограничивает время запросов внутри блока (PostgreSQL).
+
+    Открывает транзакцию и задаёт SET LOCAL statement_timeout: значение
+    сбрасывается при её завершении и не переходит на следующий запрос,
+    получивший это соединение из пула. На других СУБД ничего не делает.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql' or not milliseconds:
+        yield
+        return
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SET LOCAL statement_timeout = {int(milliseconds)}')
+        yield
+
+
+class PatternOpClass(OpClass):
+    """
+    text_pattern_ops для выражения в индексе (PostgreSQL).
+
+    Без него индекс по UPPER(...) в локали, отличной от C, не используется
+    для LIKE 'префикс%'. На SQLite классов операторов нет — остаётся
+    само выражение.
+    """
+
+    def __init__(self, expression, name='text_pattern_ops'):
+        super().__init__(expression, name=name)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return compiler.compile(self.get_source_expressions()[0])
+
+
+def register_index_wrappers():
+    """
+    Разрешает PatternOpClass поверх выражения индекса.
+
+    IndexExpression сверяет обёртки по точному типу, поэтому подкласс
+    регистрируется рядом с OpClass (как это делает django.contrib.postgres).
+    """
+    IndexExpression.register_wrappers(OrderBy, OpClass, PatternOpClass, Collate)
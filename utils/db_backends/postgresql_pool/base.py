@@ -0,0 +1,164 @@
+"""
+PostgreSQL с пулом соединений внутри процесса.
+
+Django 4.2 не умеет пулить соединения: при CONN_MAX_AGE=0 каждый запрос
+открывает новое соединение, при CONN_MAX_AGE>0 соединение держится за
+потоком. Этот backend отдаёт соединение в общий пул, когда Django его
+закрывает, и берёт готовое из пула при следующем подключении.
+
+Настройки — в OPTIONS['pool']: max_size и timeout (секунды ожидания
+свободного соединения). CONN_MAX_AGE должен быть 0.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+from django.db import OperationalError
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel, is_psycopg3
+
+# Значения transaction_status совпадают в psycopg2 и psycopg 3
+TRANSACTION_STATUS_IDLE = 0
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """Пул соединений с ограничением размера и метриками ожидания."""
+
+    def __init__(self, max_size=10, timeout=10):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.pid = os.getpid()
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.opened = 0
+        self.requests = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self.timeouts = 0
+
+    def getconn(self, connect):
+        """Свободное соединение из пула или новое через connect()."""
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise OperationalError(
+                f'Нет свободных соединений в пуле за {self.timeout} с (max_size={self.max_size})'
+            )
+        waited = time.monotonic() - started
+
+        with self._lock:
+            self.requests += 1
+            if waited > 0.001:
+                self.waits += 1
+            self.wait_time += waited
+            self.max_wait = max(self.max_wait, waited)
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            connection = self._idle.pop() if self._idle else None
+
+        try:
+            if connection is None or connection.closed:
+                connection = connect()
+                with self._lock:
+                    self.opened += 1
+        except Exception:
+            self._release_slot()
+            raise
+        return connection
+
+    def putconn(self, connection):
+        keep = not connection.closed
+        if keep and connection.info.transaction_status != TRANSACTION_STATUS_IDLE:
+            try:
+                connection.rollback()
+            except Exception:
+                keep = False
+        if not keep:
+            try:
+                connection.close()
+            except Exception:
+                pass
+        with self._lock:
+            if keep:
+                self._idle.append(connection)
+        self._release_slot()
+
+    def _release_slot(self):
+        with self._lock:
+            self.in_use -= 1
+        self._slots.release()
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'max_size': self.max_size,
+                'in_use': self.in_use,
+                'idle': len(self._idle),
+                'peak_in_use': self.peak_in_use,
+                'saturation': round(self.in_use / self.max_size, 3),
+                'opened': self.opened,
+                'requests': self.requests,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+                'wait_time_ms': round(self.wait_time * 1000, 3),
+                'avg_wait_ms': round(self.wait_time * 1000 / self.requests, 3) if self.requests else 0,
+                'max_wait_ms': round(self.max_wait * 1000, 3),
+            }
+
+
+def pool_metrics():
+    """Метрики всех пулов процесса: {alias: {...}}."""
+    with _pools_lock:
+        return {alias: pool.metrics() for alias, pool in _pools.items()}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pool', None)
+        if not is_psycopg3:
+            # Серверные prepared statements есть только в psycopg 3
+            params.pop('prepare_threshold', None)
+        return params
+
+    @property
+    def pool(self):
+        pool = _pools.get(self.alias)
+        # После fork соединения родителя не используем: у процесса свой пул
+        if pool is None or pool.pid != os.getpid():
+            with _pools_lock:
+                pool = _pools.get(self.alias)
+                if pool is None or pool.pid != os.getpid():
+                    options = self.settings_dict['OPTIONS'].get('pool') or {}
+                    pool = ConnectionPool(
+                        max_size=options.get('max_size', 10),
+                        timeout=options.get('timeout', 10),
+                    )
+                    _pools[self.alias] = pool
+        return pool
+
+    def get_new_connection(self, conn_params):
+        connection = self.pool.getconn(
+            lambda: base.DatabaseWrapper.get_new_connection(self, conn_params)
+        )
+        # Для соединения из пула уровень изоляции задан при его создании
+        self.isolation_level = IsolationLevel(
+            self.settings_dict['OPTIONS'].get('isolation_level', IsolationLevel.READ_COMMITTED)
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.putconn(self.connection)
@@ -0,0 +1,102 @@
+"""
+Маршрутизация чтения на реплики с привязкой к основной БД после записи.
+
+Чтение моделей из REPLICA_READ_APPS (каталог, история заказов) идёт на
+реплики, запись и блокирующее чтение (select_for_update помечает queryset
+как запись) — на основную БД. Запросы внутри транзакции основной БД и
+запросы пользователя в течение REPLICA_LAG_WINDOW секунд после его записи
+тоже читают с основной: так пользователь видит собственные изменения.
+"""
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'db_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+_pinned = ContextVar('db_pinned_to_primary', default=False)
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS]
+
+
+@contextmanager
+def use_primary():
+    """Все чтения внутри блока идут на основную БД."""
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in settings.REPLICA_READ_APPS:
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        replicas = replica_aliases()
+        if not replicas or _pinned.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная БД
+        return True
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Привязывает чтение к основной БД для изменяющих запросов и на
+    REPLICA_LAG_WINDOW секунд после них (через cookie).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        writes = request.method not in SAFE_METHODS
+        token = _pinned.set(writes or PIN_COOKIE in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            _pinned.reset(token)
+        return self.set_pin(request, response)
+
+    async def __acall__(self, request):
+        # ContextVar копируется в потоки sync_to_async, так что роутер видит привязку
+        token = _pinned.set(request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _pinned.reset(token)
+        return self.set_pin(request, response)
+
+    def set_pin(self, request, response):
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=settings.REPLICA_LAG_WINDOW,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,155 @@
+"""
+Учёт SQL-запросов каждого запроса к сайту.
+
+QueryInstrumentationMiddleware через execute_wrapper считает запросы,
+время в БД и повторы одинаковых запросов (отпечаток — SQL без параметров,
+списки IN сворачиваются). Результат уходит в заголовок Server-Timing,
+медленные запросы и подозрения на N+1 пишутся в лог с местом вызова.
+Доля инструментируемых запросов задаётся SQL_INSTRUMENTATION_SAMPLE_RATE.
+"""
+
+import logging
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r'\((?:%s, )+%s\)')
+_PROJECT_ROOT = str(settings.BASE_DIR) + os.sep
+
+
+def fingerprint(sql):
+    """SQL без параметров; IN (%s, %s, ...) любой длины даёт один отпечаток."""
+    return _IN_LIST.sub('(%s...)', sql)
+
+
+def call_site():
+    """Первая строка кода проекта в стеке: 'orders/views.py:42 in view'."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (filename.startswith(_PROJECT_ROOT) and filename != __file__
+                and 'site-packages' not in filename):
+            return (
+                f'{filename[len(_PROJECT_ROOT):]}:{frame.f_lineno} '
+                f'in {frame.f_code.co_name}'
+            )
+        frame = frame.f_back
+    return '?'
+
+
+class QueryRecorder:
+    """execute_wrapper: счётчики запросов одного HTTP-запроса."""
+
+    def __init__(self, slow_query_ms, n_plus_one_threshold):
+        self.slow_query = slow_query_ms / 1000
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+        self.slow_queries = []
+        self.suspects = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.count += 1
+            self.duration += duration
+
+            key = fingerprint(sql)
+            self.fingerprints[key] += 1
+            if self.fingerprints[key] == self.n_plus_one_threshold:
+                # Место вызова ищем только при срабатывании, а не на каждый запрос
+                self.suspects[key] = call_site()
+            if duration >= self.slow_query:
+                self.slow_queries.append((duration, sql, call_site()))
+
+
+def _install(stack, recorder):
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(recorder))
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Работает и под WSGI, и под ASGI. Соединения Django привязаны к потоку,
+    поэтому для async-представлений wrapper ставится через sync_to_async —
+    в тот же поток запроса, где async ORM выполняет запросы.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'SQL_INSTRUMENTATION_SAMPLE_RATE', 1.0)
+        self.slow_query_ms = getattr(settings, 'SQL_SLOW_QUERY_MS', 100)
+        self.slow_request_ms = getattr(settings, 'SQL_SLOW_REQUEST_MS', 500)
+        self.n_plus_one_threshold = getattr(settings, 'SQL_N_PLUS_ONE_THRESHOLD', 5)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _sampled(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+
+        recorder = QueryRecorder(self.slow_query_ms, self.n_plus_one_threshold)
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            _install(stack, recorder)
+            response = self.get_response(request)
+        return self.finish(request, response, recorder, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+
+        recorder = QueryRecorder(self.slow_query_ms, self.n_plus_one_threshold)
+        started = time.perf_counter()
+        stack = ExitStack()
+        await sync_to_async(_install)(stack, recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.finish(request, response, recorder, time.perf_counter() - started)
+
+    def finish(self, request, response, recorder, elapsed):
+        timing = (
+            f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries", '
+            f'app;dur={elapsed * 1000:.1f}'
+        )
+        if response.has_header('Server-Timing'):
+            timing = f'{response["Server-Timing"]}, {timing}'
+        response['Server-Timing'] = timing
+
+        self.report(request, recorder, elapsed)
+        return response
+
+    def report(self, request, recorder, elapsed):
+        where = f'{request.method} {request.path}'
+        for duration, sql, site in recorder.slow_queries:
+            logger.warning('Медленный запрос %.1f мс (%s) в %s: %s',
+                           duration * 1000, where, site, sql[:1000])
+        for key, site in recorder.suspects.items():
+            logger.warning('Подозрение на N+1 (%s): %d одинаковых запросов из %s: %s',
+                           where, recorder.fingerprints[key], site, key[:500])
+        if elapsed * 1000 >= self.slow_request_ms:
+            logger.warning('Медленный запрос к сайту %s: %.1f мс, в БД %.1f мс, запросов %d',
+                           where, elapsed * 1000, recorder.duration * 1000, recorder.count)
@@ -0,0 +1,156 @@
+"""
+Подготовка к запуску сервера одним процессом вместо цепочки команд.
+
+    manage.py bootstrap
+
+1. Миграции: makemigrations запускается, только если модели разошлись
+   с файлами миграций, migrate — только если план миграций не пуст.
+2. Статика: список файлов (путь, размер, время изменения) сравнивается с
+   манифестом прошлого запуска в STATIC_ROOT; collectstatic копирует
+   изменившиеся файлы, удалённые из исходников стираются из STATIC_ROOT.
+3. Суперпользователь DJANGO_SUPERUSER_USERNAME (по умолчанию admin)
+   создаётся, если его нет.
+"""
+
+import hashlib
+import json
+import os
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.staticfiles.finders import get_finders
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, no_translations
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.autodetector import MigrationAutodetector
+from django.db.migrations.executor import MigrationExecutor
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.questioner import NonInteractiveMigrationQuestioner
+from django.db.migrations.state import ProjectState
+
+STATIC_MANIFEST = '.bootstrap-static.json'
+# Как у collectstatic по умолчанию
+STATIC_IGNORE = ['CVS', '.*', '*~']
+
+
+def project_apps():
+    """Метки приложений проекта (не сторонних пакетов)."""
+    root = str(settings.BASE_DIR) + os.sep
+    return [config.label for config in apps.get_app_configs()
+            if config.path.startswith(root) and config.models_module is not None]
+
+
+def pending_model_changes(labels):
+    """
+    Приложения из labels, модели которых расходятся с миграциями.
+    Вызывать без активного перевода (no_translations), как makemigrations.
+    """
+    loader = MigrationLoader(None, ignore_no_migrations=True)
+    autodetector = MigrationAutodetector(
+        loader.project_state(),
+        ProjectState.from_apps(apps),
+        NonInteractiveMigrationQuestioner(specified_apps=set(labels), dry_run=True),
+    )
+    return sorted(autodetector.changes(
+        graph=loader.graph, trim_to_apps=set(labels), convert_apps=set(labels),
+    ))
+
+
+def migration_plan(using=DEFAULT_DB_ALIAS):
+    """Неприменённые миграции базы using."""
+    executor = MigrationExecutor(connections[using])
+    return executor.migration_plan(executor.loader.graph.leaf_nodes())
+
+
+def static_sources():
+    """{путь в STATIC_ROOT: (размер, mtime_ns)}; первый найденный файл побеждает, как в collectstatic."""
+    files = {}
+    for finder in get_finders():
+        for path, storage in finder.list(STATIC_IGNORE):
+            prefix = getattr(storage, 'prefix', None)
+            target = os.path.join(prefix, path) if prefix else path
+            if target not in files:
+                stat = os.stat(storage.path(path))
+                files[target] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+def sync_static(force=False):
+    """
+    collectstatic только при изменении исходников.
+    Возвращает (скопировано ли, сколько устаревших файлов удалено).
+    """
+    root = settings.STATIC_ROOT
+    manifest_path = os.path.join(root, STATIC_MANIFEST)
+    files = static_sources()
+    digest = hashlib.sha256(json.dumps(sorted(files.items())).encode()).hexdigest()
+
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        previous = {'digest': None, 'files': []}
+    if not force and previous['digest'] == digest:
+        return False, 0
+
+    call_command('collectstatic', interactive=False, verbosity=0)
+    removed = 0
+    for path in set(previous['files']) - set(files):
+        try:
+            os.remove(os.path.join(root, path))
+            removed += 1
+        except FileNotFoundError:
+            pass
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({'digest': digest, 'files': sorted(files)}, f)
+    return True, removed
+
+
+def ensure_superuser():
+    """Создаёт суперпользователя из DJANGO_SUPERUSER_*; True, если он создан."""
+    User = get_user_model()
+    username = os.environ.get('DJANGO_SUPERUSER_USERNAME', 'admin')
+    if User.objects.filter(username=username).exists():
+        return False
+    User.objects.create_superuser(
+        username,
+        os.environ.get('DJANGO_SUPERUSER_EMAIL', 'admin@example.com'),
+        os.environ.get('DJANGO_SUPERUSER_PASSWORD', 'admin'),
+    )
+    return True
+
+
+class Command(BaseCommand):
+    help = 'Миграции, статика и суперпользователь — только то, что изменилось с прошлого запуска'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-static', action='store_true', help='Не собирать статику')
+        parser.add_argument('--force-static', action='store_true',
+                            help='Собрать статику, даже если исходники не менялись')
+
+    @no_translations
+    def handle(self, *args, **options):
+        labels = project_apps()
+        changed = pending_model_changes(labels)
+        if changed:
+            self.stdout.write(f'Модели изменились ({", ".join(changed)}), создаём миграции...')
+            call_command('makemigrations', *labels, interactive=False)
+
+        plan = migration_plan()
+        if plan:
+            self.stdout.write(f'Применяем миграции: {len(plan)}...')
+            call_command('migrate', interactive=False)
+        else:
+            self.stdout.write('Схема БД актуальна')
+
+        if not options['skip_static']:
+            copied, removed = sync_static(force=options['force_static'])
+            if copied:
+                self.stdout.write(f'Статика обновлена, удалено устаревших файлов: {removed}')
+            else:
+                self.stdout.write('Статика не менялась')
+
+        if ensure_superuser():
+            self.stdout.write('Суперпользователь создан')
+        self.stdout.write(self.style.SUCCESS('Готово'))
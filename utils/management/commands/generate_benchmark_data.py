@@ -0,0 +1,43 @@
+"""
+Детерминированные данные для бенчмарков (только для пустой БД).
+
+Пример: manage.py generate_benchmark_data --products 100000 --orders 1000000
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.benchmark import DEFAULT_SEED, generate_data
+
+
+class Command(BaseCommand):
+    help = 'Заполняет пустую БД каталогом, пользователями и заказами для бенчмарков'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100_000)
+        parser.add_argument('--orders', type=int, default=1_000_000)
+        parser.add_argument('--users', type=int, default=None,
+                            help='По умолчанию — один покупатель на десять заказов')
+        parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        verbosity = options['verbosity']
+
+        def progress(stage, done, total):
+            if verbosity > 1 or done == total:
+                self.stdout.write(f'{stage}: {done}/{total}')
+
+        try:
+            counts = generate_data(
+                products=options['products'],
+                orders=options['orders'],
+                users=options['users'],
+                seed=options['seed'],
+                batch_size=options['batch_size'],
+                progress=progress,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        summary = ', '.join(f'{name}: {count}' for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Создано — {summary}'))
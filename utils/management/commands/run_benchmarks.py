@@ -0,0 +1,94 @@
+"""
+Прогон сценариев бенчмарка с отчётом в JSON и сравнением с эталоном.
+
+Пример:
+    manage.py run_benchmarks --requests 500 --concurrency 8 --output bench.json \
+        --baseline benchmarks/baseline.json
+Команда завершается с ошибкой, если результат хуже эталона больше чем на
+--tolerance. --save-baseline записывает текущий результат как эталон.
+На SQLite пишущие сценарии (cart_add, checkout) при --concurrency > 1
+упираются в блокировку всей БД; сравнивайте их на PostgreSQL.
+
+--handler both прогоняет каждый сценарий и через WSGI, и через ASGI:
+    manage.py run_benchmarks --handler both catalog_browse async_catalog_browse
+"""
+
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.benchmark import DEFAULT_SEED, HANDLERS, SCENARIOS, compare_with_baseline, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Гоняет сценарии каталога, корзины и оформления заказа и сравнивает с эталоном'
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenarios', nargs='*', metavar='scenario',
+                            help=f'Сценарии (по умолчанию все): {", ".join(SCENARIOS)}')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Измеряемых запросов на сценарий')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--warmup', type=int, default=10,
+                            help='Неизмеряемых запросов на поток перед замером')
+        parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+        parser.add_argument('--handler', choices=[*HANDLERS, 'both'], default='wsgi',
+                            help='Через какой обработчик гонять запросы')
+        parser.add_argument('--output', help='Файл для JSON-отчёта (по умолчанию stdout)')
+        parser.add_argument('--baseline', help='JSON-эталон для сравнения')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Допустимое ухудшение задержки и пропускной способности (доля)')
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='Записать результат в файл --baseline вместо сравнения')
+
+    def handle(self, *args, **options):
+        if options['save_baseline'] and not options['baseline']:
+            raise CommandError('--save-baseline требует --baseline')
+
+        def progress(name, result):
+            self.stderr.write(
+                f'{name}: p50 {result["p50_ms"]} мс, p95 {result["p95_ms"]} мс, '
+                f'{result["throughput_rps"]} запр./с, SQL {result["queries_per_request"]}'
+            )
+
+        try:
+            report = run_benchmarks(
+                options['scenarios'],
+                requests=options['requests'],
+                concurrency=options['concurrency'],
+                warmup=options['warmup'],
+                seed=options['seed'],
+                handlers=HANDLERS if options['handler'] == 'both' else (options['handler'],),
+                progress=progress,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        data = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(data + '\n')
+        else:
+            self.stdout.write(data)
+
+        baseline_path = options['baseline']
+        if not baseline_path:
+            return
+        if options['save_baseline']:
+            os.makedirs(os.path.dirname(baseline_path) or '.', exist_ok=True)
+            with open(baseline_path, 'w', encoding='utf-8') as f:
+                f.write(data + '\n')
+            self.stderr.write(self.style.SUCCESS(f'Эталон сохранён: {baseline_path}'))
+            return
+
+        try:
+            with open(baseline_path, encoding='utf-8') as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Не удалось прочитать эталон {baseline_path}: {e}')
+
+        failures = compare_with_baseline(report, baseline, options['tolerance'])
+        if failures:
+            raise CommandError('Регрессия относительно эталона:\n' + '\n'.join(failures))
+        self.stderr.write(self.style.SUCCESS('Результат в пределах эталона'))
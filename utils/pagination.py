@@ -0,0 +1,52 @@
+"""
+Пагинация больших таблиц по оценке планировщика.
+
+Точный COUNT(*) по таблице в миллионы строк занимает секунды, а для
+списка в админке достаточно порядка величины. На PostgreSQL число строк
+берётся из pg_class.reltuples (без фильтров) или из EXPLAIN (с фильтрами);
+небольшие результаты и другие СУБД считаются точно.
+"""
+
+import json
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+ESTIMATE_THRESHOLD = 10000
+
+
+def estimate_count(queryset):
+    """Оценка числа строк queryset или None, если оценка недоступна."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+            # -1 — таблица ещё не анализировалась
+            return int(row[0]) if row and row[0] >= 0 else None
+
+        sql, params = queryset.order_by().query.sql_with_params()
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator, который для больших результатов берёт оценку вместо COUNT(*)."""
+    threshold = ESTIMATE_THRESHOLD
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is not None and estimate >= self.threshold:
+            return estimate
+        return super().count
@@ -0,0 +1,43 @@
+"""
+Общие помощники для тестов приложений.
+"""
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+# Запросов на страницу списка в админке, независимо от числа строк
+CHANGELIST_QUERY_BUDGET = 8
+
+
+class ChangelistQueryBudgetMixin:
+    """
+    Проверка, что списки в админке не делают запросов на каждую строку.
+
+    Подкласс TestCase задаёт app_label, changelist_models, self.admin
+    и _create_rows(count).
+    """
+
+    app_label = None
+    changelist_models = ()
+
+    def _create_rows(self, count):
+        raise NotImplementedError
+
+    def _changelist_queries(self, model):
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(f'admin:{self.app_label}_{model}_changelist'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelists_stay_within_budget(self):
+        for model in self.changelist_models:
+            with self.subTest(model=model):
+                self._create_rows(3)
+                small = self._changelist_queries(model)
+                self._create_rows(40)
+                large = self._changelist_queries(model)
+
+                self.assertEqual(small, large)
+                self.assertLessEqual(large, CHANGELIST_QUERY_BUDGET)
@@ -0,0 +1,359 @@
+import asyncio
+import os
+import tempfile
+import threading
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import OperationalError, connections, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from orders.models import Order
+from products.models import Product
+from users.models import User
+
+from . import db_router, instrumentation, transactions_utils
+from .management.commands import bootstrap
+from .db_backends.postgresql_pool.base import TRANSACTION_STATUS_IDLE, ConnectionPool
+from .transactions_utils import transaction_block, transaction_metrics, transactional
+
+# psycopg: transaction_status внутри незавершённой транзакции
+TRANSACTION_STATUS_INTRANS = 2
+
+
+class FakeConnection:
+    """Минимальный интерфейс соединения psycopg, который использует пул."""
+
+    def __init__(self):
+        self.closed = False
+        self.rollbacks = 0
+        self.info = SimpleNamespace(transaction_status=TRANSACTION_STATUS_IDLE)
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.info.transaction_status = TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Пул соединений backend-а postgresql_pool."""
+
+    def setUp(self):
+        self.pool = ConnectionPool(max_size=2, timeout=0.05)
+
+    def test_returned_connection_is_reused(self):
+        first = self.pool.getconn(FakeConnection)
+        self.pool.putconn(first)
+        second = self.pool.getconn(FakeConnection)
+
+        self.assertIs(first, second)
+        metrics = self.pool.metrics()
+        self.assertEqual((metrics['opened'], metrics['requests'], metrics['in_use']), (1, 2, 1))
+
+    def test_open_transaction_is_rolled_back_and_broken_connection_dropped(self):
+        busy = self.pool.getconn(FakeConnection)
+        broken = self.pool.getconn(FakeConnection)
+        busy.info.transaction_status = TRANSACTION_STATUS_INTRANS
+        broken.closed = True
+
+        self.pool.putconn(busy)
+        self.pool.putconn(broken)
+
+        self.assertEqual(busy.rollbacks, 1)
+        self.assertEqual(self.pool.metrics()['idle'], 1)
+        self.assertIs(self.pool.getconn(FakeConnection), busy)
+
+    def test_exhausted_pool_times_out_and_frees_slot_on_connect_error(self):
+        def failing_connect():
+            raise OperationalError('connection refused')
+
+        with self.assertRaises(OperationalError):
+            self.pool.getconn(failing_connect)
+        held = [self.pool.getconn(FakeConnection) for _ in range(2)]
+
+        with self.assertRaises(OperationalError):
+            self.pool.getconn(FakeConnection)
+        self.assertEqual(self.pool.metrics()['timeouts'], 1)
+
+        # Освободившееся соединение достаётся ожидающему потоку
+        result = []
+        waiter = threading.Thread(target=lambda: result.append(self.pool.getconn(FakeConnection)))
+        self.pool.timeout = 5
+        waiter.start()
+        self.pool.putconn(held[0])
+        waiter.join()
+        self.assertEqual(result, [held[0]])
+        self.assertEqual(self.pool.metrics()['in_use'], 2)
+
+
+@mock.patch.object(db_router, 'replica_aliases', return_value=['replica_1'])
+class PrimaryReplicaRouterTests(SimpleTestCase):
+    """Выбор БД для чтения и записи."""
+
+    router = db_router.PrimaryReplicaRouter()
+
+    def test_reads_of_replicated_apps_go_to_replica(self, replicas):
+        self.assertEqual(self.router.db_for_read(Product), 'replica_1')
+        self.assertEqual(self.router.db_for_read(Order), 'replica_1')
+        self.assertEqual(self.router.db_for_read(User), 'default')
+        self.assertEqual(self.router.db_for_write(Product), 'default')
+
+    def test_primary_when_pinned_in_transaction_or_bound_instance(self, replicas):
+        with db_router.use_primary():
+            self.assertEqual(self.router.db_for_read(Product), 'default')
+        with mock.patch.object(connections['default'], 'in_atomic_block', True):
+            self.assertEqual(self.router.db_for_read(Product), 'default')
+
+        product = Product()
+        product._state.db = 'default'
+        self.assertEqual(self.router.db_for_read(Product, instance=product), 'default')
+
+    def test_without_replicas_everything_reads_primary(self, replicas):
+        replicas.return_value = []
+        self.assertEqual(self.router.db_for_read(Product), 'default')
+
+
+@override_settings(REPLICA_LAG_WINDOW=7)
+class ReplicaStickinessMiddlewareTests(SimpleTestCase):
+    """Привязка к основной БД после записи через cookie."""
+
+    factory = RequestFactory()
+
+    def _view(self, request):
+        return HttpResponse('pinned' if db_router._pinned.get() else 'replica')
+
+    def test_write_pins_request_and_sets_cookie(self):
+        middleware = db_router.ReplicaStickinessMiddleware(self._view)
+
+        response = middleware(self.factory.post('/api/cart/'))
+
+        self.assertEqual(response.content, b'pinned')
+        cookie = response.cookies[db_router.PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], 7)
+        self.assertTrue(cookie['httponly'])
+        self.assertFalse(db_router._pinned.get())
+
+    def test_read_uses_replica_unless_cookie_present(self):
+        middleware = db_router.ReplicaStickinessMiddleware(self._view)
+
+        response = middleware(self.factory.get('/api/products/'))
+        self.assertEqual(response.content, b'replica')
+        self.assertNotIn(db_router.PIN_COOKIE, response.cookies)
+
+        request = self.factory.get('/api/products/')
+        request.COOKIES[db_router.PIN_COOKIE] = '1'
+        self.assertEqual(middleware(request).content, b'pinned')
+
+    def test_async_requests_are_pinned_too(self):
+        async def view(request):
+            return self._view(request)
+
+        middleware = db_router.ReplicaStickinessMiddleware(view)
+
+        response = asyncio.run(middleware(self.factory.delete('/api/async/cart/items/1/')))
+
+        self.assertEqual(response.content, b'pinned')
+        self.assertIn(db_router.PIN_COOKIE, response.cookies)
+
+
+@mock.patch.object(transactions_utils.random, 'uniform', return_value=1)
+@mock.patch.object(transactions_utils.time, 'sleep')
+class TransactionalRetryTests(TransactionTestCase):
+    """Повтор внешней транзакции при блокировках и конфликтах сериализации."""
+
+    def _flaky(self, failures, error='database is locked'):
+        calls = []
+
+        @transactional(retries=3, backoff=0.05, max_backoff=0.15)
+        def work():
+            calls.append(len(calls))
+            if len(calls) <= failures:
+                raise OperationalError(error)
+            return 'done'
+
+        return work, calls
+
+    def test_retries_with_exponential_backoff(self, sleep, uniform):
+        before = transaction_metrics()
+        work, calls = self._flaky(3)
+
+        self.assertEqual(work(), 'done')
+
+        self.assertEqual(len(calls), 4)
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [0.05, 0.1, 0.15])
+        after = transaction_metrics()
+        self.assertEqual(after['retries.sqlite_locked'] - before.get('retries.sqlite_locked', 0), 3)
+
+    def test_gives_up_after_retries(self, sleep, uniform):
+        before = transaction_metrics().get('aborts.sqlite_locked', 0)
+        work, calls = self._flaky(10)
+
+        with self.assertLogs('utils.transactions_utils', 'WARNING'), self.assertRaises(OperationalError):
+            work()
+
+        self.assertEqual(len(calls), 4)
+        self.assertEqual(transaction_metrics()['aborts.sqlite_locked'], before + 1)
+
+    def test_other_errors_and_nested_blocks_are_not_retried(self, sleep, uniform):
+        work, calls = self._flaky(1, error='no such table')
+        with self.assertRaises(OperationalError):
+            work()
+        self.assertEqual(len(calls), 1)
+
+        work, calls = self._flaky(1)
+        with self.assertRaises(OperationalError), transaction.atomic():
+            work()
+        self.assertEqual(len(calls), 1)
+        sleep.assert_not_called()
+
+    def test_unknown_isolation_level_is_rejected(self, sleep, uniform):
+        with self.assertRaises(ValueError), transaction_block('CHAOS'):
+            pass
+
+
+class ReadOnlyTransactionTests(TransactionTestCase):
+    """Отчёт, история и выгрузки читают в транзакции только для чтения."""
+
+    def _set_transaction(self):
+        """Перехватывает SET (в том числе SET LOCAL), как будто база — PostgreSQL."""
+        statements = []
+
+        def wrapper(execute, sql, params, many, context):
+            if sql.startswith('SET '):
+                if sql.startswith('SET TRANSACTION'):
+                    statements.append(sql)
+                return None
+            return execute(sql, params, many, context)
+
+        connection = connections['default']
+        vendor = mock.patch.object(connection, 'vendor', 'postgresql')
+        return statements, vendor, connection.execute_wrapper(wrapper)
+
+    def test_outermost_block_sets_read_only(self):
+        statements, vendor, wrapper = self._set_transaction()
+        with vendor, wrapper:
+            with transaction_block('REPEATABLE READ', read_only=True):
+                with transaction_block(read_only=True):
+                    pass
+
+        self.assertEqual(statements, ['SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY'])
+
+    def test_report_history_and_export_are_read_only(self):
+        from api.views import SalesReportView
+        from orders.exports import OrderExporter
+        from utils.exports import streaming_export
+
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        request = RequestFactory().get('/api/reports/sales/', {'start': '2024-01-01', 'end': '2024-01-31'})
+        request.user = admin
+
+        statements, vendor, wrapper = self._set_transaction()
+        with vendor, wrapper:
+            Order.objects.history_page(admin)
+            response = SalesReportView.as_view()(request)
+            self.assertEqual(response.status_code, 200)
+            b''.join(streaming_export(OrderExporter(), Order.objects.all()).streaming_content)
+
+        self.assertEqual(len(statements), 3)
+        self.assertTrue(all(sql.endswith('READ ONLY') for sql in statements))
+
+
+@override_settings(
+    SQL_INSTRUMENTATION_SAMPLE_RATE=1.0, SQL_SLOW_QUERY_MS=10 ** 6, SQL_SLOW_REQUEST_MS=10 ** 6,
+    SQL_N_PLUS_ONE_THRESHOLD=3,
+)
+class QueryInstrumentationMiddlewareTests(TestCase):
+    """Выборка запросов, Server-Timing и журнал медленных запросов."""
+
+    factory = RequestFactory()
+
+    def _view(self, request):
+        # Один отпечаток: длина списка IN не важна
+        for count in (2, 3, 4):
+            list(Product.objects.filter(id__in=range(count)))
+        return HttpResponse()
+
+    def _request(self):
+        return instrumentation.QueryInstrumentationMiddleware(self._view)(self.factory.get('/api/products/'))
+
+    def test_sampled_requests_get_server_timing(self):
+        with override_settings(SQL_INSTRUMENTATION_SAMPLE_RATE=0.5), \
+                mock.patch.object(instrumentation.random, 'random', side_effect=[0.4, 0.6]), \
+                self.assertLogs('utils.instrumentation', 'WARNING') as logs:
+            sampled = self._request()
+            skipped = self._request()
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('desc="3 queries"', sampled['Server-Timing'])
+        self.assertFalse(skipped.has_header('Server-Timing'))
+
+    def test_n_plus_one_is_logged_with_call_site(self):
+        with self.assertLogs('utils.instrumentation', 'WARNING') as logs:
+            self._request()
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('Подозрение на N+1', logs.output[0])
+        self.assertIn('utils/tests.py', logs.output[0])
+
+    @override_settings(SQL_SLOW_QUERY_MS=0, SQL_SLOW_REQUEST_MS=0, SQL_N_PLUS_ONE_THRESHOLD=10)
+    def test_slow_queries_and_requests_are_logged(self):
+        with self.assertLogs('utils.instrumentation', 'WARNING') as logs:
+            self._request()
+
+        messages = [line.split(':', 2)[2] for line in logs.output]
+        self.assertEqual(sum(message.startswith('Медленный запрос ') for message in messages), 4)
+        self.assertTrue(messages[-1].startswith('Медленный запрос к сайту GET /api/products/'))
+        self.assertIn('запросов 3', messages[-1])
+
+
+# Миграции в тестовой базе уже применены; сверку моделей с файлами миграций не трогаем
+@mock.patch.object(bootstrap, 'migration_plan', return_value=[])
+@mock.patch.object(bootstrap, 'pending_model_changes', return_value=[])
+class BootstrapCommandTests(TestCase):
+    """bootstrap ничего не делает, если с прошлого запуска ничего не менялось."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.source = os.path.join(tmp.name, 'src')
+        self.root = os.path.join(tmp.name, 'static')
+        os.makedirs(os.path.join(self.source, 'css'))
+        with open(os.path.join(self.source, 'css', 'site.css'), 'w') as f:
+            f.write('body {}')
+        settings = override_settings(STATICFILES_DIRS=[self.source], STATIC_ROOT=self.root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def _run(self):
+        stdout = StringIO()
+        with mock.patch.object(bootstrap, 'call_command', wraps=call_command) as command:
+            call_command('bootstrap', stdout=stdout)
+        return stdout.getvalue(), [call.args[0] for call in command.call_args_list]
+
+    def test_second_run_changes_nothing(self, changes, plan):
+        output, commands = self._run()
+        self.assertEqual(commands, ['collectstatic'])
+        self.assertIn('Суперпользователь создан', output)
+        self.assertTrue(os.path.exists(os.path.join(self.root, 'css', 'site.css')))
+
+        output, commands = self._run()
+
+        self.assertEqual(commands, [])
+        self.assertIn('Схема БД актуальна', output)
+        self.assertIn('Статика не менялась', output)
+        self.assertNotIn('Суперпользователь создан', output)
+
+    def test_removed_source_is_deleted_from_static_root(self, changes, plan):
+        self._run()
+        os.remove(os.path.join(self.source, 'css', 'site.css'))
+
+        output, commands = self._run()
+
+        self.assertEqual(commands, ['collectstatic'])
+        self.assertIn('удалено устаревших файлов: 1', output)
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'css', 'site.css')))
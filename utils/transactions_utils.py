@@ -1,45 +1,123 @@
 """
-Утилиты для работы с транзакциями и уровнями изоляции.
+Транзакции с выбором уровня изоляции и повтором при конфликтах.
+
+transaction_block() — контекстный менеджер: atomic() с SET TRANSACTION
+первым запросом транзакции (PostgreSQL). transactional — декоратор поверх
+него: при ошибке сериализации (40001), взаимоблокировке (40P01) или
+блокировке SQLite функция выполняется заново с паузой и случайным
+разбросом. Повтор возможен только для внешней транзакции; во вложенном
+блоке действуют параметры внешней, а ошибка пробрасывается наверх.
 """
 
-from django.db import transaction
-from django.db import connection
+import functools
 import logging
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
 
 logger = logging.getLogger(__name__)
 
+READ_COMMITTED = 'READ COMMITTED'
+REPEATABLE_READ = 'REPEATABLE READ'
+SERIALIZABLE = 'SERIALIZABLE'
+ISOLATION_LEVELS = (READ_COMMITTED, REPEATABLE_READ, SERIALIZABLE)
 
-class TransactionManager:
-    """Менеджер для управления транзакциями."""
+RETRY_SQLSTATES = {
+    '40001': 'serialization_failure',
+    '40P01': 'deadlock',
+}
+
+_metrics = Counter()
+_metrics_lock = threading.Lock()
+
+
+def _count(name, reason=None):
+    with _metrics_lock:
+        _metrics[name] += 1
+        if reason:
+            _metrics[f'{name}.{reason}'] += 1
 
-    @staticmethod
-    def set_read_uncommitted():
-        """Устанавливает уровень изоляции READ UNCOMMITTED."""
-        try:
-            with connection.cursor() as cursor:
-                cursor.execute("SET TRANSACTION ISOLATION LEVEL READ UNCOMMITTED;")
-        except Exception as e:
-            logger.error(f"Ошибка установки уровня изоляции: {e}")
 
-    @staticmethod
-    def execute_in_read_uncommitted(func, *args, **kwargs):
-        """Выполняет функцию в транзакции с READ UNCOMMITTED."""
-        try:
-            TransactionManager.set_read_uncommitted()
+def transaction_metrics():
+    """Счётчики процесса: commits, retries, aborts (с разбивкой по причинам)."""
+    with _metrics_lock:
+        return dict(_metrics)
 
-            with transaction.atomic():
-                result = func(*args, **kwargs)
-                return result
 
-        except Exception as e:
-            logger.error(f"Ошибка в транзакции: {e}")
-            raise
+def _retry_reason(exc):
+    """Причина для повтора транзакции или None, если ошибку повторять нельзя."""
+    cause = exc.__cause__
+    sqlstate = getattr(cause, 'pgcode', None) or getattr(cause, 'sqlstate', None)
+    if sqlstate in RETRY_SQLSTATES:
+        return RETRY_SQLSTATES[sqlstate]
+    if 'database is locked' in str(exc):
+        return 'sqlite_locked'
+    return None
 
 
-def read_uncommitted_transaction(func):
-    """Декоратор для выполнения функций в транзакции READ UNCOMMITTED."""
+@contextmanager
+def transaction_block(isolation=None, read_only=False, using=DEFAULT_DB_ALIAS):
+    """atomic() с заданным уровнем изоляции и режимом только для чтения."""
+    if isolation is not None and isolation not in ISOLATION_LEVELS:
+        raise ValueError(f'Неизвестный уровень изоляции: {isolation}')
 
+    connection = connections[using]
+    outermost = not connection.in_atomic_block
+    with transaction.atomic(using=using):
+        if outermost and connection.vendor == 'postgresql' and (isolation or read_only):
+            modes = []
+            if isolation:
+                modes.append(f'ISOLATION LEVEL {isolation}')
+            if read_only:
+                modes.append('READ ONLY')
+            with connection.cursor() as cursor:
+                cursor.execute(f'SET TRANSACTION {", ".join(modes)}')
+        yield
+
+
+def transactional(func=None, *, isolation=None, read_only=False, retries=3,
+                  backoff=0.05, max_backoff=1.0, using=DEFAULT_DB_ALIAS):
+    """
+    Декоратор: выполняет функцию в transaction_block() и повторяет её
+    до retries раз при конфликтах сериализации и взаимоблокировках.
+
+    Использование: @transactional или @transactional(isolation=SERIALIZABLE).
+    """
+    if func is None:
+        return functools.partial(
+            transactional, isolation=isolation, read_only=read_only, retries=retries,
+            backoff=backoff, max_backoff=max_backoff, using=using,
+        )
+
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        return TransactionManager.execute_in_read_uncommitted(func, *args, **kwargs)
+        attempt = 0
+        while True:
+            outermost = not connections[using].in_atomic_block
+            try:
+                with transaction_block(isolation, read_only, using):
+                    result = func(*args, **kwargs)
+            except OperationalError as exc:
+                reason = _retry_reason(exc)
+                if reason is None or not outermost:
+                    raise
+                if attempt >= retries:
+                    _count('aborts', reason)
+                    logger.warning('%s: транзакция прервана после %d повторов (%s)',
+                                   func.__qualname__, attempt, reason)
+                    raise
+                attempt += 1
+                _count('retries', reason)
+                delay = min(backoff * 2 ** (attempt - 1), max_backoff)
+                time.sleep(delay * random.uniform(0.5, 1.5))
+                continue
+
+            if outermost:
+                _count('commits')
+            return result
 
-    return wrapper
\ No newline at end of file
+    return wrapper